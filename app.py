@@ -1,410 +1,1811 @@
-from flask import Flask, request, jsonify, render_template
+from flask import (Blueprint, Flask, Response, current_app, g, make_response, request, jsonify,
+                   render_template, stream_with_context)
 from flask_cors import CORS
-import requests
+import hashlib
+import io
 import json
-from datetime import datetime
+import threading
+from datetime import date, datetime, timezone
+from functools import lru_cache, wraps
 import os
+import time
+import uuid
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from requests.exceptions import ConnectTimeout
+from sentiment_cache import SentimentCache, normalize_text
+from model_dispatch import HedgedDispatcher
+from model_loading import ModelLoadScheduler, WarmupPinger, parse_active_hours
+from http_pool import UpstreamSessions
+from background import BoundedExecutor, InFlight, JobStates
+from stats_store import MoodStats, entry_date
+from storage import PAYMENT_FIELDS, InstrumentedStorage, connect_supabase, create_storage
+from importer import detect_format, run_import
+from exporter import MIMETYPES, parse_format, parse_range, stream_rows
+from events import EventBroker, format_event, reset_event
+from ratelimit import AdmissionQueue, KeyedBuckets, RateLimited, TokenBucket
+from reconcile import PaymentReconciler
+from search import highlight, parse_query
+from json_provider import FastJSONProvider
+from compression import init_compression
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry
+from pagination import decode_change_cursor, decode_cursor, encode_cursor, parse_fields, parse_limit, parse_offset
+from sentiment_providers import HuggingFaceProvider, LocalLexiconProvider
+from singleflight import SingleFlight
+from resources import ProcessLocal, build_times, is_built
 
 load_dotenv()
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key-here'
+# Routes live on this blueprint; create_app() builds the Flask app around it
+bp = Blueprint('journal', __name__)
 
-CORS(app)
+# Default location of the local databases (the Flask instance folder)
+INSTANCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
 
-# Supabase Configuration
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_ANON_KEY = os.getenv('SUPABASE_ANON_KEY')
+# Prometheus metrics served at /metrics
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+metrics = MetricsRegistry()
+http_request_seconds = metrics.histogram(
+    'http_request_duration_seconds', 'Flask request latency by route', ('method', 'route', 'status')
+)
+upstream_request_seconds = metrics.histogram(
+    'upstream_request_duration_seconds', 'Upstream HTTP call latency', ('upstream', 'target', 'status')
+)
+upstream_errors = metrics.counter(
+    'upstream_errors_total', 'Upstream calls that raised or returned an error status', ('upstream', 'target', 'error')
+)
+storage_seconds = metrics.histogram(
+    'storage_operation_duration_seconds', 'Storage (Supabase/SQLite) call latency', ('backend', 'operation')
+)
+storage_errors = metrics.counter(
+    'storage_errors_total', 'Storage calls that raised', ('backend', 'operation', 'error')
+)
+sentiment_results = metrics.counter(
+    'sentiment_results_total', 'Analyses answered, by provider and whether the cache served them', ('provider', 'source')
+)
+payments_reconciled_total = metrics.counter(
+    'payments_reconciled_total', 'Pending payments settled by reconciliation', ('status',)
+)
+sentiment_fallbacks = metrics.counter(
+    'sentiment_fallback_total', 'Analyses that fell back to the neutral result', ('path',)
+)
+model_answers = metrics.counter(
+    'sentiment_model_answers_total', 'Live analyses by the model that answered', ('model',)
+)
+model_load_wait = metrics.histogram(
+    'sentiment_model_load_wait_seconds', 'Time an analysis held for a loading model before it answered', ('model',)
+)
+ai_rate_limited = metrics.counter(
+    'ai_rate_limited_total', 'Analysis requests refused with 429, by the limiter that refused them', ('scope',)
+)
 
-if SUPABASE_URL and SUPABASE_ANON_KEY:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-    print("✅ Supabase connected successfully!")
-else:
-    print("⚠️ Supabase credentials not found. Using fallback mode.")
-    supabase = None
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        http_request_seconds.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=request.url_rule.rule if request.url_rule else 'unmatched',
+            status=response.status_code,
+        )
+    return response
+
+# Page size for GET /api/entries (clients may ask for up to the max)
+ENTRIES_PAGE_SIZE = int(os.getenv('ENTRIES_PAGE_SIZE', '50'))
+ENTRIES_MAX_PAGE_SIZE = int(os.getenv('ENTRIES_MAX_PAGE_SIZE', '200'))
+
+# Default and maximum changes per response for GET /api/entries/changes
+CHANGES_PAGE_SIZE = int(os.getenv('CHANGES_PAGE_SIZE', '500'))
+CHANGES_MAX_PAGE_SIZE = int(os.getenv('CHANGES_MAX_PAGE_SIZE', '2000'))
+
+# Default and maximum results per page for GET /api/entries/search
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '20'))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv('SEARCH_MAX_PAGE_SIZE', '100'))
+
+# Default and maximum page size for GET /api/payments
+PAYMENTS_PAGE_SIZE = int(os.getenv('PAYMENTS_PAGE_SIZE', '50'))
+PAYMENTS_MAX_PAGE_SIZE = int(os.getenv('PAYMENTS_MAX_PAGE_SIZE', '200'))
+
+# Rows fetched from storage per page while streaming an export
+EXPORT_PAGE_SIZE = int(os.getenv('EXPORT_PAGE_SIZE', '1000'))
+
+# Aggregated mood statistics, kept by the storage backend on every write
+STATS_DRIFT_CHECK_INTERVAL = float(os.getenv('STATS_DRIFT_CHECK_INTERVAL', '300'))
+# Buckets returned by default for each trend granularity, and the hard cap
+TREND_DEFAULT_POINTS = {'day': 30, 'week': 52, 'month': 36}
+TREND_MAX_POINTS = 1000
+mood_stats = ProcessLocal(lambda: MoodStats(storage), 'mood_stats')
+
+# Change events for /api/stream, logged in a file shared by the workers on a host
+events = ProcessLocal(lambda: EventBroker(
+    db_path=os.getenv('EVENTS_DB', os.path.join(INSTANCE_PATH, 'events.db')) or None,
+    history=int(os.getenv('EVENTS_HISTORY', '1000')),
+    poll_interval=float(os.getenv('EVENTS_POLL_INTERVAL', '0.5')),
+    max_subscribers=int(os.getenv('SSE_MAX_CLIENTS', '100')),
+), 'events')
+SSE_HEARTBEAT = float(os.getenv('SSE_HEARTBEAT', '15'))
+# Streams end after this long and the browser resumes from Last-Event-ID, so
+# workers can restart and connections rebalance
+SSE_MAX_AGE = float(os.getenv('SSE_MAX_AGE', '300'))
+# Streams this app serves itself (WSGI mode): each holds a request thread for
+# up to SSE_MAX_AGE, so keep it below the threads per worker. 0 serves streams
+# only in ASGI mode; refused clients fall back to polling
+SSE_WSGI_MAX_CLIENTS = int(os.getenv('SSE_WSGI_MAX_CLIENTS', '2'))
+
+def observe_upstream(url, status_code, seconds, error):
+    """http_pool observer: latency and errors per Hugging Face model / IntaSend endpoint"""
+    parts = urlsplit(url)
+    name = UPSTREAM_NAMES.get(parts.netloc, parts.netloc)
+    upstream_request_seconds.observe(seconds, upstream=name, target=parts.path, status=status_code or 'error')
+    if error or status_code >= 400:
+        upstream_errors.inc(upstream=name, target=parts.path, error=error or status_code)
+
+def observe_storage(backend, operation, seconds, error):
+    storage_seconds.observe(seconds, backend=backend, operation=operation)
+    if error:
+        storage_errors.inc(backend=backend, operation=operation, error=error)
+
+def build_storage():
+    """Supabase client (when configured) and the storage repository for this process"""
+    backend = os.getenv('STORAGE_BACKEND')
+    # SQLite deployments never pay for importing the Supabase client
+    supabase = connect_supabase() if (backend or 'auto').lower() != 'sqlite' else None
+    if supabase is not None:
+        print("✅ Supabase connected successfully!")
+    else:
+        print("⚠️ Supabase credentials not found. Using local SQLite storage.")
+    repository = create_storage(
+        backend,
+        supabase_client=supabase,
+        sqlite_path=os.getenv('SQLITE_DB_PATH', os.path.join(INSTANCE_PATH, 'mood_journal.db')),
+    )
+    if METRICS_ENABLED:
+        repository = InstrumentedStorage(repository, observe_storage)
+    print(f"🗄️ Storage backend: {repository.name}")
+    return repository
+
+# Every route reads and writes through this repository
+storage = ProcessLocal(build_storage, 'storage')
+
+# Pooled keep-alive sessions shared by all upstream calls
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05'))
+# Overridable so load tests can point at local stand-ins (benchmarks/fake_services.py)
+INTASEND_API_BASE = os.getenv('INTASEND_API_BASE', 'https://api.intasend.com').rstrip('/')
+INTASEND_TIMEOUT = float(os.getenv('INTASEND_TIMEOUT', '15'))
+# Checkout responses that mean IntaSend did not act on the request
+RETRYABLE_CHECKOUT_STATUSES = (429, 502, 503, 504)
+
+def build_upstream():
+    sessions = UpstreamSessions(
+        pool_size=int(os.getenv('HTTP_POOL_SIZE', '10')),
+        connect_timeout=HTTP_CONNECT_TIMEOUT,
+        read_timeout=float(os.getenv('HTTP_READ_TIMEOUT', '20')),
+        retries=int(os.getenv('HTTP_RETRIES', '2')),
+        observer=observe_upstream if METRICS_ENABLED else None,
+    )
+    # Inference calls are safe to repeat; IntaSend checkouts are not
+    sessions.configure(HF_API_BASE, retry_reads=True)
+    return sessions
+
+upstream = ProcessLocal(build_upstream, 'upstream')
+
+def build_async_upstream():
+    # Imported here: httpx is only needed by the ASGI mode (asgi.py)
+    from async_pool import AsyncUpstreamSessions
+    sessions = AsyncUpstreamSessions(
+        max_connections=int(os.getenv('HTTP_ASYNC_MAX_CONNECTIONS', '100')),
+        connect_timeout=HTTP_CONNECT_TIMEOUT,
+        read_timeout=float(os.getenv('HTTP_READ_TIMEOUT', '20')),
+        retries=int(os.getenv('HTTP_RETRIES', '2')),
+        observer=observe_upstream if METRICS_ENABLED else None,
+    )
+    return sessions
+
+# Async counterpart of `upstream`, used by the coroutine routes in asgi.py
+async_upstream = ProcessLocal(build_async_upstream, 'async_upstream')
 
 # Hugging Face API for sentiment analysis
-def analyze_sentiment(text):
-    """Analyze sentiment/emotion using Hugging Face. Robust to different response formats."""
+HF_API_BASE = os.getenv('HF_API_BASE', 'https://api-inference.huggingface.co/models').rstrip('/')
+
+# Prefer an emotion model for richer labels; fallback to sentiment if unavailable
+SENTIMENT_MODELS = [
+    # Emotions: joy, sadness, anger, fear, disgust, surprise, neutral
+    "j-hartmann/emotion-english-distilroberta-base",
+    # Sentiment: positive/neutral/negative (twitter roberta latest)
+    "cardiffnlp/twitter-roberta-base-sentiment-latest",
+    # Sentiment (binary): POSITIVE/NEGATIVE
+    "distilbert-base-uncased-finetuned-sst-2-english",
+]
+HF_TIMEOUT = float(os.getenv('HF_TIMEOUT', '20'))
+
+# Metric label for each upstream host
+UPSTREAM_NAMES = {
+    urlsplit(HF_API_BASE).netloc: 'huggingface',
+    urlsplit(INTASEND_API_BASE).netloc: 'intasend',
+}
+
+# Fire the preferred model first and hedge to the next ones if it is slow;
+# models that keep failing are skipped for a cooldown window
+model_dispatcher = ProcessLocal(lambda: HedgedDispatcher(
+    hedge_delay=float(os.getenv('HF_HEDGE_DELAY', '1.5')),
+    timeout=HF_TIMEOUT,
+    max_workers=int(os.getenv('HF_MAX_WORKERS', '16')),
+    failure_threshold=int(os.getenv('HF_BREAKER_THRESHOLD', '3')),
+    cooldown=float(os.getenv('HF_BREAKER_COOLDOWN', '30')),
+), 'model_dispatcher')
+
+# A cold model answers 503 with estimated_time: hold for it up to
+# HF_LOADING_BUDGET seconds before downgrading to the next model (0 never
+# holds, but still skips a model known to be loading). Keep it below HF_TIMEOUT.
+model_loading = ProcessLocal(lambda: ModelLoadScheduler(
+    budget=float(os.getenv('HF_LOADING_BUDGET', '8')),
+), 'model_loading')
+
+NEUTRAL_RESULT = {'emotion_label': 'neutral', 'sentiment_score': 0.5, 'ai_provider': 'fallback'}
+
+# Repeat analyses of the same text are served from this cache
+sentiment_cache = ProcessLocal(lambda: SentimentCache(
+    max_entries=int(os.getenv('SENTIMENT_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('SENTIMENT_CACHE_TTL', '86400')),
+    db_path=os.getenv('SENTIMENT_CACHE_DB', os.path.join(INSTANCE_PATH, 'sentiment_cache.db')) or None,
+    max_db_entries=int(os.getenv('SENTIMENT_CACHE_DB_SIZE', '100000')),
+), 'sentiment_cache')
+
+# Sentiment engines, tried in the order given by SENTIMENT_PROVIDERS
+sentiment_providers = {
+    'huggingface': HuggingFaceProvider(
+        SENTIMENT_MODELS, HF_API_BASE, upstream, model_dispatcher,
+        timeout=HF_TIMEOUT, connect_timeout=HTTP_CONNECT_TIMEOUT, async_sessions=async_upstream,
+        scheduler=model_loading,
+    ),
+    'local': LocalLexiconProvider(),
+}
+# Bulk analysis sends at most this many texts per upstream request
+SENTIMENT_BATCH_SIZE = int(os.getenv('SENTIMENT_BATCH_SIZE', '32'))
+SENTIMENT_BATCH_MAX = int(os.getenv('SENTIMENT_BATCH_MAX', '1000'))
+
+SENTIMENT_PROVIDER_CHAIN = [
+    name.strip() for name in os.getenv('SENTIMENT_PROVIDERS', 'huggingface,local').split(',')
+    if name.strip() in sentiment_providers
+] or ['huggingface']
+
+# Concurrent analyses of the same text (several tabs, a double click) share one upstream call
+analysis_flights = ProcessLocal(SingleFlight, 'analysis_flights')
+
+# Admission control for the Hugging Face quota, per process. Each client may
+# ask for AI_CLIENT_RATE analyses per second (bursts of AI_CLIENT_BURST), and
+# upstream calls are paced at AI_GLOBAL_RATE per second; a call that finds
+# the global bucket empty queues (at most AI_QUEUE_SIZE of them, for at most
+# AI_QUEUE_TIMEOUT seconds) and is otherwise refused with a 429. A rate of 0
+# turns that limiter off (its object is then never built).
+AI_CLIENT_RATE = float(os.getenv('AI_CLIENT_RATE', '2'))
+AI_GLOBAL_RATE = float(os.getenv('AI_GLOBAL_RATE', '10'))
+client_limits = ProcessLocal(lambda: KeyedBuckets(
+    AI_CLIENT_RATE, float(os.getenv('AI_CLIENT_BURST', '10')),
+    max_keys=int(os.getenv('AI_CLIENT_KEYS', '10000')),
+), 'client_limits')
+upstream_admission = ProcessLocal(lambda: AdmissionQueue(
+    TokenBucket(AI_GLOBAL_RATE, float(os.getenv('AI_GLOBAL_BURST', '20'))),
+    max_waiting=int(os.getenv('AI_QUEUE_SIZE', '32')),
+    max_wait=float(os.getenv('AI_QUEUE_TIMEOUT', '2')),
+), 'upstream_admission')
+# Behind a reverse proxy every request comes from the proxy; count clients by X-Forwarded-For instead
+RATE_LIMIT_TRUST_PROXY = os.getenv('RATE_LIMIT_TRUST_PROXY', 'false').lower() in ('1', 'true', 'yes')
+
+# During HF_ACTIVE_HOURS (server local time) the preferred model is pinged
+# whenever it has been idle for HF_WARMUP_INTERVAL seconds, so the Inference
+# API keeps it loaded (0 disables)
+HF_WARMUP_INTERVAL = float(os.getenv('HF_WARMUP_INTERVAL', '240'))
+
+def ping_model(model):
+    """Warm-up ping; skipped (None) when the upstream budget has no token to spare"""
+    if AI_GLOBAL_RATE > 0 and not upstream_admission.try_admit():
+        return None
+    return sentiment_providers['huggingface'].ping(model)
+
+model_warmup = ProcessLocal(lambda: WarmupPinger(
+    ping_model,
+    [model.strip() for model in os.getenv('HF_WARMUP_MODELS', SENTIMENT_MODELS[0]).split(',') if model.strip()],
+    model_loading,
+    interval=HF_WARMUP_INTERVAL,
+    hours=parse_active_hours(os.getenv('HF_ACTIVE_HOURS', '7-23')),
+), 'model_warmup')
+
+def start_model_warmup():
+    if HF_WARMUP_INTERVAL > 0 and os.getenv('HUGGINGFACE_API_KEY') and 'huggingface' in SENTIMENT_PROVIDER_CHAIN:
+        model_warmup.start()
+
+def client_key(remote_addr, forwarded_for=None):
+    """The client a request counts against for per-client limits"""
+    if RATE_LIMIT_TRUST_PROXY and forwarded_for:
+        return forwarded_for.split(',')[0].strip()
+    return remote_addr or 'unknown'
+
+def check_client_limit(client):
+    """Raise RateLimited when ``client`` is over its analysis rate"""
+    if AI_CLIENT_RATE <= 0:
+        return
+    granted, retry_after = client_limits.try_acquire(client)
+    if not granted:
+        raise RateLimited('client', retry_after)
+
+def rate_limit_refusal(error):
+    """Body of a 429 response (send ``error.retry_after_header()`` as Retry-After)"""
+    ai_rate_limited.inc(scope=error.scope)
+    return {
+        'error': 'Too many analysis requests, please retry shortly',
+        'scope': error.scope,
+        'retry_after': round(error.retry_after, 2),
+    }
+
+def _flight_key(provider, text):
+    return (provider.model_id, normalize_text(text))
+
+def _analyze_live(provider, text):
+    """
+    Ask ``provider`` once per distinct text in flight; callers that arrive
+    while the same text is being analyzed wait and get a copy of the answer.
+    Metered (upstream) providers need a token from upstream_admission first;
+    local engines answer directly.
+    """
+    if not provider.metered:
+        result = provider.analyze(text)
+        return _remember_analysis(provider, text, result) if result else None
+
+    # Hold for a loading model before leading the call or taking a token
+    plan = provider.ready()
+
+    def call():
+        if AI_GLOBAL_RATE > 0:
+            upstream_admission.admit()
+        result = provider.analyze(text, plan)
+        return _remember_analysis(provider, text, result) if result else None
+
+    result, shared = analysis_flights.do(_flight_key(provider, text), call)
+    if shared and result:
+        sentiment_results.inc(provider=provider.name, source='coalesced')
+    return dict(result) if result else None
+
+async def _analyze_live_async(provider, text):
+    """``_analyze_live`` for the event loop"""
+    if not provider.metered:
+        result = await provider.analyze_async(text)
+        return _remember_analysis(provider, text, result) if result else None
+
+    plan = await provider.ready_async()
+
+    async def call():
+        if AI_GLOBAL_RATE > 0:
+            await upstream_admission.admit_async()
+        result = await provider.analyze_async(text, plan)
+        return _remember_analysis(provider, text, result) if result else None
+
+    result, shared = await analysis_flights.do_async(_flight_key(provider, text), call)
+    if shared and result:
+        sentiment_results.inc(provider=provider.name, source='coalesced')
+    return dict(result) if result else None
+
+def _cached_analysis(provider, text):
+    if not provider.cacheable:
+        return None
+    cached = sentiment_cache.get(text, provider.model_id)
+    if cached:
+        cached.setdefault('ai_provider', provider.name)
+        sentiment_results.inc(provider=provider.name, source='cache')
+    return cached
+
+def _remember_analysis(provider, text, result):
+    result['ai_provider'] = provider.name
+    if provider.cacheable:
+        # wait_ms describes this request, not the text
+        sentiment_cache.set(text, provider.model_id, {key: value for key, value in result.items() if key != 'wait_ms'})
+    sentiment_results.inc(provider=provider.name, source='live')
+    if result.get('model'):
+        model_answers.inc(model=result['model'])
+        model_load_wait.observe(result.get('wait_ms', 0) / 1000, model=result['model'])
+    return result
+
+def analyze_sentiment(text, providers=None, rate_limited=False, client=None):
+    """
+    Analyze sentiment/emotion with the first provider that answers; ai_provider records which one.
+    When the upstream budget refuses a call, ``rate_limited`` callers get RateLimited;
+    others move on to the next provider. A ``client`` is charged against its
+    rate only when no cached answer is found.
+    """
     try:
-        headers = {"Authorization": f"Bearer {os.getenv('HUGGINGFACE_API_KEY', 'hf_demo')}"}
-        payload = {"inputs": text}
-
-        # Prefer an emotion model for richer labels; fallback to sentiment if unavailable
-        model_urls = [
-            # Emotions: joy, sadness, anger, fear, disgust, surprise, neutral
-            "https://api-inference.huggingface.co/models/j-hartmann/emotion-english-distilroberta-base",
-            # Sentiment: positive/neutral/negative (twitter roberta latest)
-            "https://api-inference.huggingface.co/models/cardiffnlp/twitter-roberta-base-sentiment-latest",
-            # Sentiment (binary): POSITIVE/NEGATIVE
-            "https://api-inference.huggingface.co/models/distilbert-base-uncased-finetuned-sst-2-english",
-        ]
-
-        def parse_predictions(predictions):
-            # Expected shapes:
-            # [[{"label":"joy","score":0.91}, ...]]
-            # [[{"label":"positive","score":0.93}, ...]]
-            # [[{"label":"LABEL_0","score":0.7}, ...]]
-            if not isinstance(predictions, list) or len(predictions) == 0:
-                return None
-            scores = predictions[0]
-            if not isinstance(scores, list) or len(scores) == 0:
-                return None
-            best = max(scores, key=lambda x: x.get('score', 0))
-            raw_label = str(best.get('label', '')).upper()
-
-            # Normalize labels
-            label_map = {
-                'LABEL_0': 'negative',
-                'LABEL_1': 'neutral',
-                'LABEL_2': 'positive',
-                'NEGATIVE': 'negative',
-                'NEUTRAL': 'neutral',
-                'POSITIVE': 'positive',
-                'JOY': 'happy',
-                'SADNESS': 'sad',
-                'ANGER': 'angry',
-                'FEAR': 'fear',
-                'DISGUST': 'disgust',
-                'SURPRISE': 'surprise',
-            }
-            normalized = label_map.get(raw_label, raw_label.lower() if raw_label else 'neutral')
-            return {
-                'emotion_label': normalized,
-                'sentiment_score': float(best.get('score', 0.5))
-            }
+        for name in providers or SENTIMENT_PROVIDER_CHAIN:
+            provider = sentiment_providers[name]
+            cached = _cached_analysis(provider, text)
+            if cached:
+                return cached
 
-        for url in model_urls:
+            if client is not None:
+                check_client_limit(client)
+                client = None
             try:
-                r = requests.post(url, headers=headers, json=payload, timeout=20)
-                if r.status_code == 200:
-                    parsed = parse_predictions(r.json())
-                    if parsed:
-                        return parsed
-            except Exception as api_err:
-                print(f"HF request error for {url}: {api_err}")
+                result = _analyze_live(provider, text)
+            except RateLimited:
+                if rate_limited:
+                    raise
+                continue
+            if result:
+                return result
 
-        # Fallback if all models fail
-        return {'emotion_label': 'neutral', 'sentiment_score': 0.5}
+        # Fallback if every provider fails (not cached, so the next call retries)
+        sentiment_fallbacks.inc(path='single')
+        return dict(NEUTRAL_RESULT)
 
+    except RateLimited:
+        raise
     except Exception as e:
         print(f"Error in sentiment analysis: {e}")
-        return {'emotion_label': 'neutral', 'sentiment_score': 0.5}
+        sentiment_fallbacks.inc(path='single')
+        return dict(NEUTRAL_RESULT)
 
-# IntaSend Payment Integration
-def create_intasend_payment(amount, plan_type):
-    """Create payment using IntaSend API"""
+async def analyze_sentiment_async(text, providers=None, rate_limited=False, client=None):
+    """``analyze_sentiment`` for the event loop: upstream calls are awaited, not blocking a thread"""
     try:
-        # IntaSend API configuration
-        INTASEND_API_KEY = os.getenv('INTASEND_API_KEY')
-        INTASEND_PUBLISHABLE_KEY = os.getenv('INTASEND_PUBLISHABLE_KEY')
-        
-        if not INTASEND_API_KEY:
-            # Fallback for demo purposes
-            return {
-                'success': True,
-                'payment_url': 'https://intasend.com/demo-payment',
-                'payment_id': f'demo_{datetime.now().strftime("%Y%m%d%H%M%S")}'
-            }
-        
-        # IntaSend API endpoint
-        API_URL = "https://api.intasend.com/v1/checkout/"
-        
-        headers = {
-            "Authorization": f"Bearer {INTASEND_API_KEY}",
-            "Content-Type": "application/json"
+        for name in providers or SENTIMENT_PROVIDER_CHAIN:
+            provider = sentiment_providers[name]
+            cached = _cached_analysis(provider, text)
+            if cached:
+                return cached
+
+            if client is not None:
+                check_client_limit(client)
+                client = None
+            try:
+                result = await _analyze_live_async(provider, text)
+            except RateLimited:
+                if rate_limited:
+                    raise
+                continue
+            if result:
+                return result
+
+        sentiment_fallbacks.inc(path='single')
+        return dict(NEUTRAL_RESULT)
+
+    except RateLimited:
+        raise
+    except Exception as e:
+        print(f"Error in sentiment analysis: {e}")
+        sentiment_fallbacks.inc(path='single')
+        return dict(NEUTRAL_RESULT)
+
+def analyze_sentiment_batch(texts, providers=None):
+    """Analyze many texts at once: dedupe, serve cache hits, batch the rest upstream."""
+    # Identical (normalized) texts are analyzed once and share a result
+    unique = {}
+    for text in texts:
+        unique.setdefault(normalize_text(text), text)
+    results = {}
+
+    for name in providers or SENTIMENT_PROVIDER_CHAIN:
+        pending = [key for key in unique if key not in results]
+        if not pending:
+            break
+        provider = sentiment_providers[name]
+
+        todo = []
+        for key in pending:
+            cached = sentiment_cache.get(unique[key], provider.model_id) if provider.cacheable else None
+            if cached:
+                cached.setdefault('ai_provider', provider.name)
+                sentiment_results.inc(provider=provider.name, source='cache')
+                results[key] = cached
+            else:
+                todo.append(key)
+
+        for start in range(0, len(todo), SENTIMENT_BATCH_SIZE):
+            chunk = todo[start:start + SENTIMENT_BATCH_SIZE]
+            try:
+                plan = provider.ready()
+                if provider.metered and AI_GLOBAL_RATE > 0:
+                    # One upstream request per chunk; over budget, the next provider takes it
+                    upstream_admission.admit()
+                answers = provider.analyze_batch([unique[key] for key in chunk], plan)
+            except RateLimited:
+                continue
+            except Exception as e:
+                print(f"Error in batch sentiment analysis ({name}): {e}")
+                continue
+            for key, result in zip(chunk, answers):
+                if not result:
+                    continue
+                result['ai_provider'] = provider.name
+                if provider.cacheable:
+                    sentiment_cache.set(unique[key], provider.model_id, result)
+                sentiment_results.inc(provider=provider.name, source='live')
+                results[key] = result
+
+    missing = sum(1 for key in unique if key not in results)
+    if missing:
+        sentiment_fallbacks.inc(missing, path='batch')
+    return [dict(results.get(normalize_text(text)) or NEUTRAL_RESULT) for text in texts]
+
+def build_detailed_analysis(label, score):
+    """Friendly one-line summary shown under an analysis result"""
+    if label in ['happy', 'joy', 'positive']:
+        message = "You're expressing positive feelings. Keep noting what made your day better."
+    elif label in ['sad', 'negative']:
+        message = "I'm sensing sadness. Consider writing what might help you feel a bit better."
+    elif label in ['angry']:
+        message = "There’s anger in your words. A short break or deep breaths could help."
+    elif label in ['fear']:
+        message = "I see some fear/anxiety. Identifying one small step can reduce it."
+    elif label in ['disgust']:
+        message = "You might be feeling aversion. Noting triggers can provide clarity."
+    elif label in ['surprise']:
+        message = "Surprise detected. Capture what was unexpected and how you felt."
+    else:
+        message = "Neutral tone detected. Add more detail to capture your feelings."
+    return f"{label.title()} ({score*100:.0f}%). {message}"
+
+# Background scoring for entries saved without an analysis
+ASYNC_SCORING = os.getenv('ASYNC_SCORING', 'false').lower() in ('1', 'true', 'yes')
+PENDING_LABEL = 'pending'
+MAX_TRACKED_ANALYSES = 1000
+
+scoring_pool = ProcessLocal(lambda: BoundedExecutor(
+    max_workers=int(os.getenv('SCORING_WORKERS', '4')),
+    max_queue=int(os.getenv('SCORING_QUEUE_SIZE', '200')),
+    name='scoring',
+), 'scoring_pool')
+# Recent job states so polling clients rarely need a database read
+analysis_jobs = ProcessLocal(lambda: JobStates(MAX_TRACKED_ANALYSES), 'analysis_jobs')
+
+def _track_analysis(entry_id, **state):
+    analysis_jobs.update(entry_id, **state)
+
+def analysis_fields(sentiment_result):
+    """Entry columns for an analysis result"""
+    return {
+        'emotion_label': sentiment_result['emotion_label'],
+        'sentiment_score': sentiment_result['sentiment_score'],
+        'ai_provider': sentiment_result.get('ai_provider', 'huggingface'),
+        'detailed_analysis': build_detailed_analysis(
+            sentiment_result['emotion_label'], sentiment_result['sentiment_score']
+        ),
+    }
+
+def score_entry(entry_id, content):
+    """Analyze a saved entry and write the result back to its row"""
+    try:
+        update = analysis_fields(analyze_sentiment(content))
+        row = storage.update_entry(entry_id, update)
+        publish('entry_analyzed', dict(update, id=entry_id))
+        if row:
+            publish_stats(row)
+        _track_analysis(entry_id, status='done', **update)
+        return update
+    except Exception as e:
+        print(f"Error scoring entry {entry_id}: {e}")
+        _track_analysis(entry_id, status='failed', error=str(e))
+        raise
+
+def json_body():
+    """The request's JSON object; {} when the body is missing, malformed or not an object"""
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else {}
+
+def parse_entry_request(data):
+    """
+    Validate a create-entry body. Returns ``(content, analysis, run_async)``;
+    ``analysis`` is None when the client did not send a label and score.
+    """
+    data = data or {}
+    content = str(data.get('content') or '').strip()
+    if not content:
+        raise ValueError('Content is required')
+    analysis = None
+    if data.get('emotion_label') and data.get('sentiment_score') is not None:
+        score = data['sentiment_score']
+        try:
+            score = float(score)
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid sentiment_score: {score}')
+        if not 0 <= score <= 1:
+            raise ValueError('sentiment_score must be between 0 and 1')
+        analysis = {
+            'emotion_label': str(data['emotion_label']),
+            'sentiment_score': score,
+            'ai_provider': data.get('ai_provider', 'huggingface'),
+            'detailed_analysis': data.get('detailed_analysis'),
         }
-        
-        payload = {
-            "amount": amount,
-            "currency": "USD",
-            "description": f"Mood Journal {plan_type.title()} Plan",
-            "success_url": "http://localhost:5000/payment/success",
-            "cancel_url": "http://localhost:5000/payment/cancel",
-            "metadata": {
-                "plan_type": plan_type,
-                "app": "mood_journal"
-            }
+    run_async = str(data.get('async_analysis', ASYNC_SCORING)).lower() in ('1', 'true', 'yes')
+    return content, analysis, run_async
+
+def can_score_later():
+    """True while the background scoring queue has room"""
+    return scoring_pool.depth() < scoring_pool.max_workers + scoring_pool.max_queue
+
+def save_entry(content, analysis):
+    """Insert an analyzed entry and announce it with the new mood stats"""
+    entry_data = {'content': content}
+    entry_data.update(analysis)
+    new_entry = storage.insert_entry(entry_data)
+    publish('entry_created', new_entry)
+    publish_stats(new_entry)
+    return new_entry
+
+def save_pending_entry(content):
+    """Save now and let a background worker fill in the analysis; returns (entry, status)"""
+    new_entry = save_entry(content, {
+        'emotion_label': PENDING_LABEL,
+        'sentiment_score': 0.5,
+        'ai_provider': PENDING_LABEL,
+        'detailed_analysis': 'Analysis pending...',
+    })
+    _track_analysis(new_entry['id'], status='pending')
+    if scoring_pool.try_submit(score_entry, new_entry['id'], content) is None:
+        # Queue filled up since the check: score inline instead
+        new_entry.update(score_entry(new_entry['id'], content))
+        return new_entry, 201
+    new_entry['analysis_status'] = 'pending'
+    return new_entry, 202
+
+def rebuild_mood_stats():
+    """Recompute the aggregates from a full scan of journal_entries"""
+    total = mood_stats.rebuild()
+    publish_stats()
+    print(f"📊 Mood stats rebuilt from {total} entries")
+    return total
+
+# Drift checks scan journal_entries, so they run here instead of in a stats request
+stats_maintenance = ProcessLocal(lambda: BoundedExecutor(max_workers=1, max_queue=0, name='stats-drift'),
+                                 'stats_maintenance')
+
+def check_mood_stats_drift():
+    """Compare per-emotion counts and score sums with the entries; rebuild when they differ"""
+    try:
+        drifted = mood_stats.drifted()
+        if drifted:
+            print(f"⚠️ Mood stats drifted for {', '.join(drifted)}. Rebuilding.")
+            rebuild_mood_stats()
+    except Exception as e:
+        print(f"Error checking mood stats drift: {e}")
+
+def ensure_mood_stats_fresh(wait=False):
+    """
+    Periodically check the aggregates for drift. Requests only hand the check
+    to the background worker; ``wait`` runs it inline (warm-up).
+    """
+    if not mood_stats.drift_check_due(STATS_DRIFT_CHECK_INTERVAL):
+        return
+    if wait:
+        check_mood_stats_drift()
+    else:
+        # Skipped when a check is already running
+        stats_maintenance.try_submit(check_mood_stats_drift)
+
+def conditional(*scopes, changes_cursor=False):
+    """
+    Answer GETs with a strong ETag built from the storage backend's write
+    versions of ``scopes``; a matching If-None-Match returns 304 before the
+    view runs. Scopes the backend keeps no version for are served without one.
+    With ``changes_cursor`` a 304 for the first page still carries
+    X-Changes-Cursor, the entries version. There is no Last-Modified: the
+    versions are counters, not times, and browsers send If-None-Match
+    whenever they have an ETag.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                versions = [storage.data_version(scope) for scope in scopes]
+                epoch = storage.data_epoch()
+            except Exception as e:
+                print(f"Error reading data versions: {e}")
+                versions = [None]
+            if None in versions:
+                return view(*args, **kwargs)
+            # The query string selects a different representation (page, fields...)
+            variant = hashlib.sha1(request.full_path.encode('utf-8')).hexdigest()[:12]
+            etag = f"{epoch}-{'.'.join(str(version) for version in versions)}-{variant}"
+
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+                if changes_cursor and not request.args.get('cursor'):
+                    response.headers['X-Changes-Cursor'] = str(versions[scopes.index('entries')])
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # Cache, but always revalidate
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+def publish(event_type, data):
+    """Send a change event to /api/stream subscribers; never fails the write"""
+    try:
+        events.publish(event_type, data)
+    except Exception as e:
+        print(f"Error publishing {event_type} event: {e}")
+
+def daily_trend(points):
+    """Trend chart points from daily rollups"""
+    return [
+        {
+            'date': point['period'],
+            'score': point['mean_score'],
+            'emotion': point['dominant_emotion'],
+            'count': point['count']
         }
-        
-        response = requests.post(API_URL, headers=headers, json=payload)
-        
-        if response.status_code == 200:
-            result = response.json()
-            return {
-                'success': True,
-                'payment_url': result.get('payment_url'),
-                'payment_id': result.get('payment_id')
-            }
-        else:
-            print(f"IntaSend API error: {response.text}")
-            return {
-                'success': False,
-                'error': 'Payment initialization failed'
-            }
+        for point in points
+    ]
+
+def publish_stats(*entries):
+    """
+    Announce that the mood stats changed on the UTC days ``entries`` fall on
+    (with no entries, everything). Only the days are logged: the numbers are
+    read by stats_event() when a stream sends the event, so a write costs no
+    aggregate queries when nobody on any worker is listening.
+    """
+    days = sorted({entry_date(entry.get('created_at')).isoformat() for entry in entries})
+    publish('stats', {'days': days or None})
+
+@lru_cache(maxsize=64)
+def _stats_event_data(event_id, changed):
+    """JSON for one stats event, built once per process however many streams send it"""
+    days = json.loads(changed).get('days')
+    data = mood_stats.snapshot()
+    if days:
+        first, last = date.fromisoformat(days[0]), date.fromisoformat(days[-1])
+        points = {point['date']: point for point in daily_trend(mood_stats.trends('day', first, last))}
+        # count 0 when a day emptied
+        data['trend_points'] = [points.get(day, {'date': day, 'score': None, 'emotion': None, 'count': 0})
+                                for day in days]
+    else:
+        data['trend_data'] = daily_trend(mood_stats.trends('day', limit=TREND_DEFAULT_POINTS['day']))
+    return json.dumps(data, default=str, separators=(',', ':'))
+
+if hasattr(os, 'register_at_fork'):
+    # A forked worker's in-memory event log numbers its events from 1 again
+    os.register_at_fork(after_in_child=_stats_event_data.cache_clear)
+
+def stats_event(event):
+    """
+    A logged stats event as streams send it: the new totals plus the trend
+    points of the changed days, or the recent trend. If the numbers can't be
+    read the client is told to reload instead.
+    """
+    try:
+        return dict(event, data=_stats_event_data(event['id'], event['data']))
+    except Exception as e:
+        print(f"Error reading stats for event {event['id']}: {e}")
+        return reset_event('stats')
+
+# Bulk import: rows per database round trip, and the largest batch a caller may ask for
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '500'))
+IMPORT_MAX_BATCH_SIZE = int(os.getenv('IMPORT_MAX_BATCH_SIZE', '5000'))
+
+def import_entries(stream, fmt, batch_size=IMPORT_BATCH_SIZE, score=True, providers=None, on_batch=None):
+    """Stream entries from a JSONL/CSV text stream into storage, one batch per round trip"""
+    def insert_batch(entries):
+        unscored = [entry for entry in entries if not entry['emotion_label'] or entry['sentiment_score'] is None]
+        if unscored:
+            # Rows without a label are scored in one batched pass, or marked neutral
+            results = analyze_sentiment_batch([entry['content'] for entry in unscored], providers) \
+                if score else [dict(NEUTRAL_RESULT, ai_provider='import') for _ in unscored]
+            for entry, result in zip(unscored, results):
+                entry['emotion_label'] = result['emotion_label']
+                entry['sentiment_score'] = result['sentiment_score']
+                entry['ai_provider'] = entry['ai_provider'] or result.get('ai_provider', 'huggingface')
+        for entry in entries:
+            entry['ai_provider'] = entry['ai_provider'] or 'import'
+            entry['detailed_analysis'] = entry['detailed_analysis'] or build_detailed_analysis(
+                entry['emotion_label'], entry['sentiment_score']
+            )
+        stored = storage.insert_entries(entries)
+        # One event per batch: clients reload the list rather than apply thousands of rows
+        publish('entries_imported', {'count': len(stored)})
+        publish_stats()
+        return len(stored)
+
+    return run_import(stream, fmt, insert_batch, batch_size, on_batch)
+
+# IntaSend Payment Integration
+def intasend_checkout_request(amount, plan_type, reference=None):
+    """(url, headers, payload) for an IntaSend checkout, or None in demo mode"""
+    # IntaSend API configuration
+    INTASEND_API_KEY = os.getenv('INTASEND_API_KEY')
+    INTASEND_PUBLISHABLE_KEY = os.getenv('INTASEND_PUBLISHABLE_KEY')
+    
+    if not INTASEND_API_KEY:
+        return None
+    
+    # IntaSend API endpoint
+    API_URL = f"{INTASEND_API_BASE}/v1/checkout/"
+    
+    headers = {
+        "Authorization": f"Bearer {INTASEND_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    
+    payload = {
+        "amount": amount,
+        "currency": "USD",
+        "description": f"Mood Journal {plan_type.title()} Plan",
+        "success_url": "http://localhost:5000/payment/success",
+        "cancel_url": "http://localhost:5000/payment/cancel",
+        "metadata": {
+            "plan_type": plan_type,
+            "app": "mood_journal"
+        }
+    }
+    if reference:
+        # Ties the checkout to our payment row in the IntaSend dashboard
+        payload["api_ref"] = reference
+    return API_URL, headers, payload
+
+def demo_checkout():
+    # Fallback for demo purposes
+    return {
+        'success': True,
+        'payment_url': 'https://intasend.com/demo-payment',
+        'payment_id': f'demo_{datetime.now().strftime("%Y%m%d%H%M%S")}'
+    }
+
+def intasend_checkout_result(response):
+    """Normalize an IntaSend checkout response"""
+    if response.status_code == 200:
+        result = response.json()
+        return {
+            'success': True,
+            'payment_url': result.get('payment_url'),
+            'payment_id': result.get('payment_id')
+        }
+    print(f"IntaSend API error: {response.text}")
+    return {
+        'success': False,
+        'error': 'Payment initialization failed',
+        # IntaSend did not create a checkout, so asking again is safe
+        'retryable': response.status_code in RETRYABLE_CHECKOUT_STATUSES
+    }
+
+def create_intasend_payment(amount, plan_type, reference=None):
+    """Create payment using IntaSend API"""
+    try:
+        checkout = intasend_checkout_request(amount, plan_type, reference)
+        if checkout is None:
+            return demo_checkout()
+        url, headers, payload = checkout
+        response = upstream.post(url, headers=headers, json=payload,
+                                 timeout=(HTTP_CONNECT_TIMEOUT, INTASEND_TIMEOUT))
+        return intasend_checkout_result(response)
             
     except Exception as e:
         print(f"Error creating IntaSend payment: {e}")
         return {
             'success': False,
-            'error': str(e)
+            'error': str(e),
+            # The request never reached IntaSend
+            'retryable': isinstance(e, ConnectTimeout)
         }
 
-@app.route('/')
+# Payment outbox: initiate only writes the row; a worker creates the checkout
+PAYMENT_INITIATING = 'initiating'
+PAYMENT_CHECKOUT_ATTEMPTS = int(os.getenv('PAYMENT_CHECKOUT_ATTEMPTS', '3'))
+PAYMENT_RETRY_BACKOFF = float(os.getenv('PAYMENT_RETRY_BACKOFF', '1'))
+# A row still initiating after this many seconds lost its worker and is queued again
+PAYMENT_STALE_AFTER = float(os.getenv('PAYMENT_STALE_AFTER', '120'))
+PAYMENT_STATUS_FIELDS = ('id', 'plan_type', 'amount', 'status', 'payment_url', 'error')
+
+payment_pool = ProcessLocal(lambda: BoundedExecutor(
+    max_workers=int(os.getenv('PAYMENT_WORKERS', '2')),
+    max_queue=int(os.getenv('PAYMENT_QUEUE_SIZE', '100')),
+    name='payments',
+), 'payment_pool')
+# Payment ids with a checkout queued or running in this process
+checkouts_in_flight = ProcessLocal(InFlight, 'checkouts_in_flight')
+
+def payment_status(payment):
+    """What the client sees of a payment row while it waits for the checkout"""
+    return {field: payment.get(field) for field in PAYMENT_STATUS_FIELDS}
+
+def create_checkout(payment):
+    """Outbox worker: create the IntaSend checkout for a payment row and store the result"""
+    try:
+        for attempt in range(PAYMENT_CHECKOUT_ATTEMPTS):
+            result = create_intasend_payment(payment['amount'], payment['plan_type'], payment.get('idempotency_key'))
+            if result['success'] or not result.get('retryable') or attempt + 1 == PAYMENT_CHECKOUT_ATTEMPTS:
+                break
+            time.sleep(PAYMENT_RETRY_BACKOFF * 2 ** attempt)
+        
+        if result['success']:
+            update = {
+                'status': 'pending',
+                'intasend_payment_id': result.get('payment_id'),
+                'payment_url': result.get('payment_url'),
+            }
+        else:
+            update = {'status': 'failed', 'error': result.get('error', 'Payment failed')}
+        storage.update_payment(payment['id'], update)
+        payment = dict(payment, **update)
+        publish('payment_updated', payment_status(payment))
+        return payment
+    finally:
+        checkouts_in_flight.release(payment['id'])
+
+def queue_checkout(payment):
+    """Hand a payment to the checkout workers; False when the queue is full"""
+    if not checkouts_in_flight.claim(payment['id']):
+        return True
+    if payment_pool.try_submit(create_checkout, payment) is None:
+        checkouts_in_flight.release(payment['id'])
+        return False
+    return True
+
+def can_queue_checkout():
+    """True while the checkout queue has room"""
+    return payment_pool.depth() < payment_pool.max_workers + payment_pool.max_queue
+
+def requeue_if_stale(payment):
+    """Queue a checkout again when the worker that owned it is gone (crash or restart)"""
+    if payment.get('status') != PAYMENT_INITIATING:
+        return
+    try:
+        created = datetime.fromisoformat(str(payment['created_at']))
+    except (KeyError, ValueError):
+        return
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    if (datetime.now(timezone.utc) - created).total_seconds() > PAYMENT_STALE_AFTER:
+        queue_checkout(payment)
+
+def open_payment(data, idempotency_key=None):
+    """
+    Write the payment row for an initiate request once per idempotency key and
+    queue its checkout. Returns ``(payment, created)``.
+    """
+    data = data or {}
+    payment, created = storage.insert_payment_once({
+        'plan_type': data.get('plan_type', 'basic'),
+        'amount': data.get('amount', 5.99),
+        'status': PAYMENT_INITIATING,
+        # Without a key from the client every request is a new payment
+        'idempotency_key': idempotency_key or data.get('idempotency_key') or uuid.uuid4().hex,
+    })
+    if not created:
+        requeue_if_stale(payment)
+        return payment, False
+    
+    if not queue_checkout(payment):
+        # Queue filled up since the check: create the checkout inline instead
+        payment = create_checkout(payment)
+    return payment, True
+
+# Payment reconciliation: pending payments are settled from IntaSend's view
+INTASEND_STATES = {'COMPLETE': 'completed', 'FAILED': 'failed'}
+# Seconds between background runs (0: only run when woken by a checkout return or POST /api/payments/reconcile)
+RECONCILE_INTERVAL = float(os.getenv('RECONCILE_INTERVAL', '300'))
+
+def intasend_payment_status(intasend_payment_id):
+    """New status for a checkout from IntaSend, or None while it is still open"""
+    if intasend_payment_id.startswith('demo_'):
+        # demo_checkout() stands in for a checkout that always succeeds
+        return 'completed'
+    api_key = os.getenv('INTASEND_API_KEY')
+    if not api_key:
+        return None
+    response = upstream.post(
+        f"{INTASEND_API_BASE}/v1/payment/status/",
+        headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+        json={"invoice_id": intasend_payment_id},
+        timeout=(HTTP_CONNECT_TIMEOUT, INTASEND_TIMEOUT),
+    )
+    response.raise_for_status()
+    state = ((response.json() or {}).get('invoice') or {}).get('state', '')
+    return INTASEND_STATES.get(str(state).upper())
+
+def payments_reconciled(status, payment_ids):
+    if METRICS_ENABLED:
+        payments_reconciled_total.inc(len(payment_ids), status=status)
+
+reconciler = ProcessLocal(lambda: PaymentReconciler(
+    storage, intasend_payment_status,
+    TokenBucket(float(os.getenv('RECONCILE_RATE', '5')), int(os.getenv('RECONCILE_BURST', '10'))),
+    db_path=os.getenv('RECONCILE_DB', os.path.join(INSTANCE_PATH, 'reconcile.db')) or None,
+    batch_size=int(os.getenv('RECONCILE_BATCH_SIZE', '100')),
+    concurrency=int(os.getenv('RECONCILE_CONCURRENCY', '4')),
+    stale_after=float(os.getenv('RECONCILE_STALE_AFTER', '600')),
+    expire_after=float(os.getenv('RECONCILE_EXPIRE_AFTER', '86400')),
+    max_per_run=int(os.getenv('RECONCILE_MAX_PER_RUN', '1000')),
+    on_update=payments_reconciled,
+), 'reconciler')
+
+def start_reconciler():
+    if RECONCILE_INTERVAL > 0:
+        reconciler.start(RECONCILE_INTERVAL)
+
+@bp.route('/')
 def index():
     """Serve the main application"""
     return render_template('index.html')
 
-@app.route('/api/entries', methods=['GET'])
+@bp.route('/api/entries', methods=['GET'])
+@conditional('entries', changes_cursor=True)
 def get_entries():
-    """Get all journal entries from Supabase"""
+    """Get one page of journal entries, newest first (keyset-paginated)"""
     try:
-        if supabase:
-            # Query from Supabase
-            response = supabase.table('journal_entries').select('*').order('created_at', desc=True).execute()
-            entries = response.data
-        else:
-            # Fallback: return empty list
-            entries = []
+        try:
+            limit = parse_limit(request.args.get('limit'), ENTRIES_PAGE_SIZE, ENTRIES_MAX_PAGE_SIZE)
+            columns = parse_fields(request.args.get('fields'))
+            cursor = request.args.get('cursor')
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Read before the first page: changes made while the client pages
+        # through are replayed by /api/entries/changes, never missed
+        changes_cursor = storage.entry_changes_cursor() if after is None else None
         
-        return jsonify(entries)
+        # One extra row tells us whether there is a next page
+        entries = storage.list_entries(columns, limit + 1, after)
+        
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        response = jsonify(entries)
+        if changes_cursor is not None:
+            response.headers['X-Changes-Cursor'] = str(changes_cursor)
+        if has_more and entries:
+            next_cursor = encode_cursor(entries[-1])
+            response.headers['X-Next-Cursor'] = next_cursor
+            response.headers['Link'] = f'<{request.path}?cursor={next_cursor}&limit={limit}>; rel="next"'
+        return response
     except Exception as e:
         print(f"Error getting entries: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/ai/analyze', methods=['POST'])
+@bp.route('/api/entries/changes', methods=['GET'])
+def get_entry_changes():
+    """Entries created, updated or deleted since a change cursor (delta sync)"""
+    try:
+        try:
+            limit = parse_limit(request.args.get('limit'), CHANGES_PAGE_SIZE, CHANGES_MAX_PAGE_SIZE)
+            columns = parse_fields(request.args.get('fields'))
+            since = decode_change_cursor(request.args.get('since'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        rows = storage.list_entry_changes(since, limit + 1, columns)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if not rows and since > storage.entry_changes_cursor():
+            # The journal was reset or restored since this cursor was issued
+            return jsonify({'error': 'Change cursor is no longer valid; reload all entries'}), 410
+        
+        return jsonify({
+            'changes': [row['entry'] for row in rows if row['entry'] is not None],
+            'deleted': [row['id'] for row in rows if row['entry'] is None],
+            'cursor': str(rows[-1]['seq'] if rows else since),
+            'has_more': has_more,
+        })
+    except Exception as e:
+        print(f"Error getting entry changes: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def export_response(rows, fmt, fields, name):
+    """Stream rows as an NDJSON/CSV download without building the body in memory"""
+    filename = f"mood-journal-{name}-{date.today().strftime('%Y%m%d')}.{fmt}"
+    return Response(
+        stream_with_context(stream_rows(rows, fmt, fields)),
+        mimetype=MIMETYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+@bp.route('/api/entries/export', methods=['GET'])
+def export_entries():
+    """Stream all entries (optionally filtered by date range and emotion) as NDJSON or CSV"""
+    try:
+        try:
+            fmt = parse_format(request.args.get('format'))
+            columns = parse_fields(request.args.get('fields'))
+            created_from, created_to = parse_range(request.args.get('from'), request.args.get('to'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        emotions = [e.strip().lower() for e in request.args.get('emotion', '').split(',') if e.strip()]
+        
+        rows = storage.iter_entries(
+            columns, EXPORT_PAGE_SIZE,
+            created_from=created_from, created_to=created_to, emotions=emotions or None,
+        )
+        return export_response(rows, fmt, columns, 'entries')
+    except Exception as e:
+        print(f"Error exporting entries: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/entries/search', methods=['GET'])
+@conditional('entries')
+def search_entries():
+    """Full-text search over entries, best match first, with highlighted snippets"""
+    try:
+        terms = parse_query(request.args.get('q'))
+        if not terms:
+            return jsonify({'error': 'q is required'}), 400
+        try:
+            limit = parse_limit(request.args.get('limit'), SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE)
+            offset = parse_offset(request.args.get('offset'))
+            created_from, created_to = parse_range(request.args.get('from'), request.args.get('to'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        emotions = [e.strip().lower() for e in request.args.get('emotion', '').split(',') if e.strip()]
+        
+        # One extra row tells us whether there is a next page
+        results = storage.search_entries(
+            terms, limit + 1, offset,
+            created_from=created_from, created_to=created_to, emotions=emotions or None,
+        )
+        has_more = len(results) > limit
+        results = results[:limit]
+        for result in results:
+            result['snippet'] = highlight(result.get('snippet'))
+        
+        return jsonify({
+            'query': request.args.get('q'),
+            'results': results,
+            'next_offset': offset + limit if has_more else None,
+        })
+    except Exception as e:
+        print(f"Error searching entries: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/ai/analyze', methods=['POST'])
 def analyze_emotion():
     """Analyze emotion without saving to database"""
     try:
-        data = request.get_json()
-        content = data.get('content', '').strip()
+        data = json_body()
+        content = str(data.get('content') or '').strip()
         
         if not content:
             return jsonify({'error': 'Content is required'}), 400
         
-        # Analyze sentiment
-        sentiment_result = analyze_sentiment(content)
-
-        # Add AI provider info and friendlier message
-        label = sentiment_result.get('emotion_label', 'neutral')
-        score = sentiment_result.get('sentiment_score', 0.5)
-        sentiment_result['ai_provider'] = 'huggingface'
-        if label in ['happy', 'joy', 'positive']:
-            message = "You're expressing positive feelings. Keep noting what made your day better."
-        elif label in ['sad', 'negative']:
-            message = "I'm sensing sadness. Consider writing what might help you feel a bit better."
-        elif label in ['angry']:
-            message = "There’s anger in your words. A short break or deep breaths could help."
-        elif label in ['fear']:
-            message = "I see some fear/anxiety. Identifying one small step can reduce it."
-        elif label in ['disgust']:
-            message = "You might be feeling aversion. Noting triggers can provide clarity."
-        elif label in ['surprise']:
-            message = "Surprise detected. Capture what was unexpected and how you felt."
-        else:
-            message = "Neutral tone detected. Add more detail to capture your feelings."
-        sentiment_result['detailed_analysis'] = f"{label.title()} ({score*100:.0f}%). {message}"
+        # Optionally pin one engine, e.g. {"provider": "local"} for instant results
+        provider = data.get('provider')
+        if provider and provider not in sentiment_providers:
+            return jsonify({'error': f'Unknown provider: {provider}'}), 400
+
+        sentiment_result = analyze_sentiment(
+            content, [provider] if provider else None, rate_limited=True,
+            client=client_key(request.remote_addr, request.headers.get('X-Forwarded-For')),
+        )
+
+        # Add a friendlier message (ai_provider is set by whichever engine answered)
+        sentiment_result['detailed_analysis'] = build_detailed_analysis(
+            sentiment_result.get('emotion_label', 'neutral'),
+            sentiment_result.get('sentiment_score', 0.5),
+        )
         
         return jsonify(sentiment_result)
         
+    except RateLimited as e:
+        return jsonify(rate_limit_refusal(e)), 429, {'Retry-After': e.retry_after_header()}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/entries', methods=['POST'])
+@bp.route('/api/ai/analyze/batch', methods=['POST'])
+def analyze_emotion_batch():
+    """Analyze a list of texts without saving; results keep the input order"""
+    try:
+        data = json_body()
+        texts = data.get('texts')
+
+        if not isinstance(texts, list) or not texts:
+            return jsonify({'error': 'texts must be a non-empty list'}), 400
+        if len(texts) > SENTIMENT_BATCH_MAX:
+            return jsonify({'error': f'At most {SENTIMENT_BATCH_MAX} texts per request'}), 413
+
+        provider = data.get('provider')
+        if provider and provider not in sentiment_providers:
+            return jsonify({'error': f'Unknown provider: {provider}'}), 400
+
+        contents = [text.strip() if isinstance(text, str) else '' for text in texts]
+        valid = [content for content in contents if content]
+        analyzed = iter(analyze_sentiment_batch(valid, [provider] if provider else None))
+
+        results = []
+        for content in contents:
+            if not content:
+                results.append({'error': 'Content is required'})
+                continue
+            sentiment_result = next(analyzed)
+            sentiment_result['detailed_analysis'] = build_detailed_analysis(
+                sentiment_result.get('emotion_label', 'neutral'),
+                sentiment_result.get('sentiment_score', 0.5),
+            )
+            results.append(sentiment_result)
+
+        return jsonify({
+            'results': results,
+            'total': len(texts),
+            'unique': len({normalize_text(content) for content in valid}),
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/ai/cache', methods=['GET'])
+def sentiment_cache_stats():
+    """Report sentiment cache hit/miss counters"""
+    return jsonify(sentiment_cache.stats())
+
+@bp.route('/api/ai/limits', methods=['GET'])
+def analysis_limits():
+    """Report analysis admission control and request coalescing counters"""
+    return jsonify({
+        'client': client_limits.stats() if AI_CLIENT_RATE > 0 else None,
+        'upstream': upstream_admission.stats() if AI_GLOBAL_RATE > 0 else None,
+        'coalescing': analysis_flights.stats(),
+    })
+
+@bp.route('/api/ai/models', methods=['GET'])
+def model_status():
+    """Report circuit breaker and load state for each sentiment model"""
+    breakers = model_dispatcher.breaker_states()
+    loading = model_loading.stats()
+    return jsonify({
+        model: dict(breakers.get(model, {}), loading=loading.get(model))
+        for model in list(breakers) + [model for model in loading if model not in breakers]
+    })
+
+@bp.route('/api/ai/warmup', methods=['GET'])
+def model_warmup_status():
+    """Report warm-up pings for the preferred sentiment model"""
+    if not is_built(model_warmup):
+        return jsonify({'running': False, 'interval': HF_WARMUP_INTERVAL})
+    return jsonify(model_warmup.stats())
+
+@bp.route('/api/compression', methods=['GET'])
+def compression_stats():
+    """Response compression counters and the active JSON encoder"""
+    compressor = current_app.extensions.get('compression')
+    return jsonify({
+        'json_engine': current_app.json.engine,
+        'compression': compressor.stats() if compressor else None,
+    })
+
+cache_lookups = metrics.gauge('sentiment_cache_lookups', 'Sentiment cache lookups by result', ('result',))
+cache_hit_ratio = metrics.gauge('sentiment_cache_hit_ratio', 'Share of sentiment cache lookups served from cache')
+cache_entries = metrics.gauge('sentiment_cache_entries', 'Cached analyses per tier', ('tier',))
+breaker_state = metrics.gauge('model_breaker_state', 'Circuit breaker per model (0 closed, 1 half-open, 2 open)', ('model',))
+scoring_queue = metrics.gauge('scoring_queue_depth', 'Background analyses queued or running')
+payment_queue = metrics.gauge('payment_queue_depth', 'Payment checkouts queued or running')
+pool_reuse = metrics.gauge('upstream_connection_reuse_ratio', 'Upstream requests that reused a connection', ('host',))
+stream_clients = metrics.gauge('sse_clients', 'Open /api/stream connections in this process')
+model_loading_state = metrics.gauge('sentiment_model_loading', 'Whether a model last answered 503 loading (1) or not (0)', ('model',))
+ai_queue_waiting = metrics.gauge('ai_upstream_queue_waiting', 'Analyses waiting for an upstream rate-limit token')
+reconcile_lag = metrics.gauge('payment_reconcile_lag_seconds', 'Age of the oldest payment the last reconciliation left pending')
+BREAKER_STATE_VALUES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+def collect_live_metrics():
+    """Copy cache, breaker, queue and pool snapshots into gauges at scrape time"""
+    # A scrape never builds clients that no request has needed yet
+    if is_built(sentiment_cache):
+        cache = sentiment_cache.stats()
+        cache_lookups.set(cache['hits'] - cache['disk_hits'], result='memory_hit')
+        cache_lookups.set(cache['disk_hits'], result='disk_hit')
+        cache_lookups.set(cache['misses'], result='miss')
+        cache_hit_ratio.set(cache['hit_ratio'])
+        cache_entries.set(cache['memory_entries'], tier='memory')
+        if cache['disk_entries'] is not None:
+            cache_entries.set(cache['disk_entries'], tier='disk')
+    if is_built(model_dispatcher):
+        for model, snapshot in model_dispatcher.breaker_states().items():
+            breaker_state.set(BREAKER_STATE_VALUES.get(snapshot['state'], 2), model=model)
+    if is_built(scoring_pool):
+        scoring_queue.set(scoring_pool.depth())
+    if is_built(payment_pool):
+        payment_queue.set(payment_pool.depth())
+    if is_built(upstream):
+        for host, pool in upstream.stats().items():
+            pool_reuse.set(pool['reuse_ratio'], host=host)
+    if is_built(events):
+        stream_clients.set(events.stats()['subscribers'])
+    for model, snapshot in model_loading.stats().items():
+        model_loading_state.set(1 if snapshot['state'] == 'loading' else 0, model=model)
+    if AI_GLOBAL_RATE > 0:
+        ai_queue_waiting.set(upstream_admission.stats()['waiting'])
+    if is_built(reconciler):
+        last_run = reconciler.stats()['last_run']
+        if last_run:
+            reconcile_lag.set(last_run['lag_seconds'])
+
+metrics.register_collector(collect_live_metrics)
+
+@bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    if not METRICS_ENABLED:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@bp.route('/api/upstream/pools', methods=['GET'])
+def upstream_pool_stats():
+    """Report connection reuse for each upstream host"""
+    return jsonify(upstream.stats())
+
+@bp.route('/api/entries', methods=['POST'])
 def create_entry():
     """Create a new journal entry with sentiment analysis"""
     try:
-        data = request.get_json()
-        content = data.get('content', '').strip()
-        
-        if not content:
-            return jsonify({'error': 'Content is required'}), 400
-        
-        # Get emotion data from request or analyze if not provided
-        emotion_label = data.get('emotion_label')
-        sentiment_score = data.get('sentiment_score')
-        ai_provider = data.get('ai_provider', 'huggingface')
-        detailed_analysis = data.get('detailed_analysis')
+        try:
+            content, analysis, run_async = parse_entry_request(json_body())
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        if not emotion_label or sentiment_score is None:
+        if analysis is None:
+            if run_async and can_score_later():
+                new_entry, status = save_pending_entry(content)
+                return jsonify(new_entry), status
             # Analyze sentiment if not provided
-            sentiment_result = analyze_sentiment(content)
-            emotion_label = sentiment_result['emotion_label']
-            sentiment_score = sentiment_result['sentiment_score']
-            ai_provider = sentiment_result.get('ai_provider', 'huggingface')
-            detailed_analysis = sentiment_result.get('detailed_analysis')
+            analysis = analysis_fields(analyze_sentiment(content))
         
-        # Prepare entry data
-        entry_data = {
-            'content': content,
-            'sentiment_score': sentiment_score,
-            'emotion_label': emotion_label,
-            'ai_provider': ai_provider,
-            'detailed_analysis': detailed_analysis
-        }
+        return jsonify(save_entry(content, analysis)), 201
         
-        if supabase:
-            # Insert into Supabase
-            response = supabase.table('journal_entries').insert(entry_data).execute()
-            new_entry = response.data[0] if response.data else entry_data
-        else:
-            # Fallback: return the data without saving
-            new_entry = entry_data
-            new_entry['id'] = datetime.now().timestamp()
-            print("⚠️ Supabase not available. Entry not saved.")
+    except Exception as e:
+        print(f"Error creating entry: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/entries/import', methods=['POST'])
+def import_entries_route():
+    """Bulk import entries from a JSONL or CSV body (or a multipart "file" upload)"""
+    try:
+        upload = request.files.get('file')
+        try:
+            fmt = detect_format(
+                request.args.get('format'),
+                upload.filename if upload else None,
+                upload.content_type if upload else request.content_type,
+            )
+            batch_size = parse_limit(request.args.get('batch_size'), IMPORT_BATCH_SIZE, IMPORT_MAX_BATCH_SIZE)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        provider = request.args.get('provider')
+        if provider and provider not in sentiment_providers:
+            return jsonify({'error': f'Unknown provider: {provider}'}), 400
+        score = request.args.get('score', 'true').lower() in ('1', 'true', 'yes')
+
+        # Decode the body as it arrives instead of reading it into memory
+        raw = upload.stream if upload else request.stream
+        stream = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+        report = import_entries(stream, fmt, batch_size, score, [provider] if provider else None)
+
+        status = 200 if report['inserted'] or not report['rows'] else 422
+        return jsonify(report), status
+
+    except Exception as e:
+        print(f"Error importing entries: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/entries/<int:entry_id>/analysis', methods=['GET'])
+def get_entry_analysis(entry_id):
+    """Poll the analysis state of an entry saved with async_analysis"""
+    try:
+        job = analysis_jobs.get(entry_id)
+        if job:
+            return jsonify(dict(job, queue_depth=scoring_pool.depth()))
         
-        return jsonify(new_entry), 201
+        row = storage.get_entry(
+            entry_id, ['id', 'emotion_label', 'sentiment_score', 'ai_provider', 'detailed_analysis']
+        )
+        if not row:
+            return jsonify({'error': 'Entry not found'}), 404
         
+        row['status'] = 'pending' if row.get('emotion_label') == PENDING_LABEL else 'done'
+        return jsonify(row)
     except Exception as e:
-        print(f"Error creating entry: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/entries/<int:entry_id>', methods=['DELETE'])
+@bp.route('/api/ai/queue', methods=['GET'])
+def scoring_queue_stats():
+    """Report background scoring queue depth and throughput"""
+    return jsonify(scoring_pool.stats())
+
+@bp.route('/api/entries/<int:entry_id>', methods=['DELETE'])
 def delete_entry(entry_id):
-    """Delete a journal entry from Supabase"""
+    """Delete a journal entry"""
     try:
-        if supabase:
-            # Delete from Supabase
-            supabase.table('journal_entries').delete().eq('id', entry_id).execute()
-        else:
-            print("⚠️ Supabase not available. Entry not deleted.")
+        # The deleted row comes back so its day's trend point can be sent
+        row = storage.delete_entry(entry_id)
+        if row:
+            publish('entry_deleted', {'id': entry_id})
+            publish_stats(row)
         
         return jsonify({'message': 'Entry deleted successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/stats', methods=['GET'])
+def parse_last_event_id(value):
+    """Last-Event-ID header (or ?last_event_id=) as an int; anything else starts fresh"""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+@bp.route('/api/stream', methods=['GET'])
+def event_stream():
+    """Server-Sent Events: entry and stats changes as they happen"""
+    subscription = events.subscribe(parse_last_event_id(
+        request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    ), limit=SSE_WSGI_MAX_CLIENTS)
+    if subscription is None:
+        return jsonify({'error': 'Too many open streams'}), 503, {'Retry-After': '10'}
+
+    def generate():
+        deadline = time.monotonic() + SSE_MAX_AGE
+        try:
+            # EventSource reconnects after this many ms, sending Last-Event-ID
+            yield 'retry: 3000\n\n'
+            while time.monotonic() < deadline:
+                event = subscription.get(timeout=min(SSE_HEARTBEAT, max(deadline - time.monotonic(), 0)))
+                if event and event['type'] == 'stats':
+                    event = stats_event(event)
+                # Comments keep proxies from closing an idle stream
+                yield format_event(event) if event else ': keep-alive\n\n'
+        finally:
+            events.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@bp.route('/api/stats', methods=['GET'])
+@conditional('entries', 'stats')
 def get_stats():
-    """Get mood statistics for charts from Supabase"""
+    """Get mood statistics for charts from the aggregate store"""
     try:
-        if supabase:
-            # Get all entries from Supabase
-            response = supabase.table('journal_entries').select('*').execute()
-            entries = response.data
-        else:
-            # Fallback: return empty stats
-            entries = []
+        ensure_mood_stats_fresh()
+        snapshot = mood_stats.snapshot()
+        points = mood_stats.trends('day', limit=TREND_DEFAULT_POINTS['day'])
         
-        # Count emotions
-        emotion_counts = {}
-        for entry in entries:
-            emotion = entry.get('emotion_label', 'neutral')
-            emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-        
-        # Get recent entries for trend
-        recent_entries = entries[:10]  # Get last 10 entries
-        trend_data = [
-            {
-                'date': entry.get('created_at', '').split('T')[0] if entry.get('created_at') else '',
-                'score': entry.get('sentiment_score', 0.5),
-                'emotion': entry.get('emotion_label', 'neutral')
-            }
-            for entry in recent_entries
-        ]
+        # Daily rollups for the trend line, oldest first
+        trend_data = daily_trend(points)
         
         return jsonify({
-            'emotion_counts': emotion_counts,
+            'emotion_counts': snapshot['emotion_counts'],
             'trend_data': trend_data,
-            'total_entries': len(entries)
+            'total_entries': snapshot['total_entries'],
+            'average_score': snapshot['average_score']
         })
         
     except Exception as e:
         print(f"Error getting stats: {e}")
         return jsonify({'error': str(e)}), 500
 
-# Payment Routes
-@app.route('/api/payment/initiate', methods=['POST'])
-def initiate_payment():
-    """Initiate payment with IntaSend"""
+@bp.route('/api/stats/trends', methods=['GET'])
+@conditional('entries', 'stats')
+def get_trends():
+    """Mood trend rollups: ?granularity=day|week|month&from=YYYY-MM-DD&to=YYYY-MM-DD"""
     try:
-        data = request.get_json()
-        plan_type = data.get('plan_type', 'basic')
-        amount = data.get('amount', 5.99)
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in TREND_DEFAULT_POINTS:
+            return jsonify({'error': 'granularity must be day, week or month'}), 400
+        try:
+            start = date.fromisoformat(request.args['from']) if request.args.get('from') else None
+            end = date.fromisoformat(request.args['to']) if request.args.get('to') else None
+            # Without an explicit range, return the most recent buckets only
+            default_limit = None if start else TREND_DEFAULT_POINTS[granularity]
+            limit = parse_limit(request.args.get('limit'), default_limit, TREND_MAX_POINTS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Create payment record in Supabase
-        payment_data = {
-            'plan_type': plan_type,
-            'amount': amount,
-            'status': 'pending'
-        }
+        ensure_mood_stats_fresh()
+        points = mood_stats.trends(granularity, start, end, limit)
         
-        if supabase:
-            response = supabase.table('payments').insert(payment_data).execute()
-            payment = response.data[0] if response.data else payment_data
-        else:
-            payment = payment_data
-            payment['id'] = datetime.now().timestamp()
-            print("⚠️ Supabase not available. Payment not saved.")
-        
-        # Create IntaSend payment
-        payment_result = create_intasend_payment(amount, plan_type)
+        return jsonify({'granularity': granularity, 'points': points})
+    except Exception as e:
+        print(f"Error getting trends: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/stats/rebuild', methods=['POST'])
+def rebuild_stats():
+    """Recompute mood statistics from a full scan"""
+    try:
+        total = rebuild_mood_stats()
+        return jsonify({'message': 'Stats rebuilt', 'total_entries': total})
+    except Exception as e:
+        print(f"Error rebuilding stats: {e}")
+        return jsonify({'error': str(e)}), 500
+
+# Payment Routes
+@bp.route('/api/payment/initiate', methods=['POST'])
+def initiate_payment():
+    """
+    Initiate payment with IntaSend. Returns 202 while the checkout is being
+    created; poll /api/payments/<id> (or listen for payment_updated) for the
+    payment_url. Repeating a request with the same Idempotency-Key returns the
+    same payment.
+    """
+    try:
+        if not can_queue_checkout():
+            return jsonify({'error': 'Payment service is busy, please retry'}), 503, {'Retry-After': '5'}
         
-        if payment_result['success']:
-            # Update payment record with IntaSend payment ID
-            if supabase and payment.get('id'):
-                supabase.table('payments').update({
-                    'intasend_payment_id': payment_result.get('payment_id')
-                }).eq('id', payment['id']).execute()
-            
-            return jsonify({
-                'success': True,
-                'payment_url': payment_result['payment_url'],
-                'payment_id': payment.get('id')
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': payment_result.get('error', 'Payment failed')
-            }), 400
+        payment, _ = open_payment(json_body(), request.headers.get('Idempotency-Key'))
+        body = dict(payment_status(payment), success=payment['status'] != 'failed', payment_id=payment['id'])
+        status = 202 if payment['status'] == PAYMENT_INITIATING else 200
+        return jsonify(body), status
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/payment/success')
+@bp.route('/api/payments/<int:payment_id>', methods=['GET'])
+def get_payment(payment_id):
+    """Poll a payment until the checkout worker has stored its payment_url"""
+    try:
+        payment = storage.get_payment(payment_id)
+        if not payment:
+            return jsonify({'error': 'Payment not found'}), 404
+        requeue_if_stale(payment)
+        return jsonify(payment_status(payment))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def wake_reconciler():
+    """A checkout just ended: have the reconciler ask IntaSend soon"""
+    try:
+        reconciler.start(RECONCILE_INTERVAL if RECONCILE_INTERVAL > 0 else None)
+        reconciler.wake()
+    except Exception as e:
+        print(f"Error waking payment reconciler: {e}")
+
+@bp.route('/payment/success')
 def payment_success():
     """Handle successful payment"""
-    payment_id = request.args.get('payment_id')
-    
-    if payment_id and supabase:
-        try:
-            supabase.table('payments').update({
-                'status': 'completed'
-            }).eq('intasend_payment_id', payment_id).execute()
-        except Exception as e:
-            print(f"Error updating payment status: {e}")
+    # The query string is not proof of payment; the status comes from IntaSend
+    if request.args.get('payment_id'):
+        wake_reconciler()
     
     return render_template('payment_success.html')
 
-@app.route('/payment/cancel')
+@bp.route('/payment/cancel')
 def payment_cancel():
     """Handle cancelled payment"""
-    payment_id = request.args.get('payment_id')
-    
-    if payment_id and supabase:
-        try:
-            supabase.table('payments').update({
-                'status': 'cancelled'
-            }).eq('intasend_payment_id', payment_id).execute()
-        except Exception as e:
-            print(f"Error updating payment status: {e}")
+    if request.args.get('payment_id'):
+        wake_reconciler()
     
     return render_template('payment_cancel.html')
 
-@app.route('/api/payments', methods=['GET'])
+@bp.route('/api/payments', methods=['GET'])
+@conditional('payments')
 def get_payments():
-    """Get all payments from Supabase"""
+    """Get one page of payments, newest first (keyset-paginated, optionally by status)"""
     try:
-        if supabase:
-            response = supabase.table('payments').select('*').order('created_at', desc=True).execute()
-            payments = response.data
-        else:
-            payments = []
+        try:
+            limit = parse_limit(request.args.get('limit'), PAYMENTS_PAGE_SIZE, PAYMENTS_MAX_PAGE_SIZE)
+            cursor = request.args.get('cursor')
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        status = request.args.get('status') or None
         
-        return jsonify(payments)
+        payments = storage.list_payments(limit + 1, after, status=status)
+        
+        has_more = len(payments) > limit
+        payments = payments[:limit]
+        response = jsonify(payments)
+        if has_more and payments:
+            next_cursor = encode_cursor(payments[-1])
+            response.headers['X-Next-Cursor'] = next_cursor
+            response.headers['Link'] = f'<{request.path}?cursor={next_cursor}&limit={limit}>; rel="next"'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/payments/reconcile', methods=['GET'])
+def reconcile_status():
+    """Counts and lag from the last reconciliation run"""
+    try:
+        return jsonify(reconciler.stats())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@bp.route('/api/payments/reconcile', methods=['POST'])
+def reconcile_payments():
+    """
+    Wake the background reconciler; requests made before it starts share one
+    run. GET reports the outcome.
+    """
+    wake_reconciler()
+    return jsonify({'started': True}), 202
+
+@bp.route('/api/payments/export', methods=['GET'])
+def export_payments():
+    """Stream payments (optionally filtered by date range and status) as NDJSON or CSV"""
+    try:
+        try:
+            fmt = parse_format(request.args.get('format'))
+            created_from, created_to = parse_range(request.args.get('from'), request.args.get('to'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        rows = storage.iter_payments(
+            EXPORT_PAGE_SIZE,
+            created_from=created_from, created_to=created_to, status=request.args.get('status') or None,
+        )
+        return export_response(rows, fmt, PAYMENT_FIELDS, 'payments')
+    except Exception as e:
+        print(f"Error exporting payments: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+# Warm-up: build this process's clients and fill caches before traffic arrives
+WARMUP_ON_START = os.getenv('WARMUP_ON_START', 'true').lower() in ('1', 'true', 'yes')
+startup_seconds = metrics.gauge('app_startup_seconds', 'Seconds from process start to each startup milestone', ('phase',))
+_readiness = {}
+_readiness_lock = threading.Lock()
+
+def process_age():
+    """Seconds since this process started (Linux /proc; None elsewhere)"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Fields after the parenthesised command name; starttime is field 22
+            started_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return max(uptime - started_ticks / os.sysconf('SC_CLK_TCK'), 0.0)
+    except (OSError, ValueError, IndexError):
+        return None
+
+def readiness_state():
+    """Warm-up state for the current process (a forked worker starts cold)"""
+    pid = os.getpid()
+    state = _readiness.get(pid)
+    if state is None:
+        state = _readiness.setdefault(pid, {'state': 'cold', 'steps': {}, 'startup': {}})
+    return state
+
+def mark_startup(phase):
+    """Record how long after process start a milestone was reached"""
+    age = process_age()
+    if age is not None:
+        readiness_state()['startup'][f'{phase}_ms'] = round(age * 1000, 1)
+        startup_seconds.set(round(age, 4), phase=phase)
+    return age
+
+def open_upstream_connections():
+    """Open a keep-alive connection to each upstream this process will call"""
+    targets = []
+    if 'huggingface' in SENTIMENT_PROVIDER_CHAIN:
+        targets.append(HF_API_BASE)
+    if os.getenv('INTASEND_API_KEY'):
+        targets.append(INTASEND_API_BASE)
+    for url in targets:
+        # Any response leaves the connection in the pool for the first real call
+        upstream.session_for(url).head(url, timeout=(HTTP_CONNECT_TIMEOUT, 5))
+
+# (name, step); storage must succeed for the process to report ready
+WARM_UP_STEPS = [
+    ('storage', lambda: storage.count_entries()),
+    ('data_versions', lambda: storage.data_epoch()),
+    ('mood_stats', lambda: ensure_mood_stats_fresh(wait=True)),
+    ('sentiment_cache', lambda: sentiment_cache.preload()),
+    ('sentiment_models', lambda: (model_dispatcher.breaker_states(), sentiment_providers['local'].analyze('warm up'))),
+    ('scoring_pool', lambda: scoring_pool.depth()),
+    ('payment_pool', lambda: payment_pool.depth()),
+    ('payment_reconciler', start_reconciler),
+    ('model_warmup', start_model_warmup),
+    ('upstream', open_upstream_connections),
+]
+
+def warm_up():
+    """Run every warm-up step in this process; failures are logged, not raised"""
+    state = readiness_state()
+    with _readiness_lock:
+        if state['state'] != 'cold':
+            return state
+        state['state'] = 'warming'
+    started = time.perf_counter()
+    for name, step in WARM_UP_STEPS:
+        step_started = time.perf_counter()
+        try:
+            step()
+            state['steps'][name] = {'ms': round((time.perf_counter() - step_started) * 1000, 1)}
+        except Exception as e:
+            print(f"⚠️ Warm-up step '{name}' failed: {e}")
+            state['steps'][name] = {'ms': round((time.perf_counter() - step_started) * 1000, 1), 'error': str(e)}
+    state['startup']['warm_up_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    state['state'] = 'failed' if 'error' in state['steps']['storage'] else 'ready'
+    mark_startup('ready')
+    print(f"🔥 Warm-up {state['state']} in {state['startup']['warm_up_ms']:.0f} ms (pid {os.getpid()})")
+    return state
+
+def start_warm_up():
+    """Warm up in a background thread unless this process already has"""
+    if readiness_state()['state'] == 'cold':
+        threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
+def record_first_response(response):
+    state = readiness_state()
+    if 'first_response_ms' not in state['startup']:
+        age = mark_startup('first_response')
+        if age is not None:
+            print(f"⚡ First response {age * 1000:.0f} ms after process start")
+        else:
+            state['startup']['first_response_ms'] = None
+    return response
+
+@bp.route('/api/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: 200 once this process has warmed up, 503 before that"""
+    state = readiness_state()
+    if state['state'] == 'cold':
+        # WARMUP_ON_START=false: the first probe starts the warm-up
+        start_warm_up()
+    body = {
+        'ready': state['state'] == 'ready',
+        'state': state['state'],
+        'pid': os.getpid(),
+        'steps': state['steps'],
+        'startup': state['startup'],
+        'clients': build_times(),
+    }
+    return jsonify(body), 200 if body['ready'] else 503
+
+def create_app(warm_up_on_start=None):
+    """
+    Build the Flask app. Clients are created lazily in each process, so this
+    is cheap and safe to call before a pre-fork server forks its workers.
+    """
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'your-secret-key-here'
+    # orjson-backed jsonify/get_json when orjson is installed
+    app.json = FastJSONProvider(app)
+
+    CORS(app, expose_headers=['X-Next-Cursor', 'X-Changes-Cursor', 'Link', 'ETag', 'Retry-After'])
+
+    if METRICS_ENABLED:
+        app.before_request(start_request_timer)
+        # Registered before compression so the timing includes it
+        app.after_request(record_request_metrics)
+
+    # gzip/brotli for API responses and static assets of at least COMPRESS_MIN_SIZE bytes
+    if os.getenv('COMPRESSION_ENABLED', 'true').lower() in ('1', 'true', 'yes'):
+        init_compression(
+            app,
+            min_size=int(os.getenv('COMPRESS_MIN_SIZE', '1024')),
+            gzip_level=int(os.getenv('COMPRESS_GZIP_LEVEL', '6')),
+            brotli_quality=int(os.getenv('COMPRESS_BROTLI_QUALITY', '5')),
+        )
+
+    app.after_request(record_first_response)
+    app.register_blueprint(bp)
+    mark_startup('app_created')
+
+    if warm_up_on_start is None:
+        warm_up_on_start = WARMUP_ON_START
+    if warm_up_on_start:
+        start_warm_up()
+        _warm_up_after_fork()
+    return app
+
+_fork_hook_registered = False
+
+def _warm_up_after_fork():
+    # Workers forked from a preloaded app warm up their own clients
+    global _fork_hook_registered
+    if not _fork_hook_registered and hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=start_warm_up)
+        _fork_hook_registered = True
+
+# `from app import app` and `flask run` share one app, built on first access
+_default_app = None
+_default_app_lock = threading.Lock()
+
+def __getattr__(name):
+    global _default_app
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _default_app_lock:
+        if _default_app is None:
+            _default_app = create_app()
+    return _default_app
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
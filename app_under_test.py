@@ -0,0 +1,26 @@
+# Shared setup for the test scripts that drive the Flask app in-process
+import os
+import tempfile
+
+WORKDIR = tempfile.mkdtemp(prefix='mood-journal-test-')
+
+
+def load_app():
+    """Import app with every database in a scratch directory and no background jobs"""
+    for name, value in {
+        'STORAGE_BACKEND': 'sqlite',
+        'SQLITE_DB_PATH': os.path.join(WORKDIR, 'mood_journal.db'),
+        'EVENTS_DB': os.path.join(WORKDIR, 'events.db'),
+        'RECONCILE_DB': os.path.join(WORKDIR, 'reconcile.db'),
+        'SENTIMENT_CACHE_DB': '',
+        'SENTIMENT_PROVIDERS': 'local',
+        'HUGGINGFACE_API_KEY': '',
+        'INTASEND_API_KEY': '',
+        'RECONCILE_INTERVAL': '0',
+        'HF_WARMUP_INTERVAL': '0',
+        'WARMUP_ON_START': 'false',
+        'METRICS_ENABLED': 'false',
+    }.items():
+        os.environ.setdefault(name, value)
+    import app
+    return app
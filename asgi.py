@@ -0,0 +1,188 @@
+"""
+Mood Journal - ASGI serving mode
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --timeout-graceful-shutdown 5
+
+The routes that mostly wait on upstream APIs run as coroutines with the
+pooled async clients from async_pool.py, so thousands of in-flight analyses
+share one event loop instead of holding a thread each:
+
+    POST /api/ai/analyze      (Hugging Face)
+    POST /api/entries         (Hugging Face, then storage)
+    GET /api/stream           (Server-Sent Events, no thread per open stream)
+
+Everything else, including /api/stats, payments (the IntaSend call runs on
+the checkout workers, not in the request) and CORS preflight
+requests, is served by the Flask app from app.py through a WSGI bridge with
+ASGI_WSGI_THREADS threads, so both modes expose the same API. Storage calls
+are synchronous clients and run in Starlette's thread pool. Open event
+streams hold up a graceful shutdown until they end (SSE_MAX_AGE), hence the
+shutdown timeout above.
+"""
+
+import contextlib
+import os
+import time
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+# Streams WSGI responses and bounds the bridge thread pool
+from a2wsgi import WSGIMiddleware
+
+import app as journal
+from events import AsyncSubscription, format_event
+from ratelimit import RateLimited
+
+ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '16'))
+
+flask_app = journal.create_app()
+
+
+def json_response(body, status=200):
+    """JSON through the Flask app's provider (orjson when installed), CORS like Flask-CORS"""
+    return Response(
+        flask_app.json.dumps(body) + '\n',
+        status_code=status,
+        media_type='application/json',
+        headers={'Access-Control-Allow-Origin': '*'},
+    )
+
+
+async def read_json(request):
+    """``journal.json_body`` for a native route"""
+    body = await request.body()
+    try:
+        data = flask_app.json.loads(body) if body else None
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def timed(route):
+    """Run the Flask after-request bookkeeping (metrics, first response) for a native route"""
+    def wrap(handler):
+        async def endpoint(request):
+            started = time.perf_counter()
+            response = await handler(request)
+            journal.record_first_response(response)
+            if journal.METRICS_ENABLED:
+                journal.http_request_seconds.observe(
+                    time.perf_counter() - started,
+                    method=request.method, route=route, status=response.status_code,
+                )
+            return response
+        return endpoint
+    return wrap
+
+
+@timed('/api/ai/analyze')
+async def analyze_emotion(request: Request):
+    """Analyze emotion without saving to database"""
+    try:
+        data = await read_json(request)
+        content = str(data.get('content') or '').strip()
+
+        if not content:
+            return json_response({'error': 'Content is required'}, 400)
+
+        provider = data.get('provider')
+        if provider and provider not in journal.sentiment_providers:
+            return json_response({'error': f'Unknown provider: {provider}'}, 400)
+
+        client = request.client.host if request.client else None
+        sentiment_result = await journal.analyze_sentiment_async(
+            content, [provider] if provider else None, rate_limited=True,
+            client=journal.client_key(client, request.headers.get('x-forwarded-for')),
+        )
+        sentiment_result['detailed_analysis'] = journal.build_detailed_analysis(
+            sentiment_result.get('emotion_label', 'neutral'),
+            sentiment_result.get('sentiment_score', 0.5),
+        )
+        return json_response(sentiment_result)
+
+    except RateLimited as e:
+        response = json_response(journal.rate_limit_refusal(e), 429)
+        response.headers['Retry-After'] = e.retry_after_header()
+        return response
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+
+@timed('/api/entries')
+async def create_entry(request: Request):
+    """Create a new journal entry with sentiment analysis"""
+    try:
+        try:
+            content, analysis, run_async = journal.parse_entry_request(await read_json(request))
+        except ValueError as e:
+            return json_response({'error': str(e)}, 400)
+
+        if analysis is None:
+            if run_async and journal.can_score_later():
+                new_entry, status = await run_in_threadpool(journal.save_pending_entry, content)
+                return json_response(new_entry, status)
+            analysis = journal.analysis_fields(await journal.analyze_sentiment_async(content))
+
+        return json_response(await run_in_threadpool(journal.save_entry, content, analysis), 201)
+
+    except Exception as e:
+        print(f"Error creating entry: {e}")
+        return json_response({'error': str(e)}, 500)
+
+
+@timed('/api/stream')
+async def event_stream(request: Request):
+    """Server-Sent Events: entry and stats changes as they happen"""
+    subscription = journal.events.subscribe(journal.parse_last_event_id(
+        request.headers.get('last-event-id') or request.query_params.get('last_event_id')
+    ), AsyncSubscription())
+    if subscription is None:
+        response = json_response({'error': 'Too many open streams'}, 503)
+        response.headers['Retry-After'] = '10'
+        return response
+
+    async def generate():
+        deadline = time.monotonic() + journal.SSE_MAX_AGE
+        try:
+            yield 'retry: 3000\n\n'
+            while time.monotonic() < deadline:
+                event = await subscription.get(timeout=min(journal.SSE_HEARTBEAT, max(deadline - time.monotonic(), 0)))
+                if event and event['type'] == 'stats':
+                    # Reads the aggregates from storage
+                    event = await run_in_threadpool(journal.stats_event, event)
+                yield format_event(event) if event else ': keep-alive\n\n'
+        finally:
+            journal.events.unsubscribe(subscription)
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', 'Access-Control-Allow-Origin': '*',
+    })
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_):
+    # create_app() already started the warm-up unless WARMUP_ON_START=false
+    yield
+    if journal.is_built(journal.async_upstream):
+        await journal.async_upstream.aclose()
+
+
+def create_asgi_app():
+    """Native async routes first; any other path or method falls through to Flask"""
+    routes = [
+        Route('/api/ai/analyze', analyze_emotion, methods=['POST']),
+        Route('/api/entries', create_entry, methods=['POST']),
+        Route('/api/stream', event_stream, methods=['GET']),
+        Mount('/', app=WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS)),
+    ]
+    return Starlette(routes=routes, lifespan=lifespan)
+
+
+app = create_asgi_app()
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv('PORT', '5000')))
@@ -0,0 +1,180 @@
+"""
+Shared async HTTP clients for upstream APIs (ASGI mode).
+
+The async counterpart of ``http_pool.UpstreamSessions``: pooled keep-alive
+connections per upstream host with a bounded size, separate connect/read
+timeouts and the same observer hook, so thousands of in-flight calls can
+share a few hundred connections on one event loop. Connection setup is
+retried by the transport; hosts configured with ``retry_reads=True`` also
+replay a request whose reused connection was reset.
+
+httpcore rescans every connection of a pool (and every queued request)
+whenever a request starts or finishes, which turns into the main CPU cost
+once a pool holds more than a few dozen connections. Each host's connections
+are therefore split over several small ``httpx.AsyncClient`` shards, and
+calls beyond the host's limit wait on a semaphore instead of in httpcore's
+queue.
+"""
+
+import asyncio
+import contextlib
+import math
+import ssl
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+# A reused keep-alive connection that was closed by the server surfaces as one of these
+_RESET_ERRORS = (httpx.RemoteProtocolError, httpx.ReadError, httpx.WriteError)
+
+# Connections per httpx client; a host with a larger limit gets several clients
+SHARD_SIZE = 16
+
+
+class _HostPool:
+    """Connections to one host, split over small httpx pools"""
+
+    def __init__(self, max_connections, retries):
+        shards = max(1, math.ceil(max_connections / SHARD_SIZE))
+        size = math.ceil(max_connections / shards)
+        self.max_connections = size * shards
+        # Loading the CA bundle takes milliseconds; the shards share one context
+        context = ssl.create_default_context()
+        self.clients = [self._build_client(size, retries, context) for _ in range(shards)]
+        self.in_flight = [0] * shards
+        self.slots = asyncio.Semaphore(self.max_connections)
+
+    @staticmethod
+    def _build_client(size, retries, context):
+        transport = httpx.AsyncHTTPTransport(
+            verify=context,
+            retries=retries,
+            limits=httpx.Limits(max_connections=size, max_keepalive_connections=size),
+        )
+        return httpx.AsyncClient(transport=transport, headers={'Connection': 'keep-alive'})
+
+    @contextlib.asynccontextmanager
+    async def lease(self):
+        """Wait for a free connection slot and yield the least busy client"""
+        async with self.slots:
+            # Holding a slot guarantees the least busy shard has room
+            index = self.in_flight.index(min(self.in_flight))
+            self.in_flight[index] += 1
+            try:
+                yield self.clients[index]
+            finally:
+                self.in_flight[index] -= 1
+
+
+class AsyncUpstreamSessions:
+    """Registry of pooled async clients keyed by scheme://host"""
+
+    def __init__(self, max_connections=100, connect_timeout=3.05, read_timeout=20, retries=2, observer=None):
+        self.max_connections = max_connections
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        # Called as observer(url, status_code, seconds, error) after every request
+        self.observer = observer
+
+        self._pools = {}
+        self._host_options = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def configure(self, base_url, **options):
+        """Override pool options for one host (``max_connections``, ``retries``, ``retry_reads``)"""
+        with self._lock:
+            self._host_options[self._host_key(base_url)] = options
+
+    @staticmethod
+    def _host_key(url):
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def pool_for(self, url):
+        """Return the connection pool for the host of ``url``"""
+        host = self._host_key(url)
+        with self._lock:
+            pool = self._pools.get(host)
+            if pool is None:
+                options = self._host_options.get(host, {})
+                pool = self._pools[host] = _HostPool(
+                    options.get('max_connections', self.max_connections),
+                    options.get('retries', self.retries),
+                )
+                self._counters[host] = {'requests': 0, 'errors': 0, 'replayed': 0}
+            return pool
+
+    def _count(self, url, field):
+        host = self._host_key(url)
+        with self._lock:
+            if host in self._counters:
+                self._counters[host][field] += 1
+
+    def _timeout(self, timeout):
+        if timeout is None:
+            connect, read = self.connect_timeout, self.read_timeout
+        elif isinstance(timeout, tuple):
+            connect, read = timeout
+        else:
+            connect, read = min(self.connect_timeout, timeout), timeout
+        return httpx.Timeout(read, connect=connect)
+
+    async def request(self, method, url, timeout=None, **kwargs):
+        """Issue a request through the host's pool; accepts requests-style (connect, read) timeouts"""
+        pool = self.pool_for(url)
+        retry_reads = self._host_options.get(self._host_key(url), {}).get('retry_reads', True)
+        self._count(url, 'requests')
+        started = time.perf_counter()
+        attempts = 2 if retry_reads else 1
+        for attempt in range(attempts):
+            try:
+                async with pool.lease() as client:
+                    response = await client.request(method, url, timeout=self._timeout(timeout), **kwargs)
+                break
+            except _RESET_ERRORS as e:
+                if attempt + 1 < attempts:
+                    self._count(url, 'replayed')
+                    continue
+                self._fail(url, started, e)
+            except httpx.HTTPError as e:
+                self._fail(url, started, e)
+        self._observe(url, response.status_code, started, None)
+        return response
+
+    def _fail(self, url, started, error):
+        self._count(url, 'errors')
+        self._observe(url, None, started, type(error).__name__)
+        raise error
+
+    def _observe(self, url, status_code, started, error):
+        if self.observer is None:
+            return
+        try:
+            self.observer(url, status_code, time.perf_counter() - started, error)
+        except Exception as e:
+            print(f"Error recording upstream metrics: {e}")
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    def stats(self):
+        """Per-host request, error and replay counts with current pool usage"""
+        with self._lock:
+            return {host: dict(self._counters[host], max_connections=pool.max_connections,
+                               shards=len(pool.clients), in_flight=sum(pool.in_flight))
+                    for host, pool in self._pools.items()}
+
+    async def aclose(self):
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            for client in pool.clients:
+                await client.aclose()
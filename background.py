@@ -0,0 +1,117 @@
+"""
+Bounded background worker pool.
+
+A thin wrapper over ``ThreadPoolExecutor`` that caps how many jobs may be
+queued or running at once. ``try_submit`` refuses work instead of letting the
+queue grow without limit, so callers can apply backpressure. ``JobStates``
+and ``InFlight`` track the jobs a process has handed to its pools.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BoundedExecutor:
+    """Thread pool that accepts at most ``max_workers + max_queue`` jobs"""
+
+    def __init__(self, max_workers=4, max_queue=100, name='worker'):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+
+    def try_submit(self, fn, *args, **kwargs):
+        """Queue ``fn``; returns a Future, or None when the pool is full"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            return None
+        with self._lock:
+            self._in_flight += 1
+            self.submitted += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release(failed=True)
+            raise
+        future.add_done_callback(lambda done: self._release(failed=done.exception() is not None))
+        return future
+
+    def _release(self, failed=False):
+        with self._lock:
+            self._in_flight -= 1
+            if failed:
+                self.failed += 1
+            else:
+                self.completed += 1
+        self._slots.release()
+
+    def depth(self):
+        """Jobs currently queued or running"""
+        with self._lock:
+            return self._in_flight
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': self._in_flight,
+                'capacity': self.max_workers + self.max_queue,
+                'workers': self.max_workers,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+class JobStates:
+    """Latest state of the most recent ``max_jobs`` jobs by key"""
+
+    def __init__(self, max_jobs=1000):
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+    def update(self, key, **state):
+        with self._lock:
+            job = self._jobs.setdefault(key, {'id': key})
+            job.update(state)
+            self._jobs.move_to_end(key)
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+
+    def get(self, key):
+        """A copy of the job's state, or None when it is unknown (or evicted)"""
+        with self._lock:
+            job = self._jobs.get(key)
+            return dict(job) if job else None
+
+
+class InFlight:
+    """Keys with a job queued or running, so the same work is not queued twice"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = set()
+
+    def claim(self, key):
+        """True when ``key`` was free and is now taken by the caller"""
+        with self._lock:
+            if key in self._keys:
+                return False
+            self._keys.add(key)
+            return True
+
+    def release(self, key):
+        with self._lock:
+            self._keys.discard(key)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Mood Journal - WSGI vs ASGI Benchmark
+Runs the same app once under a threaded WSGI server (gunicorn gthread, or
+the Werkzeug dev server when gunicorn is not installed) and once under
+uvicorn (asgi.py), one process each, and drives POST /api/ai/analyze with
+N concurrent async clients. Every request sends a new text, so each one
+waits on the (stand-in) Hugging Face API. Reports throughput, latency
+percentiles and server RSS per concurrency level.
+
+    python benchmarks/bench_asgi.py --concurrency 50,200,1000 --duration 15 --json
+
+The stand-ins run in a separate process so they do not share a GIL with the
+load driver.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fake_services import WORDS
+from load_test import free_port, git_revision, process_memory_mb, summarize
+from bench_startup import wait_for_port
+
+
+def start_stand_ins(hf_latency_ms, hf_jitter_ms):
+    """Run fake_services.py in its own process; returns (process, app environment)"""
+    ports = ','.join(str(free_port()) for _ in range(3))
+    process = subprocess.Popen(
+        [sys.executable, '-u', os.path.join(ROOT, 'benchmarks', 'fake_services.py'), '--ports', ports,
+         '--seed-entries', '100', '--hf-latency-ms', str(hf_latency_ms), '--hf-jitter-ms', str(hf_jitter_ms)],
+        cwd=ROOT, stdout=subprocess.PIPE, text=True,
+    )
+    env = {}
+    for line in process.stdout:
+        if line.strip().startswith('export '):
+            key, value = line.strip()[len('export '):].split('=', 1)
+            env[key] = value
+        elif 'Ctrl+C' in line:
+            return process, env
+    raise SystemExit('❌ Stand-ins exited during startup')
+
+
+def server_command(mode, port, threads):
+    if mode == 'asgi':
+        return [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port),
+                '--log-level', 'warning', '--no-access-log', '--backlog', '4096']
+    if shutil.which('gunicorn'):
+        return ['gunicorn', '--workers', '1', '--worker-class', 'gthread', '--threads', str(threads),
+                '--bind', f'127.0.0.1:{port}', '--backlog', '4096', '--log-level', 'warning', 'app:create_app()']
+    return [sys.executable, '-c', "from app import create_app; "
+            f"create_app().run(host='127.0.0.1', port={port}, threaded=True, use_reloader=False)"]
+
+
+def tree_memory_mb(pid):
+    """RSS of a server and its children (gunicorn serves from a forked worker)"""
+    pids = [pid]
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                pids.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    current = [process_memory_mb(p)[0] for p in pids]
+    return round(sum(mb for mb in current if mb is not None), 1)
+
+
+async def drive(base_url, concurrency, duration, warmup, timeout):
+    """Closed loop: each client posts its next unique text as soon as the last answer arrives"""
+    counter = itertools.count()
+    samples = []
+    loop = asyncio.get_running_loop()
+    record_after = loop.time() + warmup
+    stop_at = record_after + duration
+    # Building an SSL context per client is slow even for plain http
+    context = ssl.create_default_context()
+
+    async def worker(index):
+        # One single-connection client per worker: a shared httpx pool of
+        # hundreds of connections costs more CPU than the servers under test
+        async with httpx.AsyncClient(base_url=base_url, timeout=timeout, verify=context,
+                                     limits=httpx.Limits(max_connections=1)) as client:
+            while loop.time() < stop_at:
+                n = next(counter)
+                text = f"{WORDS[n % len(WORDS)]} {WORDS[(n // len(WORDS)) % len(WORDS)]} entry {n} from client {index}"
+                started = loop.time()
+                try:
+                    response = await client.post('/api/ai/analyze', json={'content': text})
+                    status = response.status_code
+                except httpx.HTTPError:
+                    status = None
+                if started >= record_after:
+                    samples.append(((loop.time() - started) * 1000, status))
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return samples
+
+
+def run_mode(mode, env, concurrency_levels, args):
+    port = free_port()
+    workdir = tempfile.mkdtemp(prefix=f'mood-journal-{mode}-')
+    env = dict(env, SENTIMENT_CACHE_DB=os.path.join(workdir, 'sentiment_cache.db'))
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    command = server_command(mode, port, args.wsgi_threads)
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+    result = {'server': ' '.join(command[:3]) if mode == 'asgi' else os.path.basename(command[0]),
+              'idle_rss_mb': None, 'levels': {}}
+    try:
+        wait_for_port(port, process)
+        httpx.get(f'{base_url}/api/ready', timeout=30)
+        time.sleep(1)
+        result['idle_rss_mb'] = tree_memory_mb(process.pid)
+        for concurrency in concurrency_levels:
+            print(f"⏳ {mode}: {concurrency} concurrent clients for {args.duration:.0f}s", file=sys.stderr)
+            samples = asyncio.run(drive(base_url, concurrency, args.duration, args.warmup, args.timeout))
+            level = summarize(samples, args.duration)
+            level['rss_mb'] = tree_memory_mb(process.pid)
+            result['levels'][str(concurrency)] = level
+        result['log'] = log.name
+        return result
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', default='50,200,1000', help='Comma-separated client counts')
+    parser.add_argument('--duration', type=float, default=15.0, help='Measured seconds per level')
+    parser.add_argument('--warmup', type=float, default=3.0, help='Unmeasured seconds before each level')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Client timeout per request')
+    parser.add_argument('--hf-latency-ms', type=float, default=300.0)
+    parser.add_argument('--hf-jitter-ms', type=float, default=100.0)
+    parser.add_argument('--wsgi-threads', type=int, default=64, help='gunicorn --threads for the WSGI run')
+    parser.add_argument('--modes', default='wsgi,asgi')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+    levels = [int(c) for c in args.concurrency.split(',')]
+
+    stand_ins, app_env = start_stand_ins(args.hf_latency_ms, args.hf_jitter_ms)
+    env = dict(os.environ)
+    env.update(app_env)
+    env.update({'SENTIMENT_PROVIDERS': 'huggingface,local', 'METRICS_ENABLED': 'true'})
+
+    results = {'benchmark': 'wsgi_vs_asgi', 'git': git_revision(), 'route': 'POST /api/ai/analyze',
+               'config': {'duration_s': args.duration, 'hf_latency_ms': args.hf_latency_ms,
+                          'hf_jitter_ms': args.hf_jitter_ms, 'wsgi_threads': args.wsgi_threads,
+                          'hf_max_workers': int(env.get('HF_MAX_WORKERS', '16')),
+                          'async_max_connections': int(env.get('HTTP_ASYNC_MAX_CONNECTIONS', '100'))},
+               'modes': {}}
+    try:
+        for mode in args.modes.split(','):
+            results['modes'][mode] = run_mode(mode, env, levels, args)
+    finally:
+        stand_ins.terminate()
+        stand_ins.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"⚖️ POST /api/ai/analyze, Hugging Face stand-in at {args.hf_latency_ms:.0f}±{args.hf_jitter_ms:.0f} ms")
+    print("=" * 78)
+    print(f"{'mode':<6} {'clients':>8} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>8} {'RSS':>9}")
+    for mode, result in results['modes'].items():
+        for concurrency, level in result['levels'].items():
+            latency = level['latency_ms']
+            cells = [f"{latency[k]:.0f} ms" if latency[k] is not None else '-' for k in ('p50', 'p95', 'p99')]
+            print(f"{mode:<6} {concurrency:>8} {level['throughput_rps']:>9.1f} {cells[0]:>9} {cells[1]:>9} "
+                  f"{cells[2]:>9} {level['errors']:>8} {level['rss_mb']:>6.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Mood Journal - Analyze Burst Benchmark
+Fires a burst of concurrent POST /api/ai/analyze requests from a handful of
+clients, drawing from a small pool of texts so many requests overlap, at the
+app in-process against the stand-in Hugging Face API. Reports how many
+upstream calls the burst cost (coalescing sends one per distinct text in
+flight), how many requests were answered or refused with 429, and latency
+percentiles for each.
+
+    python benchmarks/bench_burst.py --requests 400 --texts 40 --clients 8 --json
+    python benchmarks/bench_burst.py --no-limits    # admission control off
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fake_services import app_environment, start_services
+from load_test import git_revision, make_texts, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=400, help='Requests in the burst')
+    parser.add_argument('--texts', type=int, default=40, help='Distinct texts the requests draw from')
+    parser.add_argument('--clients', type=int, default=8, help='Distinct client addresses')
+    parser.add_argument('--threads', type=int, default=64, help='Requests in flight at once')
+    parser.add_argument('--hf-latency-ms', type=float, default=300.0)
+    parser.add_argument('--no-limits', action='store_true', help='Turn per-client and global limits off')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    services = start_services(hf_latency_ms=args.hf_latency_ms, hf_jitter_ms=args.hf_latency_ms / 5)
+    os.environ.update(app_environment(services))
+    os.environ.update({
+        # Memory cache only: a burst is over before any analysis could be cached anyway
+        'SENTIMENT_CACHE_DB': '',
+        'RECONCILE_INTERVAL': '0', 'WARMUP_ON_START': 'false',
+        'SENTIMENT_PROVIDERS': 'huggingface',
+    })
+    if args.no_limits:
+        os.environ.update({'AI_CLIENT_RATE': '0', 'AI_GLOBAL_RATE': '0'})
+    # Imported after the environment points at the stand-ins
+    import app
+    client = app.create_app().test_client()
+
+    rng = random.Random(5)
+    texts = make_texts(args.texts)
+    work = [(rng.choice(texts), f'10.0.0.{rng.randrange(args.clients) + 1}') for _ in range(args.requests)]
+    samples = {'answered': [], 'refused': [], 'other': []}
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if not work:
+                    return
+                text, address = work.pop()
+            started = time.perf_counter()
+            response = client.post('/api/ai/analyze', json={'content': text},
+                                   environ_base={'REMOTE_ADDR': address})
+            sample = ((time.perf_counter() - started) * 1000, response.status_code)
+            kind = 'answered' if response.status_code == 200 else 'refused' if response.status_code == 429 else 'other'
+            with lock:
+                samples[kind].append(sample)
+
+    started = time.perf_counter()
+    try:
+        threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        upstream = services['huggingface'].stats()
+    finally:
+        for service in services.values():
+            service.stop()
+
+    limits = client.get('/api/ai/limits').get_json()
+    results = {
+        'benchmark': 'burst', 'git': git_revision(),
+        'config': {key: getattr(args, key) for key in
+                   ('requests', 'texts', 'clients', 'threads', 'hf_latency_ms', 'no_limits')},
+        'seconds': round(elapsed, 2),
+        'upstream_calls': sum(count for key, count in upstream.items() if key.startswith('model:')),
+        'coalesced': limits['coalescing']['shared'],
+        'answered': summarize(samples['answered'], elapsed),
+        'refused': summarize(samples['refused'], elapsed),
+        'other_status': summarize(samples['other'], elapsed)['status'],
+        'limits': limits,
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"💥 {args.requests} analyses over {args.texts} texts from {args.clients} clients in {elapsed:.1f}s")
+    print("=" * 72)
+    print(f"upstream calls {results['upstream_calls']}, coalesced requests {results['coalesced']}")
+    for kind in ('answered', 'refused'):
+        summary = results[kind]
+        latency = summary['latency_ms']
+        print(f"{kind:<9} {summary['requests']:>5}   p50 {latency['p50']} ms   p99 {latency['p99']} ms   "
+              f"max {latency['max']} ms")
+    if results['other_status']:
+        print(f"other statuses: {results['other_status']}")
+
+
+if __name__ == '__main__':
+    main()
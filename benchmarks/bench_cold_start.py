@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Mood Journal - Cold Model Benchmark
+Starts the stand-in Hugging Face API with the preferred emotion model cold
+(it loads for --load-seconds on first use, answering 503 with
+estimated_time meanwhile) and sends POST /api/ai/analyze at a steady rate,
+a new text each time. Reports which model answered, how long requests held
+for the loading model and latency percentiles.
+
+    python benchmarks/bench_cold_start.py --load-seconds 5 --budget 8
+    python benchmarks/bench_cold_start.py --budget 0     # never hold: downgrade at once
+    python benchmarks/bench_cold_start.py --warm         # warm-up ping before the traffic
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fake_services import app_environment, start_services
+from load_test import git_revision, make_texts, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=60)
+    parser.add_argument('--rate', type=float, default=10.0, help='Requests per second')
+    parser.add_argument('--load-seconds', type=float, default=5.0, help='Cold start of the preferred model')
+    parser.add_argument('--budget', type=float, default=8.0, help='HF_LOADING_BUDGET')
+    parser.add_argument('--hf-latency-ms', type=float, default=150.0)
+    parser.add_argument('--warm', action='store_true', help='Send a warm-up ping and let the model load first')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    # The module reads its settings at import, so the model list comes from there afterwards
+    services = start_services(hf_latency_ms=args.hf_latency_ms, hf_jitter_ms=args.hf_latency_ms / 5,
+                              hf_load_seconds=args.load_seconds, hf_cold_models=['placeholder'])
+    os.environ.update(app_environment(services))
+    os.environ.update({
+        'SENTIMENT_CACHE_DB': '', 'SENTIMENT_PROVIDERS': 'huggingface',
+        'HF_LOADING_BUDGET': str(args.budget), 'HF_WARMUP_INTERVAL': '0',
+        'AI_CLIENT_RATE': '0', 'AI_GLOBAL_RATE': '0',
+        'RECONCILE_INTERVAL': '0', 'WARMUP_ON_START': 'false',
+    })
+    # Imported after the environment points at the stand-ins
+    import app
+    preferred = app.SENTIMENT_MODELS[0]
+    services['huggingface'].cold_models = {preferred}
+    client = app.create_app().test_client()
+
+    if args.warm:
+        # What the warm-up pinger does ahead of the active hours' first request
+        app.ping_model(preferred)
+        time.sleep(args.load_seconds + 0.5)
+
+    texts = make_texts(args.requests, seed=23)
+    samples = []
+    models = {}
+    waits = []
+    lock = threading.Lock()
+
+    def send(text):
+        started = time.perf_counter()
+        response = client.post('/api/ai/analyze', json={'content': text})
+        elapsed = (time.perf_counter() - started) * 1000
+        body = response.get_json() or {}
+        with lock:
+            samples.append((elapsed, response.status_code))
+            model = body.get('model') or body.get('ai_provider', 'none')
+            models[model] = models.get(model, 0) + 1
+            waits.append(body.get('wait_ms', 0.0))
+
+    started = time.perf_counter()
+    threads = []
+    try:
+        for index, text in enumerate(texts):
+            delay = started + index / args.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            thread = threading.Thread(target=send, args=(text,))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        upstream = services['huggingface'].stats()
+    finally:
+        for service in services.values():
+            service.stop()
+
+    held = sorted(wait for wait in waits if wait)
+    results = {
+        'benchmark': 'cold_start', 'git': git_revision(),
+        'config': {key: getattr(args, key) for key in
+                   ('requests', 'rate', 'load_seconds', 'budget', 'hf_latency_ms', 'warm')},
+        'seconds': round(elapsed, 2),
+        'answered_by': dict(sorted(models.items(), key=lambda item: -item[1])),
+        'preferred_share': round(models.get(preferred, 0) / len(texts), 3),
+        'held_requests': len(held),
+        'held_ms_max': held[-1] if held else 0.0,
+        'loading_responses': upstream.get(f'loading:{preferred}', 0),
+        'latency': summarize(samples, elapsed),
+        'models': app.model_loading.stats(),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    latency = results['latency']['latency_ms']
+    print(f"🧊 {args.requests} analyses at {args.rate:.0f}/s, preferred model loading for {args.load_seconds:.0f}s, "
+          f"budget {args.budget:.0f}s{' (pre-warmed)' if args.warm else ''}")
+    print("=" * 72)
+    for model, count in results['answered_by'].items():
+        print(f"{count:>5}  {model}")
+    print(f"preferred model share {results['preferred_share']:.0%}, {len(held)} requests held "
+          f"(longest {results['held_ms_max']:.0f} ms), {results['loading_responses']} loading 503s")
+    print(f"latency p50 {latency['p50']} ms   p99 {latency['p99']} ms   max {latency['max']} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Mood Journal - JSON / Compression Benchmark
+Serialization time and bytes on the wire for a large /api/entries response,
+stdlib jsonify vs the orjson provider, uncompressed vs gzip vs brotli.
+
+    python benchmarks/bench_json.py --entries 10000
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from json_provider import FastJSONProvider
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+EMOTIONS = ['happy', 'sad', 'angry', 'fear', 'disgust', 'surprise', 'neutral']
+MESSAGES = [
+    "You're expressing positive feelings. Keep noting what made your day better.",
+    "I'm sensing sadness. Consider writing what might help you feel a bit better.",
+    "There’s anger in your words. A short break or deep breaths could help.",
+    "I see some fear/anxiety. Identifying one small step can reduce it.",
+    "Neutral tone detected. Add more detail to capture your feelings.",
+]
+WORDS = ('today work friend family tired happy walk coffee rain meeting deadline '
+         'dinner music sleep gym call worried proud lonely excited').split()
+
+
+def make_entries(count, seed=42):
+    """Entries shaped like rows from journal_entries"""
+    rng = random.Random(seed)
+    entries = []
+    for i in range(count, 0, -1):
+        emotion = rng.choice(EMOTIONS)
+        score = round(rng.uniform(0.4, 0.99), 4)
+        entries.append({
+            'id': i,
+            'content': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(12, 60))),
+            'sentiment_score': score,
+            'emotion_label': emotion,
+            'ai_provider': rng.choice(['huggingface', 'local']),
+            'detailed_analysis': f"{emotion.title()} ({score * 100:.0f}%). {rng.choice(MESSAGES)}",
+            'created_at': f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T'
+                          f'{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00.000000+00:00',
+        })
+    return entries
+
+
+def timed(fn, repeat):
+    """Median wall time in ms and the last result"""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entries', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    entries = make_entries(args.entries)
+    app = Flask(__name__)
+    providers = {'stdlib': DefaultJSONProvider(app), 'orjson': FastJSONProvider(app)}
+
+    results = {'entries': args.entries, 'serialize': {}, 'wire': {}}
+    with app.app_context():
+        for name, provider in providers.items():
+            ms, response = timed(lambda: provider.response(entries).get_data(), args.repeat)
+            results['serialize'][name] = {'ms': round(ms, 2), 'bytes': len(response)}
+        # Both providers must produce equivalent documents
+        assert json.loads(providers['stdlib'].response(entries).get_data()) == \
+            json.loads(providers['orjson'].response(entries).get_data())
+        body = providers['orjson'].response(entries).get_data()
+
+    encoders = {'identity': lambda: body, 'gzip-6': lambda: gzip.compress(body, 6, mtime=0)}
+    if brotli is not None:
+        encoders['br-5'] = lambda: brotli.compress(body, quality=5)
+    for name, encode in encoders.items():
+        ms, encoded = timed(encode, args.repeat)
+        results['wire'][name] = {'ms': round(ms, 2), 'bytes': len(encoded)}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"📦 /api/entries payload with {args.entries} entries")
+    print("=" * 50)
+    for name, row in results['serialize'].items():
+        print(f"{'jsonify (' + name + ')':<22} {row['ms']:>9.2f} ms {row['bytes']:>12,} bytes")
+    print("-" * 50)
+    identity = results['wire']['identity']['bytes']
+    for name, row in results['wire'].items():
+        print(f"{name:<22} {row['ms']:>9.2f} ms {row['bytes']:>12,} bytes ({row['bytes'] / identity:.0%})")
+    if brotli is None:
+        print("💡 Install the optional brotli package to include br")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Mood Journal - Cold Start Benchmark
+Starts fresh app processes against the local stand-ins and times, from
+spawn: the port accepting connections, the first GET /api/entries, the first
+POST /api/ai/analyze (first upstream call) and /api/ready turning 200.
+Runs with and without the warm-up hook; prints medians or JSON.
+
+    python benchmarks/bench_startup.py --runs 5 --json
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fake_services import app_environment, start_services
+from load_test import free_port, git_revision
+
+# Falls back to the module-level app so older commits can be measured too
+SERVE = ("import app as m; factory = getattr(m, 'create_app', None); "
+         "(factory() if factory else m.app).run(host='127.0.0.1', port={port}, threaded=True, use_reloader=False)")
+
+
+def wait_for_port(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'app exited with code {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.005)
+    raise RuntimeError(f'port {port} not open after {timeout}s')
+
+
+def cold_start(env, timeout=60):
+    """One fresh process; returns milestone times in ms since spawn"""
+    port = free_port()
+    workdir = tempfile.mkdtemp(prefix='mood-journal-startup-')
+    env = dict(env, SQLITE_DB_PATH=os.path.join(workdir, 'mood_journal.db'),
+               SENTIMENT_CACHE_DB=os.path.join(workdir, 'sentiment_cache.db'))
+    base = f'http://127.0.0.1:{port}'
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', SERVE.format(port=port)], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    elapsed = lambda: round((time.perf_counter() - started) * 1000, 1)
+    try:
+        wait_for_port(port, process, timeout)
+        result = {'port_open_ms': elapsed()}
+        requests.get(f'{base}/api/entries', timeout=timeout).raise_for_status()
+        result['first_response_ms'] = elapsed()
+        call_started = time.perf_counter()
+        requests.post(f'{base}/api/ai/analyze', json={'content': 'first call after start'}, timeout=timeout)
+        result['first_analyze_ms'] = round((time.perf_counter() - call_started) * 1000, 1)
+        result['ready_ms'] = None
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            response = requests.get(f'{base}/api/ready', timeout=timeout)
+            if response.status_code == 200:
+                result['ready_ms'] = elapsed()
+                break
+            if response.status_code == 404:
+                break
+            time.sleep(0.01)
+        return result
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--storage', choices=['supabase', 'sqlite'], default='supabase')
+    parser.add_argument('--db-latency-ms', type=float, default=20.0)
+    parser.add_argument('--hf-latency-ms', type=float, default=150.0)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    services = start_services(seed_entries=2000, db_latency_ms=args.db_latency_ms,
+                              hf_latency_ms=args.hf_latency_ms, hf_jitter_ms=0)
+    base_env = dict(os.environ)
+    base_env.update(app_environment(services))
+    base_env.update({'SENTIMENT_PROVIDERS': 'huggingface,local'})
+    if args.storage == 'sqlite':
+        base_env['STORAGE_BACKEND'] = 'sqlite'
+
+    results = {'benchmark': 'startup', 'git': git_revision(), 'runs': args.runs, 'storage': args.storage,
+               'db_latency_ms': args.db_latency_ms, 'hf_latency_ms': args.hf_latency_ms, 'modes': {}}
+    try:
+        for mode, warm in (('warm_up', 'true'), ('lazy', 'false')):
+            samples = [cold_start(dict(base_env, WARMUP_ON_START=warm)) for _ in range(args.runs)]
+            results['modes'][mode] = {
+                key: (statistics.median(s[key] for s in samples) if all(s[key] is not None for s in samples) else None)
+                for key in samples[0]
+            }
+            results['modes'][mode]['samples'] = samples
+    finally:
+        for service in services.values():
+            service.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"⏱️ Cold start, median of {args.runs} runs ({args.storage} storage)")
+    print("=" * 72)
+    print(f"{'mode':<10} {'port open':>12} {'1st response':>14} {'1st analyze':>13} {'ready':>10}")
+    for mode, row in results['modes'].items():
+        cells = [f"{row[k]:.0f} ms" if row[k] is not None else '-' for k in
+                 ('port_open_ms', 'first_response_ms', 'first_analyze_ms', 'ready_ms')]
+        print(f"{mode:<10} {cells[0]:>12} {cells[1]:>14} {cells[2]:>13} {cells[3]:>10}")
+    print("(1st analyze is the request's own latency; the others are measured from spawn)")
+
+
+if __name__ == '__main__':
+    main()
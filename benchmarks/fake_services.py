@@ -0,0 +1,663 @@
+#!/usr/bin/env python3
+"""
+Mood Journal - Local Stand-ins for Supabase, Hugging Face and IntaSend
+Small stdlib HTTP servers speaking just enough of each API for the app:
+
+- FakePostgREST: the PostgREST subset used by storage.SupabaseStorage
+  (select/order/limit/offset, eq/gt/gte/lt/lte/in filters, or=(...) with
+  nested and(...), count=exact, insert/update/delete with
+  return=representation, and the search_journal_entries RPC)
+- FakeInference: /models/<model> returning classifier scores for one input
+  or a list of inputs, with configurable latency and 503 "loading" errors;
+  with load_seconds > 0 models start cold, load on first use (answering
+  503 with the remaining estimated_time meanwhile) and unload when idle
+- FakeIntaSend: /v1/checkout/ returning a payment URL and id, and
+  /v1/payment/status/ reporting a fixed state per invoice id (mostly
+  COMPLETE, some FAILED or still PENDING)
+
+Every server can add latency (mean + uniform jitter) and fail a fraction of
+requests, and keeps counters for the load test report. Run standalone to
+point a manually started app at them:
+
+    python benchmarks/fake_services.py --seed-entries 5000
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+EMOTION_LABELS = ['joy', 'sadness', 'anger', 'fear', 'disgust', 'surprise', 'neutral']
+SENTIMENT_LABELS = ['negative', 'neutral', 'positive']
+BINARY_LABELS = ['NEGATIVE', 'POSITIVE']
+WORDS = ('today work friend family tired happy walk coffee rain meeting deadline dinner music '
+         'sleep gym call worried proud lonely excited stressed calm grateful angry sad').split()
+ENTRY_EMOTIONS = ['happy', 'sad', 'angry', 'fear', 'disgust', 'surprise', 'neutral']
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 refuses bursts of new connections from pooled clients
+    request_queue_size = 1024
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class FakeService:
+    """Threaded HTTP server with injected latency/failures and request counters"""
+
+    name = 'fake'
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._counts = {'requests': 0, 'injected_errors': 0}
+        self._counts_lock = threading.Lock()
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                service._dispatch(self)
+
+            do_GET = do_HEAD = do_POST = do_PATCH = do_DELETE = _handle
+
+        self.server = _Server((host, port), Handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def count(self, key, amount=1):
+        with self._counts_lock:
+            self._counts[key] = self._counts.get(key, 0) + amount
+
+    def stats(self):
+        with self._counts_lock:
+            return dict(self._counts)
+
+    def _roll(self):
+        """Delay to inject (seconds) and whether this request should fail"""
+        with self._rng_lock:
+            delay = self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+            fail = self._rng.random() < self.error_rate
+        return max(delay, 0.0) / 1000, fail
+
+    def _dispatch(self, handler):
+        if handler.command == 'HEAD':
+            # Connection warm-up probes
+            self.count('head_requests')
+            handler.send_response(200)
+            handler.send_header('Content-Length', '0')
+            handler.end_headers()
+            return
+        self.count('requests')
+        delay, fail = self._roll()
+        length = int(handler.headers.get('Content-Length') or 0)
+        raw = handler.rfile.read(length) if length else b''
+        if delay:
+            time.sleep(delay)
+        if fail:
+            self.count('injected_errors')
+            status, body, headers = self.failure()
+        else:
+            try:
+                body_json = json.loads(raw) if raw else None
+                status, body, headers = self.handle(handler.command, urlsplit(handler.path), handler.headers, body_json)
+            except ValueError as e:
+                status, body, headers = 400, {'message': str(e)}, {}
+            except Exception as e:
+                status, body, headers = 500, {'message': str(e)}, {}
+        payload = json.dumps(body).encode() if body is not None else b''
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(payload)))
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def failure(self):
+        return 500, {'message': 'injected failure'}, {}
+
+    def handle(self, method, url, headers, body):
+        raise NotImplementedError
+
+
+# --- PostgREST ---------------------------------------------------------------
+
+def _split_top(text):
+    """Split on commas outside parentheses and double quotes"""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            parts.append(''.join(current))
+            current = []
+            continue
+        current.append(char)
+    if current:
+        parts.append(''.join(current))
+    return parts
+
+
+def _unquote_value(value):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def _coerce(row_value, value):
+    """Compare numbers as numbers and everything else as strings"""
+    if isinstance(row_value, (int, float)) and not isinstance(row_value, bool):
+        return row_value, float(value)
+    return ('' if row_value is None else str(row_value)), value
+
+
+_OPERATORS = {
+    'eq': lambda a, b: a == b,
+    'neq': lambda a, b: a != b,
+    'gt': lambda a, b: a > b,
+    'gte': lambda a, b: a >= b,
+    'lt': lambda a, b: a < b,
+    'lte': lambda a, b: a <= b,
+}
+
+
+def _condition(column, op, value):
+    """Predicate for one ``column=op.value`` filter"""
+    if op == 'in':
+        options = {_unquote_value(v) for v in _split_top(value.strip('()'))}
+        return lambda row: str(row.get(column)) in options
+    if op == 'is':
+        expected = {'null': None, 'true': True, 'false': False}[value.lower()]
+        return lambda row: row.get(column) is expected
+    if op not in _OPERATORS:
+        raise ValueError(f'unsupported operator {op}')
+    compare = _OPERATORS[op]
+    value = _unquote_value(value)
+
+    def check(row):
+        row_value = row.get(column)
+        if row_value is None:
+            return False
+        left, right = _coerce(row_value, value)
+        return compare(left, right)
+    return check
+
+
+def _logic(expression):
+    """Predicate for ``or=(...)`` / ``and(...)`` trees"""
+    if expression.startswith(('and(', 'or(')):
+        kind, inner = expression.split('(', 1)
+        return _group(kind, inner[:-1])
+    column, op, value = expression.split('.', 2)
+    return _condition(column, op, value)
+
+
+def _group(kind, inner):
+    checks = [_logic(part) for part in _split_top(inner)]
+    combine = all if kind == 'and' else any
+    return lambda row: combine(check(row) for check in checks)
+
+
+class FakePostgREST(FakeService):
+    """In-memory tables behind the PostgREST subset that SupabaseStorage uses"""
+
+    name = 'postgrest'
+    DEFAULTS = {
+        'journal_entries': {},
+        'payments': {'status': 'pending', 'intasend_payment_id': None,
+                     'idempotency_key': None, 'payment_url': None, 'error': None},
+    }
+
+    def __init__(self, seed_entries=0, seed_payments=0, seed_pending_payments=0, **kwargs):
+        super().__init__(**kwargs)
+        self.tables = {name: [] for name in self.DEFAULTS}
+        self._ids = {name: 0 for name in self.DEFAULTS}
+        # What the supabase/changes.sql triggers maintain
+        self.tables['journal_entry_changes'] = []
+        self._change_seq = 0
+        # ...and what the supabase/payments.sql ones keep
+        self.tables['data_versions'] = [{'scope': '_epoch', 'version': random.randrange(2 ** 32)},
+                                        {'scope': 'payments', 'version': 0}, {'scope': 'stats', 'version': 0}]
+        # ...and supabase/stats.sql: (granularity, bucket, emotion) -> [count, score_sum]
+        self._rollups = {}
+        self._lock = threading.Lock()
+        self.seed(seed_entries, seed_payments, seed_pending_payments)
+
+    def seed(self, entries, payments, pending_payments=0, days=180):
+        """Preload rows spread over the last ``days`` days, oldest first"""
+        rng = random.Random(42)
+        start = datetime.now(timezone.utc) - timedelta(days=days)
+        step = timedelta(days=days) / max(entries, 1)
+        rows = []
+        for i in range(entries):
+            emotion = rng.choice(ENTRY_EMOTIONS)
+            score = round(rng.uniform(0.4, 0.99), 4)
+            rows.append({
+                'content': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 40))),
+                'sentiment_score': score,
+                'emotion_label': emotion,
+                'ai_provider': 'huggingface',
+                'detailed_analysis': f'{emotion.title()} ({score * 100:.0f}%).',
+                'created_at': (start + step * i).isoformat(),
+            })
+        self._insert('journal_entries', rows)
+        self._insert('payments', [
+            {'plan_type': rng.choice(['basic', 'premium']), 'amount': 5.99, 'status': 'completed',
+             'intasend_payment_id': f'seed_{i}', 'created_at': (start + step * i).isoformat()}
+            for i in range(payments)
+        ])
+        # Checkouts nobody came back from, for the reconciliation job
+        pending_step = timedelta(days=days) / max(pending_payments, 1)
+        self._insert('payments', [
+            {'plan_type': rng.choice(['basic', 'premium']), 'amount': 5.99, 'status': 'pending',
+             'intasend_payment_id': f'pending_{i}', 'created_at': (start + pending_step * i).isoformat()}
+            for i in range(pending_payments)
+        ])
+
+    def _insert(self, table, rows):
+        stored = []
+        with self._lock:
+            for row in rows:
+                self._ids[table] += 1
+                record = dict(self.DEFAULTS[table], id=self._ids[table], created_at=_now_iso())
+                record.update({k: v for k, v in row.items() if k != 'id' or v is not None})
+                self.tables[table].append(record)
+                stored.append(dict(record))
+            self._record_write(table, [], stored)
+        return stored
+
+    def _record_write(self, table, old_rows, new_rows):
+        """Trigger stand-ins for a write that replaced ``old_rows`` with ``new_rows``"""
+        if table == 'journal_entries':
+            if new_rows:
+                self._record_changes([row['id'] for row in new_rows], deleted=False)
+            else:
+                self._record_changes([row['id'] for row in old_rows], deleted=True)
+            for row in old_rows:
+                self._apply_rollups(row, -1)
+            for row in new_rows:
+                self._apply_rollups(row, 1)
+        elif table == 'payments':
+            # Statement-level trigger: one bump per write statement
+            self._bump_version('payments')
+
+    def _bump_version(self, scope):
+        for row in self.tables['data_versions']:
+            if row['scope'] == scope:
+                row['version'] += 1
+
+    def _apply_rollups(self, entry, sign):
+        try:
+            day = datetime.fromisoformat(str(entry.get('created_at')).replace('Z', '+00:00')).astimezone(timezone.utc)
+        except ValueError:
+            day = datetime.now(timezone.utc)
+        day = day.date()
+        emotion = entry.get('emotion_label') or 'neutral'
+        score = entry.get('sentiment_score')
+        score = 0.5 if score is None else float(score)
+        for key in (('all', ''), ('day', day.isoformat()),
+                    ('week', (day - timedelta(days=day.weekday())).isoformat()), ('month', day.strftime('%Y-%m'))):
+            totals = self._rollups.setdefault(key + (emotion,), [0, 0.0])
+            totals[0] += sign
+            totals[1] += sign * score
+            if totals[0] <= 0:
+                del self._rollups[key + (emotion,)]
+
+    def _record_changes(self, ids, deleted):
+        """Trigger stand-in: move each entry's change row to the next sequence number"""
+        ids = set(ids)
+        changes = [row for row in self.tables['journal_entry_changes'] if row['entry_id'] not in ids]
+        for entry_id in sorted(ids):
+            self._change_seq += 1
+            changes.append({'entry_id': entry_id, 'seq': self._change_seq, 'deleted': deleted})
+        self.tables['journal_entry_changes'] = changes
+
+    def _filter(self, params):
+        checks = []
+        for key, value in params:
+            if key in ('select', 'order', 'limit', 'offset'):
+                continue
+            if key in ('or', 'and'):
+                checks.append(_group(key, value.strip()[1:-1]))
+            else:
+                op, _, operand = value.partition('.')
+                checks.append(_condition(key, op, operand))
+        return lambda row: all(check(row) for check in checks)
+
+    @staticmethod
+    def _order(rows, order):
+        # Stable sorts applied from the last key to the first
+        for term in reversed([t for t in (order or '').split(',') if t]):
+            column, _, direction = term.partition('.')
+            descending = direction.startswith('desc')
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column) or 0 if column in ('id', 'seq')
+                                       else str(row.get(column) or '')), reverse=descending)
+        return rows
+
+    @staticmethod
+    def _project(rows, select):
+        columns = [c.strip() for c in (select or '*').split(',') if c.strip()]
+        if not columns or '*' in columns:
+            return [dict(row) for row in rows]
+        return [{c: row.get(c) for c in columns} for row in rows]
+
+    def handle(self, method, url, headers, body):
+        path = unquote(url.path)
+        params = parse_qsl(url.query, keep_blank_values=True)
+        if not path.startswith('/rest/v1/'):
+            return 404, {'message': f'unknown path {path}'}, {}
+        name = path[len('/rest/v1/'):].strip('/')
+        self.count(f'{method.lower()}_requests')
+        if name.startswith('rpc/'):
+            return self.rpc(name[4:], body or {})
+        if name not in self.tables:
+            return 404, {'message': f'relation "{name}" does not exist'}, {}
+        args = dict(params)
+
+        if method == 'POST':
+            rows = body if isinstance(body, list) else [body]
+            conflict = args.get('on_conflict')
+            if conflict and 'ignore-duplicates' in (headers.get('Prefer') or ''):
+                # Upsert that skips rows whose key already exists (unique index stand-in)
+                with self._lock:
+                    taken = {row.get(conflict) for row in self.tables[name]}
+                rows = [row for row in rows if row.get(conflict) not in taken]
+            return 201, self._insert(name, rows), {}
+
+        matches = self._filter(params)
+        with self._lock:
+            selected = [row for row in self.tables[name] if matches(row)]
+            if method == 'PATCH':
+                old_rows = [dict(row) for row in selected]
+                for row in selected:
+                    row.update(body or {})
+                self._record_write(name, old_rows, selected)
+                return 200, [dict(row) for row in selected], {}
+            if method == 'DELETE':
+                ids = {row['id'] for row in selected}
+                self.tables[name] = [row for row in self.tables[name] if row['id'] not in ids]
+                self._record_write(name, selected, [])
+                return 200, selected, {}
+            selected = [dict(row) for row in selected]
+
+        total = len(selected)
+        rows = self._order(selected, args.get('order'))
+        offset = int(args.get('offset') or 0)
+        limit = args.get('limit')
+        rows = rows[offset:offset + int(limit)] if limit is not None else rows[offset:]
+        extra = {}
+        if 'count=exact' in (headers.get('Prefer') or ''):
+            end = offset + len(rows) - 1
+            extra['Content-Range'] = f'{offset}-{end}/{total}' if rows else f'*/{total}'
+        return 200, self._project(rows, args.get('select')), extra
+
+    def rpc(self, function, args):
+        if function == 'journal_entry_changes_since':
+            return self.changes_since(int(args.get('since') or 0), int(args.get('result_limit') or 500))
+        if function == 'mood_rollup_rows':
+            return self.rollup_rows(args['rollup'], args.get('low') or '', args.get('high') or '9999',
+                                    args.get('bucket_limit'))
+        if function == 'journal_entry_label_totals':
+            totals = {}
+            with self._lock:
+                for row in self.tables['journal_entries']:
+                    emotion = row.get('emotion_label') or 'neutral'
+                    score = row.get('sentiment_score')
+                    count, score_sum = totals.get(emotion, (0, 0.0))
+                    totals[emotion] = (count + 1, score_sum + (0.5 if score is None else float(score)))
+            return 200, [{'emotion': emotion, 'count': count, 'score_sum': score_sum}
+                         for emotion, (count, score_sum) in totals.items()], {}
+        if function == 'rebuild_mood_stats':
+            with self._lock:
+                self._bump_version('stats')
+                self._rollups = {}
+                for row in self.tables['journal_entries']:
+                    self._apply_rollups(row, 1)
+                return 200, sum(count for (granularity, _, _), (count, _) in self._rollups.items()
+                                if granularity == 'all'), {}
+        if function != 'search_journal_entries':
+            return 404, {'message': f'function {function} does not exist'}, {}
+        # Plain substring match on the query words; enough to exercise the route
+        words = [w for w in re.findall(r'[^\W_]+', args.get('query') or '') if w not in ('and',)]
+        emotions = set(args.get('emotions') or [])
+        with self._lock:
+            rows = [dict(row) for row in self.tables['journal_entries']
+                    if all(w.lower() in row['content'].lower() for w in words)
+                    and (not emotions or row.get('emotion_label') in emotions)]
+        rows.sort(key=lambda row: (row['created_at'], row['id']), reverse=True)
+        offset = int(args.get('result_offset') or 0)
+        rows = rows[offset:offset + int(args.get('result_limit') or 20)]
+        for row in rows:
+            row['rank'] = 1.0
+            row['snippet'] = row['content'][:120]
+        return 200, rows, {}
+
+    def rollup_rows(self, granularity, low, high, bucket_limit):
+        with self._lock:
+            rows = [{'granularity': key[0], 'bucket': key[1], 'emotion': key[2], 'count': count, 'score_sum': score_sum}
+                    for key, (count, score_sum) in self._rollups.items()
+                    if key[0] == granularity and low <= key[1] <= high]
+        buckets = sorted({row['bucket'] for row in rows}, reverse=True)[:bucket_limit]
+        return 200, [row for row in rows if row['bucket'] in buckets], {}
+
+    def changes_since(self, since, limit):
+        with self._lock:
+            entries = {row['id']: row for row in self.tables['journal_entries']}
+            changes = sorted((row for row in self.tables['journal_entry_changes'] if row['seq'] > since),
+                             key=lambda row: row['seq'])[:limit]
+            return 200, [{'seq': row['seq'], 'entry_id': row['entry_id'],
+                          'entry': dict(entries[row['entry_id']]) if row['entry_id'] in entries else None}
+                         for row in changes], {}
+
+
+# --- Hugging Face Inference API ----------------------------------------------
+
+class FakeInference(FakeService):
+    """Deterministic classifier scores per input text; failures look like a cold model"""
+
+    name = 'inference'
+
+    def __init__(self, load_seconds=0.0, unload_after=None, cold_models=None, **kwargs):
+        super().__init__(**kwargs)
+        # Cold start emulation: a model (all of them, or those in cold_models)
+        # loads for load_seconds on first use and after unload_after idle seconds
+        self.load_seconds = load_seconds
+        self.unload_after = unload_after
+        self.cold_models = set(cold_models) if cold_models else None
+        self._ready_at = {}
+        self._last_used = {}
+        self._models_lock = threading.Lock()
+
+    def loading_for(self, model):
+        """Seconds until ``model`` is loaded (0 when it is); calling it starts loading"""
+        if not self.load_seconds or (self.cold_models is not None and model not in self.cold_models):
+            return 0.0
+        now = time.monotonic()
+        with self._models_lock:
+            last_used = self._last_used.get(model)
+            self._last_used[model] = now
+            unloaded = self.unload_after is not None and last_used is not None and now - last_used > self.unload_after
+            if model not in self._ready_at or unloaded:
+                self._ready_at[model] = now + self.load_seconds
+                self.count('cold_starts')
+            return max(0.0, self._ready_at[model] - now)
+
+    def failure(self):
+        return 503, {'error': 'Model is currently loading', 'estimated_time': 20.0}, {}
+
+    @staticmethod
+    def _labels(model):
+        if 'emotion' in model:
+            return EMOTION_LABELS
+        if 'sst-2' in model:
+            return BINARY_LABELS
+        return SENTIMENT_LABELS
+
+    @staticmethod
+    def classify(labels, text):
+        """Softmax-looking scores seeded by the text, so repeats get the same answer"""
+        digest = hashlib.sha1(str(text).encode('utf-8')).digest()
+        weights = [digest[i] + 1 for i in range(len(labels))]
+        total = sum(weights)
+        scores = [{'label': label, 'score': round(w / total, 4)} for label, w in zip(labels, weights)]
+        return sorted(scores, key=lambda item: item['score'], reverse=True)
+
+    def handle(self, method, url, headers, body):
+        path = unquote(url.path)
+        if method != 'POST' or not path.startswith('/models/'):
+            return 404, {'error': f'unknown path {path}'}, {}
+        model = path[len('/models/'):]
+        inputs = (body or {}).get('inputs')
+        if inputs is None:
+            return 400, {'error': 'inputs is required'}, {}
+        labels = self._labels(model)
+        loading = self.loading_for(model)
+        if loading:
+            self.count(f'loading:{model}')
+            return 503, {'error': f'Model {model} is currently loading', 'estimated_time': round(loading, 2)}, {}
+        self.count(f'model:{model}')
+        if isinstance(inputs, list):
+            self.count('batched_inputs', len(inputs))
+            return 200, [self.classify(labels, text) for text in inputs], {}
+        return 200, [self.classify(labels, inputs)], {}
+
+
+# --- IntaSend ----------------------------------------------------------------
+
+class FakeIntaSend(FakeService):
+    """Checkout creation only"""
+
+    name = 'intasend'
+
+    STATES = ['COMPLETE'] * 6 + ['FAILED'] * 2 + ['PENDING'] * 2
+
+    @classmethod
+    def state(cls, invoice_id):
+        """Same answer for an invoice every time it is asked"""
+        digest = hashlib.md5(str(invoice_id).encode('utf-8')).digest()
+        return cls.STATES[digest[0] % len(cls.STATES)]
+
+    def handle(self, method, url, headers, body):
+        if method == 'POST' and url.path.rstrip('/').endswith('/v1/payment/status'):
+            self.count('status_checks')
+            invoice_id = (body or {}).get('invoice_id')
+            return 200, {'invoice': {'invoice_id': invoice_id, 'state': self.state(invoice_id)}}, {}
+        if method != 'POST' or not url.path.rstrip('/').endswith('/v1/checkout'):
+            return 404, {'detail': 'Not found.'}, {}
+        self.count('checkouts')
+        payment_id = f'fake_{self.stats()["requests"]}_{int(time.time() * 1000)}'
+        return 200, {'payment_id': payment_id, 'payment_url': f'{self.url}/checkout/{payment_id}',
+                     'amount': (body or {}).get('amount')}, {}
+
+
+def start_services(seed_entries=0, seed_payments=0, db_latency_ms=5.0, hf_latency_ms=150.0,
+                   hf_jitter_ms=50.0, hf_error_rate=0.0, intasend_latency_ms=200.0,
+                   intasend_error_rate=0.0, host='127.0.0.1', ports=(0, 0, 0), seed=7,
+                   seed_pending_payments=0, hf_load_seconds=0.0, hf_unload_after=None, hf_cold_models=None):
+    """Start all three stand-ins; returns {'supabase': ..., 'huggingface': ..., 'intasend': ...}"""
+    return {
+        'supabase': FakePostgREST(
+            seed_entries=seed_entries, seed_payments=seed_payments,
+            seed_pending_payments=seed_pending_payments, host=host, port=ports[0],
+            latency_ms=db_latency_ms, jitter_ms=db_latency_ms / 2, seed=seed,
+        ).start(),
+        'huggingface': FakeInference(
+            host=host, port=ports[1], latency_ms=hf_latency_ms, jitter_ms=hf_jitter_ms,
+            error_rate=hf_error_rate, seed=seed + 1, load_seconds=hf_load_seconds,
+            unload_after=hf_unload_after, cold_models=hf_cold_models,
+        ).start(),
+        'intasend': FakeIntaSend(
+            host=host, port=ports[2], latency_ms=intasend_latency_ms, jitter_ms=intasend_latency_ms / 4,
+            error_rate=intasend_error_rate, seed=seed + 2,
+        ).start(),
+    }
+
+
+def app_environment(services):
+    """Environment variables that point the app at the stand-ins"""
+    return {
+        'STORAGE_BACKEND': 'supabase',
+        'SUPABASE_URL': services['supabase'].url,
+        # supabase-py only checks that the key looks like a JWT
+        'SUPABASE_ANON_KEY': 'bench.bench.bench',
+        'HF_API_BASE': f"{services['huggingface'].url}/models",
+        'HUGGINGFACE_API_KEY': 'hf_bench',
+        'INTASEND_API_BASE': services['intasend'].url,
+        'INTASEND_API_KEY': 'intasend_bench',
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--ports', default='54321,54322,54323', help='PostgREST,inference,IntaSend ports')
+    parser.add_argument('--seed-entries', type=int, default=1000)
+    parser.add_argument('--seed-payments', type=int, default=50)
+    parser.add_argument('--seed-pending-payments', type=int, default=0)
+    parser.add_argument('--db-latency-ms', type=float, default=5.0)
+    parser.add_argument('--hf-latency-ms', type=float, default=150.0)
+    parser.add_argument('--hf-jitter-ms', type=float, default=50.0)
+    parser.add_argument('--hf-error-rate', type=float, default=0.0)
+    parser.add_argument('--hf-load-seconds', type=float, default=0.0, help='Cold start time per model (0: always warm)')
+    parser.add_argument('--hf-unload-after', type=float, default=None, help='Idle seconds before a model unloads')
+    parser.add_argument('--intasend-latency-ms', type=float, default=200.0)
+    parser.add_argument('--intasend-error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    services = start_services(
+        seed_entries=args.seed_entries, seed_payments=args.seed_payments,
+        seed_pending_payments=args.seed_pending_payments, db_latency_ms=args.db_latency_ms, hf_latency_ms=args.hf_latency_ms, hf_jitter_ms=args.hf_jitter_ms,
+        hf_error_rate=args.hf_error_rate, hf_load_seconds=args.hf_load_seconds,
+        hf_unload_after=args.hf_unload_after, intasend_latency_ms=args.intasend_latency_ms,
+        intasend_error_rate=args.intasend_error_rate, host=args.host,
+        ports=tuple(int(p) for p in args.ports.split(',')),
+    )
+    print("🧪 Stand-ins running. Start the app with:")
+    for key, value in app_environment(services).items():
+        print(f"   export {key}={value}")
+    print("🛑 Press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        for service in services.values():
+            service.stop()
+
+
+if __name__ == '__main__':
+    main()
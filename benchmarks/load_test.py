@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Mood Journal - Load Test
+Runs the Flask app against the local stand-ins in fake_services.py and
+drives a weighted mix of analyze, create, list, search, stats and payment
+calls from concurrent clients. Reports throughput, p50/p95/p99 latency per
+operation, error counts and the app's memory, and writes everything as JSON
+so runs can be compared across commits.
+
+    python benchmarks/load_test.py --duration 30 --concurrency 16 --output benchmarks/results/head.json
+    python benchmarks/load_test.py --duration 30 --compare benchmarks/results/head.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fake_services import WORDS, app_environment, start_services
+
+DEFAULT_MIX = 'analyze=25,create=15,list=25,search=5,stats=15,payment=5,payments=10'
+RESULT_VERSION = 1
+
+
+def make_texts(count, seed=11):
+    """Pool of journal-like texts; drawing from a finite pool gives realistic cache hits"""
+    rng = random.Random(seed)
+    return [' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 40))) for _ in range(count)]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in OPERATIONS:
+            raise SystemExit(f"Unknown operation '{name}'. Choose from: {', '.join(OPERATIONS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# Each operation returns (method, path, json body or None)
+OPERATIONS = {
+    'analyze': lambda rng, texts: ('POST', '/api/ai/analyze', {'content': rng.choice(texts)}),
+    'create': lambda rng, texts: ('POST', '/api/entries', {'content': rng.choice(texts)}),
+    'list': lambda rng, texts: ('GET', f'/api/entries?limit={rng.choice([20, 50])}', None),
+    'search': lambda rng, texts: ('GET', f'/api/entries/search?q={rng.choice(WORDS)}', None),
+    'stats': lambda rng, texts: ('GET', '/api/stats', None),
+    'payment': lambda rng, texts: ('POST', '/api/payment/initiate',
+                                   {'plan_type': rng.choice(['basic', 'premium']), 'amount': 5.99}),
+    'payments': lambda rng, texts: ('GET', '/api/payments', None),
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, duration):
+    """samples: list of (latency_ms, status or None); None means a transport error"""
+    latencies = sorted(ms for ms, _ in samples)
+    statuses = {}
+    errors = 0
+    for _, status in samples:
+        key = str(status) if status is not None else 'exception'
+        statuses[key] = statuses.get(key, 0) + 1
+        if status is None or status >= 500:
+            errors += 1
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(samples) / duration, 2) if duration else 0.0,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 2) if latencies else None,
+            'p50': _round(percentile(latencies, 50)),
+            'p95': _round(percentile(latencies, 95)),
+            'p99': _round(percentile(latencies, 99)),
+            'max': _round(latencies[-1] if latencies else None),
+        },
+        'status': dict(sorted(statuses.items())),
+    }
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+def process_memory_mb(pid):
+    """Current and peak RSS of ``pid`` in MB (Linux /proc, else psutil if installed)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return (int(fields['VmRSS'].split()[0]) / 1024, int(fields['VmHWM'].split()[0]) / 1024)
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        import psutil
+        rss = psutil.Process(pid).memory_info().rss / (1024 * 1024)
+        return rss, rss
+    except Exception:
+        return None, None
+
+
+def git_revision():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True,
+                                         stderr=subprocess.DEVNULL).strip()
+        dirty = bool(subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                             cwd=ROOT, text=True, stderr=subprocess.DEVNULL).strip())
+        return {'commit': commit, 'dirty': dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+
+def start_app(env, port, log):
+    """Start the app in a subprocess with the threaded dev server"""
+    code = f"from app import create_app; create_app().run(host='127.0.0.1', port={port}, threaded=True, use_reloader=False)"
+    return subprocess.Popen([sys.executable, '-c', code], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_ready(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"❌ App exited with code {process.returncode} during startup")
+        try:
+            if requests.get(f'{base_url}/api/ai/cache', timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"❌ App at {base_url} not ready after {timeout}s")
+
+
+def free_port():
+    import socket
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class LoadDriver:
+    """Closed-loop clients: each thread sends its next request as soon as the last one returns"""
+
+    def __init__(self, base_url, mix, texts, concurrency, timeout=30, seed=1):
+        self.base_url = base_url
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.texts = texts
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.seed = seed
+        self.samples = {name: [] for name in self.names}
+        self._lock = threading.Lock()
+
+    def _client(self, index, stop_at, record_after):
+        rng = random.Random(self.seed * 1000 + index)
+        session = requests.Session()
+        local = {name: [] for name in self.names}
+        while time.monotonic() < stop_at:
+            name = rng.choices(self.names, self.weights)[0]
+            method, path, body = OPERATIONS[name](rng, self.texts)
+            started = time.monotonic()
+            try:
+                status = session.request(method, self.base_url + path, json=body, timeout=self.timeout).status_code
+            except requests.RequestException:
+                status = None
+            if started >= record_after:
+                local[name].append(((time.monotonic() - started) * 1000, status))
+        with self._lock:
+            for name, samples in local.items():
+                self.samples[name].extend(samples)
+
+    def run(self, duration, warmup=0.0, on_tick=None):
+        """Returns the measured window in seconds"""
+        now = time.monotonic()
+        record_after = now + warmup
+        stop_at = record_after + duration
+        threads = [threading.Thread(target=self._client, args=(i, stop_at, record_after), daemon=True)
+                   for i in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            if on_tick:
+                on_tick()
+            time.sleep(0.5)
+        return duration
+
+
+def compare(current, baseline):
+    """Print throughput and p95 deltas per operation against a previous result file"""
+    print(f"\n📊 Compared with {baseline.get('git', {}).get('commit', '?')[:12]} "
+          f"({baseline.get('started_at', '?')})")
+    print(f"{'operation':<10} {'rps':>10} {'Δ':>8} {'p95 ms':>10} {'Δ':>8}")
+    rows = dict(current['operations'], total=current['totals'])
+    base_rows = dict(baseline.get('operations', {}), total=baseline.get('totals', {}))
+    for name, row in rows.items():
+        base = base_rows.get(name)
+        if not base:
+            continue
+        rps, base_rps = row['throughput_rps'], base.get('throughput_rps') or 0
+        p95, base_p95 = row['latency_ms']['p95'], (base.get('latency_ms') or {}).get('p95')
+        d_rps = f"{(rps - base_rps) / base_rps:+.0%}" if base_rps else 'n/a'
+        d_p95 = f"{(p95 - base_p95) / base_p95:+.0%}" if p95 is not None and base_p95 else 'n/a'
+        print(f"{name:<10} {rps:>10.1f} {d_rps:>8} {p95 if p95 is not None else 0:>10.1f} {d_p95:>8}")
+
+
+def print_report(result):
+    print(f"\n🚀 {result['totals']['requests']} requests in {result['config']['duration']}s "
+          f"with {result['config']['concurrency']} clients")
+    print("=" * 78)
+    print(f"{'operation':<10} {'requests':>9} {'errors':>7} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for name, row in dict(result['operations'], total=result['totals']).items():
+        lat = row['latency_ms']
+        cells = [f"{lat[k]:>9.1f}" if lat[k] is not None else f"{'-':>9}" for k in ('p50', 'p95', 'p99', 'max')]
+        print(f"{name:<10} {row['requests']:>9} {row['errors']:>7} {row['throughput_rps']:>9.1f} {' '.join(cells)}")
+    memory = result['memory']
+    if memory.get('rss_peak_mb') is not None:
+        print(f"🧠 App RSS: {memory['rss_start_mb']} MB at start, {memory['rss_end_mb']} MB at end, "
+              f"{memory['rss_peak_mb']} MB peak")
+    for name, counts in result['upstream'].items():
+        print(f"🔌 {name}: {counts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--duration', type=float, default=20, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=3, help='Seconds of load before measuring')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Weighted operations, e.g. analyze=3,list=1')
+    parser.add_argument('--texts', type=int, default=2000, help='Size of the text pool (smaller = more cache hits)')
+    parser.add_argument('--storage', choices=['supabase', 'sqlite'], default='supabase',
+                        help='supabase uses the fake PostgREST; sqlite uses a temporary database')
+    parser.add_argument('--seed-entries', type=int, default=2000)
+    parser.add_argument('--seed-payments', type=int, default=100)
+    parser.add_argument('--db-latency-ms', type=float, default=5.0)
+    parser.add_argument('--hf-latency-ms', type=float, default=150.0)
+    parser.add_argument('--hf-jitter-ms', type=float, default=50.0)
+    parser.add_argument('--hf-error-rate', type=float, default=0.02)
+    parser.add_argument('--intasend-latency-ms', type=float, default=200.0)
+    parser.add_argument('--intasend-error-rate', type=float, default=0.0)
+    parser.add_argument('--url', help='Load an already running app instead of starting one')
+    parser.add_argument('--pid', type=int, help='PID of the app at --url, for memory readings')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='Extra environment for the started app (repeatable)')
+    parser.add_argument('--output', help='Write the JSON result here')
+    parser.add_argument('--compare', help='Previous JSON result to compare against')
+    parser.add_argument('--json', action='store_true', help='Print the JSON result instead of a table')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    services = start_services(
+        seed_entries=args.seed_entries, seed_payments=args.seed_payments,
+        db_latency_ms=args.db_latency_ms, hf_latency_ms=args.hf_latency_ms, hf_jitter_ms=args.hf_jitter_ms,
+        hf_error_rate=args.hf_error_rate, intasend_latency_ms=args.intasend_latency_ms,
+        intasend_error_rate=args.intasend_error_rate,
+    )
+    workdir = tempfile.mkdtemp(prefix='mood-journal-bench-')
+    process = None
+    pid = args.pid
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            port = free_port()
+            base_url = f'http://127.0.0.1:{port}'
+            env = dict(os.environ)
+            env.update(app_environment(services))
+            env.update({
+                'SQLITE_DB_PATH': os.path.join(workdir, 'mood_journal.db'),
+                'SENTIMENT_CACHE_DB': os.path.join(workdir, 'sentiment_cache.db'),
+                'SENTIMENT_PROVIDERS': 'huggingface,local',
+                'PYTHONUNBUFFERED': '1',
+            })
+            if args.storage == 'sqlite':
+                env['STORAGE_BACKEND'] = 'sqlite'
+            for item in args.env:
+                key, _, value = item.partition('=')
+                env[key] = value
+            log_path = os.path.join(workdir, 'app.log')
+            process = start_app(env, port, open(log_path, 'w'))
+            pid = process.pid
+        wait_ready(base_url, process)
+
+        rss_start, _ = process_memory_mb(pid) if pid else (None, None)
+        readings = []
+
+        def sample_memory():
+            if pid:
+                readings.append(process_memory_mb(pid)[0])
+
+        started_at = datetime.now(timezone.utc).isoformat()
+        driver = LoadDriver(base_url, mix, make_texts(args.texts), args.concurrency)
+        duration = driver.run(args.duration, warmup=args.warmup, on_tick=sample_memory)
+        rss_end, rss_peak = process_memory_mb(pid) if pid else (None, None)
+        readings = [r for r in readings if r is not None]
+
+        all_samples = [sample for samples in driver.samples.values() for sample in samples]
+        result = {
+            'benchmark': 'load_test',
+            'version': RESULT_VERSION,
+            'started_at': started_at,
+            'git': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': {
+                'duration': args.duration, 'warmup': args.warmup, 'concurrency': args.concurrency,
+                'mix': mix, 'texts': args.texts, 'storage': args.storage if not args.url else 'external',
+                'seed_entries': args.seed_entries, 'seed_payments': args.seed_payments,
+                'db_latency_ms': args.db_latency_ms, 'hf_latency_ms': args.hf_latency_ms,
+                'hf_jitter_ms': args.hf_jitter_ms, 'hf_error_rate': args.hf_error_rate,
+                'intasend_latency_ms': args.intasend_latency_ms, 'intasend_error_rate': args.intasend_error_rate,
+                'env': args.env,
+            },
+            'totals': summarize(all_samples, duration),
+            'operations': {name: summarize(samples, duration) for name, samples in driver.samples.items()},
+            'memory': {
+                'rss_start_mb': _round(rss_start),
+                'rss_end_mb': _round(rss_end),
+                # VmHWM covers startup too; the sampled max only the load window
+                'rss_peak_mb': _round(rss_peak if rss_peak is not None else max(readings, default=None)),
+                'rss_load_max_mb': _round(max(readings, default=None)),
+            },
+            'upstream': {name: service.stats() for name, service in services.items()},
+        }
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        for service in services.values():
+            service.stop()
+
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+        if args.output:
+            print(f"💾 Saved to {args.output}")
+        if process is not None:
+            print(f"📝 App log: {os.path.join(workdir, 'app.log')}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(result, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
 # Check Supabase table structure
-from app import supabase
+from storage import connect_supabase
+
+supabase = connect_supabase()
 
 def check_table_structure():
     print("🔍 Checking Supabase table structure...")
@@ -0,0 +1,210 @@
+"""
+Negotiated gzip/brotli response compression.
+
+``init_compression(app)`` registers hooks that compress API responses and
+static assets when the client accepts it and the body is worth it (at least
+``min_size`` bytes of a text-like type). Streamed responses such as exports
+are compressed chunk by chunk. Compressed static files are cached by path
+and ETag, so each asset is only compressed once per process. Brotli is used
+when the optional ``brotli`` package is installed and the client prefers it.
+
+A compressed body gets its own strong ETag (``"<etag>-gzip"``); the suffix is
+stripped from incoming ``If-None-Match`` headers so conditional GETs keep
+matching the uncompressed tag.
+"""
+
+import gzip
+import zlib
+
+from flask import g, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript', 'application/x-ndjson',
+    'application/xml', 'image/svg+xml',
+)
+# Most preferred first
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+# Event streams are flushed event by event; compressing them would buffer
+INCOMPRESSIBLE_TYPES = ('text/event-stream',)
+MAX_STATIC_CACHE_ENTRIES = 256
+
+
+class _GzipStream:
+    def __init__(self, level):
+        # wbits=31: gzip container, so clients can use the stock decoder
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def chunk(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ResponseCompressor:
+    """Picks an encoding per request and compresses eligible responses"""
+
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=5, static_brotli_quality=11):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.static_brotli_quality = static_brotli_quality
+        self._static_cache = {}
+        self.compressed = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def negotiate(self):
+        """Best encoding the client accepts (q > 0), or None"""
+        accepted = request.accept_encodings
+        best = None
+        best_quality = 0
+        for encoding in ENCODINGS:
+            quality = accepted[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def compress(self, data, encoding, static=False):
+        if encoding == 'br':
+            quality = self.static_brotli_quality if static else self.brotli_quality
+            return brotli.compress(data, quality=quality)
+        return gzip.compress(data, compresslevel=9 if static else self.gzip_level, mtime=0)
+
+    def _stream(self, encoding, iterable):
+        compressor = _BrotliStream(self.brotli_quality) if encoding == 'br' else _GzipStream(self.gzip_level)
+        for data in iterable:
+            if isinstance(data, str):
+                data = data.encode('utf-8')
+            if data:
+                yield compressor.chunk(data)
+        yield compressor.finish()
+
+    @staticmethod
+    def _compressible(response):
+        mimetype = response.mimetype or ''
+        return mimetype.startswith(COMPRESSIBLE_TYPES) and mimetype not in INCOMPRESSIBLE_TYPES
+
+    def strip_etag_suffix(self):
+        """before_request: match If-None-Match against the uncompressed ETag"""
+        header = request.environ.get('HTTP_IF_NONE_MATCH')
+        if not header:
+            return
+        for encoding in ('br', 'gzip'):
+            suffix = f'-{encoding}"'
+            if suffix in header:
+                request.environ['HTTP_IF_NONE_MATCH'] = header.replace(suffix, '"')
+                g.etag_encoding = encoding
+                return
+
+    def _tag(self, response, encoding):
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f'{etag}-{encoding}', weak=weak)
+
+    def after_request(self, response):
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate()
+
+        if response.status_code == 304:
+            # Echo the tag of the representation the client already holds
+            previous = g.get('etag_encoding')
+            if previous and previous == encoding:
+                self._tag(response, encoding)
+            return response
+
+        if (
+            encoding is None
+            or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or not self._compressible(response)
+            or request.method == 'HEAD'
+        ):
+            self.skipped += 1
+            return response
+
+        if response.is_streamed and not response.direct_passthrough:
+            response.response = self._stream(encoding, response.response)
+            response.headers.pop('Content-Length', None)
+            response.headers['Content-Encoding'] = encoding
+            self._tag(response, encoding)
+            self.compressed += 1
+            return response
+
+        static = request.endpoint == 'static'
+        if static:
+            key = (request.path, response.get_etag()[0], encoding)
+            cached = self._static_cache.get(key)
+            if cached is None:
+                response.direct_passthrough = False
+                data = response.get_data()
+                if len(data) < self.min_size:
+                    self.skipped += 1
+                    return response
+                cached = (self.compress(data, encoding, static=True), len(data))
+                if len(self._static_cache) >= MAX_STATIC_CACHE_ENTRIES:
+                    self._static_cache.clear()
+                self._static_cache[key] = cached
+            else:
+                # Cached: the file itself need not be read again
+                response.close()
+            body, size = cached
+            response.direct_passthrough = False
+        else:
+            data = response.get_data()
+            size = len(data)
+            if size < self.min_size:
+                self.skipped += 1
+                return response
+            body = self.compress(data, encoding)
+            if len(body) >= size:
+                self.skipped += 1
+                return response
+
+        response.set_data(body)
+        # Byte ranges would refer to the uncompressed file
+        response.headers.pop('Accept-Ranges', None)
+        self.bytes_in += size
+        self.bytes_out += len(body)
+        self.compressed += 1
+        response.headers['Content-Encoding'] = encoding
+        self._tag(response, encoding)
+        return response
+
+    def stats(self):
+        return {
+            'encodings': list(ENCODINGS),
+            'min_size': self.min_size,
+            'compressed': self.compressed,
+            'skipped': self.skipped,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'ratio': round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else None,
+            'static_cached': len(self._static_cache),
+        }
+
+
+def init_compression(app, **options):
+    """Register the compression hooks on ``app`` and return the compressor"""
+    compressor = ResponseCompressor(**options)
+    app.extensions['compression'] = compressor
+    app.before_request(compressor.strip_etag_suffix)
+    app.after_request(compressor.after_request)
+    return compressor
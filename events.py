@@ -0,0 +1,250 @@
+"""
+Change events for the Server-Sent Events stream (/api/stream).
+
+Write paths publish small deltas (entry created, deleted or analyzed, stats
+changed) to an ``EventBroker``. Events are appended to a short log, kept in a
+SQLite file shared by all workers on a host (or in memory when ``db_path`` is
+empty), so a subscriber sees writes made by any worker and a reconnecting
+client can resume from its ``Last-Event-ID``. One tailer thread per process
+reads new log rows and fans them out to that process's subscribers; a local
+publish wakes it immediately, other workers' events arrive within
+``poll_interval``.
+
+A subscriber that falls ``max_pending`` events behind, or resumes from an id
+that has already been trimmed from the log, gets a single ``reset`` event and
+should refetch its state.
+"""
+
+import asyncio
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+
+RESET = 'reset'
+# Log rows read per query by the tailer
+READ_BATCH = 500
+
+
+def format_event(event):
+    """One event in text/event-stream framing"""
+    lines = []
+    if event.get('id') is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {event['data']}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def reset_event(reason):
+    return {'id': None, 'type': RESET, 'data': json.dumps({'reason': reason})}
+
+
+class Subscription:
+    """One stream's queue of pending events (blocking ``get`` for WSGI threads)"""
+
+    def __init__(self, max_pending=256):
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._behind = False
+        self._queue = queue.Queue()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def deliver(self, event):
+        """Called by the broker; a subscriber too far behind gets one reset instead"""
+        if self._behind:
+            self.dropped += 1
+            return
+        if self.pending() >= self.max_pending:
+            self._behind = True
+            self.dropped += 1
+            self._put(reset_event('behind'))
+            return
+        self._put(event)
+
+    def _put(self, event):
+        self._queue.put_nowait(event)
+
+    def _received(self, event):
+        if event['type'] == RESET:
+            # The client refetches everything, so delivery can resume
+            self._behind = False
+        return event
+
+    def get(self, timeout=None):
+        """Next event, or None after ``timeout`` seconds without one"""
+        try:
+            return self._received(self._queue.get(timeout=timeout))
+        except queue.Empty:
+            return None
+
+
+class AsyncSubscription(Subscription):
+    """Subscription read from an event loop (ASGI mode) without holding a thread"""
+
+    def __init__(self, max_pending=256, loop=None):
+        super().__init__(max_pending)
+        self._loop = loop or asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+
+    def _put(self, event):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+
+    async def get(self, timeout=None):
+        try:
+            return self._received(await asyncio.wait_for(self._queue.get(), timeout))
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBroker:
+    """Append-only event log with per-process fan-out to live subscribers"""
+
+    def __init__(self, db_path=None, history=1000, poll_interval=0.5, max_subscribers=100):
+        self.db_path = db_path
+        self.history = history
+        self.poll_interval = poll_interval
+        self.max_subscribers = max_subscribers
+        self.published = 0
+        self.delivered = 0
+
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._wake = threading.Event()
+        self._tailer = None
+        self._memory = deque(maxlen=history)
+        self._next_id = 1
+        self._db = None
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=10, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.executescript('''
+                CREATE TABLE IF NOT EXISTS events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    type TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+            ''')
+        # Subscribers only see events published after the broker started
+        self._cursor = self.last_id()
+
+    def last_id(self):
+        """Id of the newest event in the log (0 when empty)"""
+        with self._lock:
+            return self._last_id()
+
+    def _last_id(self):
+        if self._db is None:
+            return self._next_id - 1
+        return self._db.execute('SELECT MAX(id) FROM events').fetchone()[0] or 0
+
+    def _oldest_id(self):
+        if self._db is None:
+            return self._memory[0]['id'] if self._memory else self._next_id
+        row = self._db.execute('SELECT MIN(id) FROM events').fetchone()
+        return row[0] or self._cursor + 1
+
+    def _read_since(self, last_id, limit=READ_BATCH):
+        if self._db is None:
+            return [event for event in self._memory if event['id'] > last_id][:limit]
+        rows = self._db.execute(
+            'SELECT id, type, data FROM events WHERE id > ? ORDER BY id LIMIT ?', (last_id, limit)
+        ).fetchall()
+        return [{'id': row[0], 'type': row[1], 'data': row[2]} for row in rows]
+
+    def publish(self, event_type, data):
+        """Append an event; returns its id"""
+        payload = json.dumps(data, default=str, separators=(',', ':'))
+        with self._lock:
+            if self._db is None:
+                event_id = self._next_id
+                self._next_id += 1
+                self._memory.append({'id': event_id, 'type': event_type, 'data': payload})
+            else:
+                event_id = self._db.execute(
+                    'INSERT INTO events (type, data, created_at) VALUES (?, ?, ?)',
+                    (event_type, payload, time.time())
+                ).lastrowid
+                if event_id % 100 == 0:
+                    self._db.execute('DELETE FROM events WHERE id <= ?', (event_id - self.history,))
+            self.published += 1
+        self._wake.set()
+        return event_id
+
+    def subscribe(self, last_event_id=None, subscription=None, limit=None):
+        """
+        Register a subscriber (a new ``Subscription`` unless one is given);
+        events after ``last_event_id`` are replayed first. Returns None when
+        ``max_subscribers`` (or the lower ``limit``) streams are already open
+        in this process.
+        """
+        subscription = subscription or Subscription()
+        cap = self.max_subscribers if limit is None else min(limit, self.max_subscribers)
+        with self._lock:
+            if len(self._subscribers) >= cap:
+                return None
+            if last_event_id is not None and self._db is None and last_event_id > self._cursor:
+                # Ids from before a restart of this in-memory log
+                subscription.deliver(reset_event('restarted'))
+            elif last_event_id is not None and last_event_id < self._cursor:
+                if last_event_id + 1 < self._oldest_id():
+                    subscription.deliver(reset_event('expired'))
+                else:
+                    for event in self._read_since(last_event_id, limit=self.history):
+                        if event['id'] > self._cursor:
+                            break
+                        subscription.deliver(event)
+            self._subscribers.add(subscription)
+            if self._tailer is None or not self._tailer.is_alive():
+                self._tailer = threading.Thread(target=self._tail, name='event-tailer', daemon=True)
+                self._tailer.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _tail(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                self._fan_out()
+            except Exception as e:
+                print(f"Error reading events: {e}")
+
+    def _fan_out(self):
+        with self._lock:
+            if not self._subscribers:
+                # Nobody listening: skip ahead rather than replaying later
+                self._cursor = self._last_id()
+                return
+            events = self._read_since(self._cursor)
+            for event in events:
+                for subscription in self._subscribers:
+                    subscription.deliver(event)
+                self.delivered += len(self._subscribers)
+                self._cursor = event['id']
+            if len(events) == READ_BATCH:
+                self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'max_subscribers': self.max_subscribers,
+                'published': self.published,
+                'delivered': self.delivered,
+                'last_id': self._cursor,
+                'shared': self._db is not None,
+            }
@@ -0,0 +1,95 @@
+"""
+Streaming export of entries and payments.
+
+Rows are pulled from storage one page at a time and serialized into NDJSON or
+CSV chunks by generators, so a Flask streaming response can send an export of
+any size while holding at most one page and one output chunk in memory.
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime, time, timedelta, timezone
+
+from importer import parse_created_at
+
+FORMATS = ('ndjson', 'csv')
+MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+# Serialized bytes gathered before a chunk is handed to the server
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_format(value):
+    fmt = (value or 'ndjson').lower()
+    if fmt in ('jsonl', 'json'):
+        fmt = 'ndjson'
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported format: {fmt}')
+    return fmt
+
+
+def parse_range(start=None, end=None):
+    """
+    Turn ``from``/``to`` query values into ``(created_from, created_to)``
+    bounds for storage. Dates cover whole UTC days (``to`` is inclusive);
+    full timestamps are used as-is, with ``to`` exclusive.
+    """
+    def bound(value, upper):
+        if not value:
+            return None
+        try:
+            day = date.fromisoformat(value)
+        except ValueError:
+            try:
+                return parse_created_at(value)
+            except ValueError:
+                raise ValueError(f'Invalid date: {value}')
+        if upper:
+            day += timedelta(days=1)
+        return datetime.combine(day, time(), timezone.utc).isoformat(timespec='microseconds')
+
+    created_from, created_to = bound(start, False), bound(end, True)
+    if created_from and created_to and created_from >= created_to:
+        raise ValueError('from must be before to')
+    return created_from, created_to
+
+
+def _chunks(pieces):
+    """Join small serialized pieces into roughly CHUNK_SIZE strings"""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_ndjson(rows):
+    """One JSON object per line"""
+    return _chunks(json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n' for row in rows)
+
+
+def stream_csv(rows, fields):
+    """Header plus one CSV record per row, columns in ``fields`` order"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(fields), extrasaction='ignore')
+
+    def records():
+        writer.writeheader()
+        yield buffer.getvalue()
+        for row in rows:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow(row)
+            yield buffer.getvalue()
+
+    return _chunks(records())
+
+
+def stream_rows(rows, fmt, fields):
+    return stream_csv(rows, fields) if fmt == 'csv' else stream_ndjson(rows)
@@ -0,0 +1,179 @@
+"""
+Shared keep-alive HTTP sessions for upstream APIs.
+
+One ``requests.Session`` is kept per upstream host so TCP/TLS connections are
+reused across calls and threads. Each session has a bounded connection pool,
+retries failures that happen before a request reaches the upstream, and
+separate connect/read timeouts. Hosts whose calls are safe to repeat
+(``retry_reads``) also retry connections the upstream reset or closed before
+answering; read timeouts are never retried.
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+
+
+class _ResetRetry(Retry):
+    """Read retries for dropped connections only: a read timeout is raised as is"""
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if isinstance(error, ReadTimeoutError):
+            raise error.with_traceback(_stacktrace)
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+class UpstreamSessions:
+    """Thread-safe registry of pooled sessions keyed by scheme://host"""
+
+    def __init__(self, pool_size=10, connect_timeout=3.05, read_timeout=20, retries=2, retry_reads=False,
+                 observer=None):
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.retry_reads = retry_reads
+        # Called as observer(url, status_code, seconds, error) after every request
+        self.observer = observer
+
+        self._sessions = {}
+        self._host_options = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def configure(self, base_url, **options):
+        """Override pool options (``pool_size``, ``retries``, ``retry_reads``) for one host"""
+        with self._lock:
+            self._host_options[self._host_key(base_url)] = options
+
+    @staticmethod
+    def _host_key(url):
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def _build_session(self, host, options):
+        retries = options.get('retries', self.retries)
+        if options.get('retry_reads', self.retry_reads):
+            # Idempotent calls (any method): a reset connection is sent again
+            retry = _ResetRetry(
+                total=retries,
+                connect=retries,
+                read=retries,
+                status=0,
+                other=retries,
+                allowed_methods=None,
+                backoff_factor=0.1,
+                raise_on_status=False,
+            )
+        else:
+            retry = Retry(
+                total=retries,
+                connect=retries,
+                # Never after the request was sent: a reset or read timeout on
+                # a POST may mean the upstream already acted on it (or charged)
+                read=0,
+                status=0,
+                other=retries,
+                backoff_factor=0.1,
+                raise_on_status=False,
+            )
+        pool_size = options.get('pool_size', self.pool_size)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount(host, adapter)
+        session.headers['Connection'] = 'keep-alive'
+        return session, adapter
+
+    def session_for(self, url):
+        """Return the pooled session for the host of ``url``"""
+        host = self._host_key(url)
+        with self._lock:
+            entry = self._sessions.get(host)
+            if entry is None:
+                entry = self._build_session(host, self._host_options.get(host, {}))
+                self._sessions[host] = entry
+                self._counters[host] = {'requests': 0, 'errors': 0}
+            return entry[0]
+
+    def _count(self, url, field):
+        host = self._host_key(url)
+        with self._lock:
+            if host in self._counters:
+                self._counters[host][field] += 1
+
+    def request(self, method, url, timeout=None, **kwargs):
+        """Issue a request through the host's pool with (connect, read) timeouts"""
+        if timeout is None:
+            timeout = (self.connect_timeout, self.read_timeout)
+        elif not isinstance(timeout, tuple):
+            timeout = (min(self.connect_timeout, timeout), timeout)
+        session = self.session_for(url)
+        self._count(url, 'requests')
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except requests.RequestException as e:
+            self._count(url, 'errors')
+            self._observe(url, None, started, type(e).__name__)
+            raise
+        self._observe(url, response.status_code, started, None)
+        return response
+
+    def _observe(self, url, status_code, started, error):
+        if self.observer is None:
+            return
+        try:
+            self.observer(url, status_code, time.perf_counter() - started, error)
+        except Exception as e:
+            print(f"Error recording upstream metrics: {e}")
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def stats(self):
+        """Per-host request counts and how many of them reused a connection"""
+        with self._lock:
+            sessions = dict(self._sessions)
+            counters = {host: dict(values) for host, values in self._counters.items()}
+
+        report = {}
+        for host, (_, adapter) in sessions.items():
+            opened = 0
+            idle = 0
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                try:
+                    pool = pools[key]
+                except KeyError:
+                    continue
+                opened += pool.num_connections
+                if pool.pool is not None:
+                    # The pool queue is pre-filled with None placeholders
+                    idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+            requests_made = counters[host]['requests']
+            reused = max(0, requests_made - opened)
+            report[host] = {
+                'requests': requests_made,
+                'errors': counters[host]['errors'],
+                'connections_opened': opened,
+                'connections_idle': idle,
+                'reused': reused,
+                'reuse_ratio': round(reused / requests_made, 4) if requests_made else 0.0,
+                'pool_size': adapter._pool_maxsize,
+            }
+        return report
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session, _ in sessions:
+            session.close()
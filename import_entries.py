@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Mood Journal - Bulk Import
+Load a JSONL or CSV export from another journaling app straight into storage.
+
+    python import_entries.py history.jsonl
+    python import_entries.py history.csv --batch-size 1000 --provider local
+"""
+
+import argparse
+import io
+import json
+import sys
+
+def main():
+    """Parse arguments and stream the file into the configured storage"""
+    parser = argparse.ArgumentParser(description='Bulk import journal entries from JSONL or CSV')
+    parser.add_argument('path', help='File to import ("-" for stdin)')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help='Defaults to the file extension')
+    parser.add_argument('--batch-size', type=int, help='Rows per database round trip')
+    parser.add_argument('--no-score', action='store_true', help='Store rows without a label as neutral')
+    parser.add_argument('--provider', help='Sentiment provider for unlabeled rows (e.g. local)')
+    parser.add_argument('--report', help='Write the full JSON report to this file')
+    args = parser.parse_args()
+
+    # Imported here so --help works without configuring the app
+    import app
+    from importer import detect_format
+
+    fmt = detect_format(args.format, args.path)
+    if args.provider and args.provider not in app.sentiment_providers:
+        print(f"❌ Unknown provider: {args.provider}")
+        return 1
+
+    def on_batch(batch):
+        status = f"❌ {batch['error']}" if batch.get('error') else '✅'
+        print(f"{status} batch {batch['batch']} (lines {batch['first_line']}-{batch['last_line']}): "
+              f"{batch['inserted']} inserted, {batch['rejected']} rejected")
+        for error in batch['errors']:
+            print(f"   line {error['line']}: {error['error']}")
+
+    print(f"📥 Importing {args.path} ({fmt}) into {app.storage.name} storage...")
+    if args.path == '-':
+        stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+    else:
+        stream = open(args.path, encoding='utf-8-sig', newline='')
+    with stream:
+        report = app.import_entries(
+            stream, fmt,
+            batch_size=max(1, args.batch_size or app.IMPORT_BATCH_SIZE),
+            score=not args.no_score,
+            providers=[args.provider] if args.provider else None,
+            on_batch=on_batch,
+        )
+
+    print("=" * 50)
+    print(f"📊 {report['rows']} rows: {report['inserted']} inserted, "
+          f"{report['rejected']} rejected, {report['failed']} failed "
+          f"in {report['duration_ms'] / 1000:.1f}s")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Report written to {args.report}")
+    return 0 if report['inserted'] or not report['rows'] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
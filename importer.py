@@ -0,0 +1,161 @@
+"""
+Streaming bulk import of journal entries.
+
+JSONL and CSV files are parsed row by row from a text stream, so memory use
+stays flat no matter how large the history is. Valid rows are collected into
+batches and handed to an ``insert_batch`` callable (one database round trip
+per batch); every batch gets its own report line with the rows it rejected.
+"""
+
+import csv
+import json
+import time
+from datetime import datetime, timezone
+
+FORMATS = ('jsonl', 'csv')
+# Row errors kept per batch report; the rest are only counted
+MAX_ERRORS_PER_BATCH = 20
+
+
+def detect_format(fmt=None, filename=None, content_type=None):
+    """Pick jsonl/csv from an explicit value, a file name or a content type"""
+    if fmt:
+        fmt = fmt.lower()
+        if fmt in ('json', 'ndjson'):
+            fmt = 'jsonl'
+        if fmt not in FORMATS:
+            raise ValueError(f'Unsupported format: {fmt}')
+        return fmt
+    if filename and filename.lower().endswith('.csv'):
+        return 'csv'
+    if content_type and 'csv' in content_type.lower():
+        return 'csv'
+    return 'jsonl'
+
+
+def parse_created_at(value):
+    """Normalize a timestamp to the ISO-8601 UTC form the storage layer sorts on"""
+    stamp = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return stamp.astimezone(timezone.utc).isoformat(timespec='microseconds')
+
+
+def _optional_text(raw, key):
+    value = raw.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def validate_entry(raw):
+    """Turn one parsed row into an entry dict, or raise ValueError"""
+    if not isinstance(raw, dict):
+        raise ValueError('Row must be an object')
+    content = raw.get('content')
+    if not isinstance(content, str) or not content.strip():
+        raise ValueError('content is required')
+
+    created_at = _optional_text(raw, 'created_at')
+    try:
+        created_at = parse_created_at(created_at) if created_at else None
+    except ValueError:
+        raise ValueError(f'Invalid created_at: {created_at}')
+
+    score = raw.get('sentiment_score')
+    if score in (None, ''):
+        score = None
+    else:
+        try:
+            score = float(score)
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid sentiment_score: {score}')
+        if not 0 <= score <= 1:
+            raise ValueError('sentiment_score must be between 0 and 1')
+
+    label = _optional_text(raw, 'emotion_label')
+    return {
+        'content': content.strip(),
+        'sentiment_score': score,
+        'emotion_label': label.lower() if label else None,
+        'ai_provider': _optional_text(raw, 'ai_provider'),
+        'detailed_analysis': _optional_text(raw, 'detailed_analysis'),
+        'created_at': created_at,
+    }
+
+
+def iter_rows(stream, fmt):
+    """Yield ``(line_number, row, error)`` for every record in a text stream"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line), None
+        except ValueError as e:
+            yield line_number, None, f'Invalid JSON: {e}'
+
+
+def run_import(stream, fmt, insert_batch, batch_size=500, on_batch=None):
+    """
+    Stream rows from ``stream`` into ``insert_batch(entries)`` (which returns
+    the number of rows stored) ``batch_size`` rows at a time. ``on_batch`` is
+    called with each batch report as soon as it is written.
+    """
+    started = time.perf_counter()
+    report = {'format': fmt, 'rows': 0, 'inserted': 0, 'rejected': 0, 'failed': 0, 'batches': []}
+    pending = []
+    state = {'errors': [], 'rejected': 0, 'first_line': None}
+
+    def flush(last_line):
+        batch = {
+            'batch': len(report['batches']) + 1,
+            'first_line': state['first_line'],
+            'last_line': last_line,
+            'rows': len(pending) + state['rejected'],
+            'inserted': 0,
+            'rejected': state['rejected'],
+            'errors': state['errors'],
+        }
+        if pending:
+            try:
+                batch['inserted'] = insert_batch(pending)
+            except Exception as e:
+                print(f"Error importing batch {batch['batch']}: {e}")
+                batch['error'] = str(e)
+                report['failed'] += len(pending)
+        report['inserted'] += batch['inserted']
+        report['rejected'] += batch['rejected']
+        report['batches'].append(batch)
+        if on_batch:
+            on_batch(batch)
+        pending.clear()
+        state.update(errors=[], rejected=0, first_line=None)
+
+    line_number = 0
+    for line_number, row, error in iter_rows(stream, fmt):
+        report['rows'] += 1
+        if state['first_line'] is None:
+            state['first_line'] = line_number
+        if error is None:
+            try:
+                pending.append(validate_entry(row))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            state['rejected'] += 1
+            if len(state['errors']) < MAX_ERRORS_PER_BATCH:
+                state['errors'].append({'line': line_number, 'error': error})
+        if len(pending) >= batch_size:
+            flush(line_number)
+
+    if pending or state['rejected']:
+        flush(line_number)
+    report['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return report
@@ -1,6 +1,6 @@
-from app import app, db
+from app import storage
 
-with app.app_context():
-    db.create_all()
-    print("Database created successfully!")
-    print("All tables created.")
+# Creating the storage opens the database and creates any missing tables/indexes
+print(f"Storage backend: {storage.name}")
+print("Database created successfully!")
+print("All tables created.")
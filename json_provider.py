@@ -0,0 +1,62 @@
+"""
+Flask JSON provider backed by orjson when it is installed.
+
+``jsonify`` and ``request.get_json`` go through ``app.json``; this provider
+keeps Flask's behaviour (sorted keys, compact output outside debug, the same
+``default`` conversions) but encodes straight to UTF-8 bytes with orjson,
+which is several times faster than the stdlib encoder on large lists of
+entries. Without orjson it behaves exactly like the default provider.
+"""
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider with an orjson fast path"""
+
+    # json.dumps arguments orjson can honour; anything else uses the stdlib
+    _ORJSON_ARGS = frozenset(('indent', 'separators', 'sort_keys', 'default', 'ensure_ascii'))
+
+    @property
+    def engine(self):
+        return 'orjson' if orjson is not None else 'json'
+
+    def _orjson_dumps(self, obj, **kwargs):
+        """Return UTF-8 bytes, or None when orjson cannot produce the same output"""
+        if orjson is None or not self._ORJSON_ARGS.issuperset(kwargs):
+            return None
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        try:
+            # Dates still go through Flask's default (HTTP date strings)
+            return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option)
+        except (orjson.JSONEncodeError, TypeError):
+            # e.g. integers wider than 64 bits; the stdlib handles those
+            return None
+
+    def dumps(self, obj, **kwargs):
+        data = self._orjson_dumps(obj, **kwargs)
+        if data is None:
+            return super().dumps(obj, **kwargs)
+        return data.decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        data = self._orjson_dumps(obj, indent=2 if pretty else None)
+        if data is None:
+            return super().response(obj)
+        return self._app.response_class(data + b'\n', mimetype=self.mimetype)
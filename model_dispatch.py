@@ -0,0 +1,275 @@
+"""
+Hedged fan-out over a priority-ordered list of upstream models.
+
+The first model is called straight away; if it has not answered after
+``hedge_delay`` seconds (or fails) the next one is fired, and so on. The
+answer is taken in priority order: a lower-priority result is only used once
+every model ahead of it has failed, or when the overall deadline runs out.
+Each model sits behind a circuit breaker so one that keeps failing is skipped
+for a cooldown window instead of being waited on again. An attempt that
+raises ``Skipped`` (e.g. its model is still loading) moves on to the next
+model without counting against its breaker. ``dispatch_async`` is the same
+policy for coroutines (ASGI mode) and shares the breakers.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class Skipped(Exception):
+    """An attempt gave up without learning whether its model works"""
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open trial after cooldown"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=3, cooldown=30):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may be made right now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def release(self):
+        """A call allowed by ``allow`` was never made (cancelled before it started)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            remaining = 0.0
+            if self.state == self.OPEN:
+                remaining = max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'cooldown_remaining': round(remaining, 2),
+            }
+
+
+class HedgedDispatcher:
+    """Runs prioritized attempts concurrently with hedging and circuit breakers"""
+
+    def __init__(self, hedge_delay=1.5, timeout=20, max_workers=16,
+                 failure_threshold=3, cooldown=30):
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='model-hedge')
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, key):
+        with self._lock:
+            if key not in self._breakers:
+                self._breakers[key] = CircuitBreaker(self.failure_threshold, self.cooldown)
+            return self._breakers[key]
+
+    def breaker_states(self):
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {key: breaker.snapshot() for key, breaker in breakers.items()}
+
+    def _record(self, key, done):
+        # Runs even after dispatch() has returned, so late answers still
+        # keep the breaker honest.
+        if done.cancelled():
+            self.breaker(key).release()
+            return
+        try:
+            ok = done.result() is not None
+        except Skipped:
+            self.breaker(key).release()
+            return
+        except Exception as e:
+            print(f"Model call failed for {key}: {e}")
+            ok = False
+        if ok:
+            self.breaker(key).record_success()
+        else:
+            self.breaker(key).record_failure()
+
+    def _launch(self, key, fn):
+        future = self._executor.submit(fn)
+        future.add_done_callback(lambda done: self._record(key, done))
+        return future
+
+    @staticmethod
+    def _outcome(future):
+        if not future.done():
+            return 'pending', None
+        try:
+            result = future.result()
+        except Exception:
+            return 'failed', None
+        return ('ok', result) if result is not None else ('failed', None)
+
+    def dispatch(self, attempts, timeout=None):
+        """
+        Run ``attempts`` (a list of ``(key, fn)`` in priority order) and return
+        ``(key, result)`` for the best usable answer, or ``(None, None)``.
+        ``fn`` returns a result, or None / raises when the answer is unusable.
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        # Breakers are asked only when an attempt is about to start: a
+        # half-open breaker hands out its single trial call on allow()
+        remaining = list(attempts)
+        futures = []  # (key, future) in priority order
+        last_launch = None
+
+        def launch_next():
+            nonlocal last_launch
+            while remaining:
+                key, fn = remaining.pop(0)
+                if self.breaker(key).allow():
+                    futures.append((key, self._launch(key, fn)))
+                    last_launch = time.monotonic()
+                    return True
+            return False
+
+        def settle(key=None, result=None):
+            # Attempts still queued on the executor are not worth a thread any more
+            for _, future in futures:
+                future.cancel()
+            return key, result
+
+        outcome = self._outcome
+
+        if not launch_next():
+            return None, None
+        while True:
+            # Take the answer in priority order once everything ahead of it failed
+            for key, future in futures:
+                state, result = outcome(future)
+                if state == 'ok':
+                    return settle(key, result)
+                if state == 'pending':
+                    break
+            else:
+                # Every launched model failed: move on without waiting out the hedge
+                if not launch_next():
+                    return settle()
+                continue
+
+            now = time.monotonic()
+            if now >= deadline:
+                break
+
+            wake_at = deadline
+            if remaining:
+                hedge_at = last_launch + self.hedge_delay
+                if now >= hedge_at:
+                    launch_next()
+                    continue
+                wake_at = min(wake_at, hedge_at)
+
+            pending = [future for _, future in futures if not future.done()]
+            wait(pending, timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+
+        # Deadline reached: settle for any usable answer that has arrived
+        for key, future in futures:
+            state, result = outcome(future)
+            if state == 'ok':
+                return settle(key, result)
+        return settle()
+
+    async def dispatch_async(self, attempts, timeout=None):
+        """
+        ``dispatch`` for coroutine functions: each ``fn()`` runs as a task on
+        the running loop, so waiting on a slow model holds no thread.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (self.timeout if timeout is None else timeout)
+        remaining = list(attempts)
+        tasks = []  # (key, task) in priority order
+        last_launch = None
+
+        def launch_next():
+            nonlocal last_launch
+            while remaining:
+                key, fn = remaining.pop(0)
+                if self.breaker(key).allow():
+                    task = asyncio.ensure_future(fn())
+                    task.add_done_callback(lambda done, key=key: self._record(key, done))
+                    tasks.append((key, task))
+                    last_launch = loop.time()
+                    return True
+            return False
+
+        def settle(key=None, result=None):
+            # Nobody will read the other answers; stop them instead of letting them run on
+            for _, task in tasks:
+                task.cancel()
+            return key, result
+
+        if not launch_next():
+            return None, None
+        while True:
+            for key, task in tasks:
+                state, result = self._outcome(task)
+                if state == 'ok':
+                    return settle(key, result)
+                if state == 'pending':
+                    break
+            else:
+                if not launch_next():
+                    return settle()
+                continue
+
+            now = loop.time()
+            if now >= deadline:
+                break
+
+            wake_at = deadline
+            if remaining:
+                hedge_at = last_launch + self.hedge_delay
+                if now >= hedge_at:
+                    launch_next()
+                    continue
+                wake_at = min(wake_at, hedge_at)
+
+            pending = [task for _, task in tasks if not task.done()]
+            await asyncio.wait(pending, timeout=max(0.0, wake_at - now), return_when=asyncio.FIRST_COMPLETED)
+
+        for key, task in tasks:
+            state, result = self._outcome(task)
+            if state == 'ok':
+                return settle(key, result)
+        return settle()
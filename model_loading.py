@@ -0,0 +1,203 @@
+"""
+Cold starts of hosted inference models.
+
+The Hugging Face Inference API unloads models nobody has called for a while
+and answers the next requests with HTTP 503 and ``estimated_time``, the
+seconds until the model is loaded again. ``ModelLoadScheduler`` remembers
+when each model should be ready, so a request holds for its preferred model
+while that fits in a deadline ``budget`` and downgrades to the next model
+straight away when it does not, instead of treating "loading" as a failure.
+
+``WarmupPinger`` keeps models loaded during active hours: a model that has
+had no traffic for ``interval`` seconds gets one tiny request.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+
+def parse_active_hours(text):
+    """
+    Local hours of the day as a set: '7-23' is 07:00 to 22:59, '22-6' wraps
+    past midnight, '8-12,14-18' combines ranges; '' or '*' means all day.
+    """
+    text = (text or '').strip()
+    if text in ('', '*'):
+        return set(range(24))
+    hours = set()
+    for part in text.split(','):
+        start, _, end = part.partition('-')
+        start = int(start) % 24
+        end = int(end) % 24 if end.strip() else (start + 1) % 24
+        hour = start
+        while True:
+            hours.add(hour)
+            hour = (hour + 1) % 24
+            if hour == end:
+                break
+    return hours
+
+
+class ModelLoadScheduler:
+    """Tracks per-model load state from 503 ``estimated_time`` answers"""
+
+    def __init__(self, budget=8.0, min_retry=1.0, max_estimate=300.0, clock=time.monotonic):
+        # Longest a request holds for a loading model before downgrading
+        self.budget = budget
+        # Never retry a loading model sooner than this, whatever it estimates
+        self.min_retry = min_retry
+        self.max_estimate = max_estimate
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._models = {}
+
+    def _state(self, model):
+        state = self._models.get(model)
+        if state is None:
+            state = self._models[model] = {
+                'ready_at': None, 'last_call': None, 'last_answer': None,
+                'cold_starts': 0, 'answers': 0, 'waited_answers': 0, 'waited_seconds': 0.0, 'downgrades': 0,
+            }
+        return state
+
+    def deadline(self):
+        """Deadline for a request starting now"""
+        return self._clock() + self.budget
+
+    def wait_before(self, model, deadline):
+        """
+        Seconds to hold before calling ``model``: 0 when it should be loaded,
+        None when it will not be ready before ``deadline``.
+        """
+        now = self._clock()
+        with self._lock:
+            state = self._models.get(model)
+            ready_at = state['ready_at'] if state else None
+        if ready_at is None or ready_at <= now:
+            return 0.0
+        if ready_at > deadline:
+            return None
+        return ready_at - now
+
+    def record_call(self, model):
+        with self._lock:
+            self._state(model)['last_call'] = self._clock()
+
+    def record_loading(self, model, estimated_time):
+        """A 503 said ``model`` is loading and needs about ``estimated_time`` seconds"""
+        wait = min(max(float(estimated_time), self.min_retry), self.max_estimate)
+        with self._lock:
+            state = self._state(model)
+            if state['ready_at'] is None:
+                state['cold_starts'] += 1
+            state['ready_at'] = self._clock() + wait
+
+    def record_answer(self, model, waited=0.0):
+        """``model`` answered after the request held ``waited`` seconds for it"""
+        with self._lock:
+            state = self._state(model)
+            state['ready_at'] = None
+            state['last_answer'] = self._clock()
+            state['answers'] += 1
+            if waited:
+                state['waited_answers'] += 1
+                state['waited_seconds'] += waited
+
+    def record_downgrade(self, model):
+        with self._lock:
+            self._state(model)['downgrades'] += 1
+
+    def idle_for(self, model):
+        """Seconds since ``model`` was last called (None if never)"""
+        with self._lock:
+            state = self._models.get(model)
+            last_call = state['last_call'] if state else None
+        return None if last_call is None else self._clock() - last_call
+
+    def stats(self):
+        now = self._clock()
+        with self._lock:
+            return {
+                model: {
+                    'state': 'loading' if state['ready_at'] and state['ready_at'] > now else
+                             'ready' if state['last_answer'] is not None else 'unknown',
+                    'ready_in': round(max(0.0, state['ready_at'] - now), 2) if state['ready_at'] else 0.0,
+                    'cold_starts': state['cold_starts'],
+                    'answers': state['answers'],
+                    'waited_answers': state['waited_answers'],
+                    'waited_seconds': round(state['waited_seconds'], 3),
+                    'downgrades': state['downgrades'],
+                }
+                for model, state in self._models.items()
+            }
+
+
+class WarmupPinger:
+    """Pings idle models during active hours so real requests do not meet a cold start"""
+
+    def __init__(self, ping, models, scheduler, interval=240, hours=None, now=datetime.now):
+        # ping(model) -> True when the model answered, None when the ping was skipped;
+        # it records into the scheduler itself
+        self.ping = ping
+        self.models = list(models)
+        self.scheduler = scheduler
+        self.interval = interval
+        self.hours = set(range(24)) if hours is None else set(hours)
+        self._now = now
+        self._lock = threading.Lock()
+        self._thread = None
+        self.pings = 0
+        self.failures = 0
+        self.skipped = 0
+
+    def run_once(self):
+        """Ping every model idle for ``interval`` seconds; returns the models pinged"""
+        if self._now().hour not in self.hours:
+            return []
+        pinged = []
+        for model in self.models:
+            idle = self.scheduler.idle_for(model)
+            if idle is not None and idle < self.interval:
+                continue
+            try:
+                ok = self.ping(model)
+            except Exception as e:
+                print(f"Warm-up ping for {model} failed: {e}")
+                ok = False
+            with self._lock:
+                if ok is None:
+                    self.skipped += 1
+                    continue
+                self.pings += 1
+                if not ok:
+                    self.failures += 1
+            pinged.append(model)
+        return pinged
+
+    def start(self):
+        """Ping in a daemon thread (once per process)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name='model-warmup', daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        # Check often enough to catch a model going idle well before it is unloaded
+        check_every = max(1.0, min(60.0, self.interval / 4))
+        while True:
+            self.run_once()
+            time.sleep(check_every)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'models': self.models,
+                'interval': self.interval,
+                'active_now': self._now().hour in self.hours,
+                'pings': self.pings,
+                'failures': self.failures,
+                'skipped': self.skipped,
+                'running': self._thread is not None and self._thread.is_alive(),
+            }
@@ -0,0 +1,90 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Lists are ordered by ``(created_at, id)`` descending. A cursor is an opaque,
+URL-safe token holding the sort key of the last row on a page; the next page
+starts strictly after it, so page cost does not grow with depth.
+
+The change feed (/api/entries/changes) uses a plain sequence number instead:
+every write to an entry gets the next number, so "everything after N" is a
+single index range.
+"""
+
+import base64
+import json
+
+ENTRY_FIELDS = (
+    'id', 'content', 'sentiment_score', 'emotion_label',
+    'ai_provider', 'detailed_analysis', 'created_at',
+)
+# Always returned so the client can build the next cursor
+KEY_FIELDS = ('id', 'created_at')
+
+
+def encode_cursor(row):
+    """Cursor pointing just past ``row``"""
+    raw = json.dumps([row.get('created_at'), row.get('id')], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, id)`` or raise ValueError for a malformed cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    # bool is an int subclass, but never a row id
+    if not isinstance(created_at, str) or not isinstance(row_id, int) or isinstance(row_id, bool):
+        raise ValueError('Invalid cursor')
+    return created_at, row_id
+
+
+def decode_change_cursor(cursor):
+    """Change-feed cursor (a sequence number, 0 for the start) or ValueError"""
+    if cursor in (None, ''):
+        return 0
+    try:
+        seq = int(cursor)
+    except ValueError:
+        raise ValueError('Invalid cursor')
+    if seq < 0:
+        raise ValueError('Invalid cursor')
+    return seq
+
+
+def parse_limit(value, default, maximum):
+    """Clamp a ``limit`` query parameter to ``1..maximum``"""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, maximum))
+
+
+def parse_offset(value):
+    """An ``offset`` query parameter (0 when missing) or ValueError"""
+    if value in (None, ''):
+        return 0
+    try:
+        offset = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('offset must be a non-negative integer')
+    if offset < 0:
+        raise ValueError('offset must be a non-negative integer')
+    return offset
+
+
+def parse_fields(value, allowed=ENTRY_FIELDS):
+    """Turn ``fields=a,b`` into a column list; key fields are always included"""
+    if not value:
+        return list(allowed)
+    requested = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    columns = list(KEY_FIELDS)
+    columns.extend(field for field in requested if field not in columns)
+    return columns
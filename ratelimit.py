@@ -0,0 +1,233 @@
+"""
+Token-bucket rate limiting.
+
+A ``TokenBucket`` refills at ``rate`` tokens per second up to ``capacity``
+(the burst size). ``acquire`` waits for tokens, which paces a background job
+against an upstream quota; ``try_acquire`` never blocks and reports how long
+the caller would have had to wait.
+
+``KeyedBuckets`` keeps one bucket per key (a client), and ``AdmissionQueue``
+puts a bounded wait queue in front of a shared bucket: a caller either gets a
+token within ``max_wait`` or is refused at once with ``RateLimited``, whose
+``retry_after`` is meant for a 429 response.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``rate`` must be positive"""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.throttled = 0
+        self.waited = 0.0
+
+    def _take(self, tokens):
+        """Take ``tokens`` if available and return 0, else the seconds until they will be"""
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            self.granted += 1
+            return 0.0
+        return (tokens - self._tokens) / self.rate
+
+    def try_acquire(self, tokens=1):
+        """Returns ``(granted, retry_after_seconds)`` without blocking"""
+        with self._lock:
+            wait = self._take(tokens)
+            if wait:
+                self.throttled += 1
+            return not wait, wait
+
+    def acquire(self, tokens=1, timeout=None):
+        """Block until ``tokens`` are available; False if that would take longer than ``timeout``"""
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            with self._lock:
+                wait = self._take(tokens)
+                if not wait:
+                    return True
+                if deadline is not None and self._clock() + wait > deadline:
+                    self.throttled += 1
+                    return False
+                self.waited += wait
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=1, timeout=None):
+        """``acquire`` for the event loop: waits with asyncio.sleep"""
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            with self._lock:
+                wait = self._take(tokens)
+                if not wait:
+                    return True
+                if deadline is not None and self._clock() + wait > deadline:
+                    self.throttled += 1
+                    return False
+                self.waited += wait
+            await asyncio.sleep(wait)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'capacity': self.capacity,
+                'granted': self.granted,
+                'throttled': self.throttled,
+                'waited_seconds': round(self.waited, 3),
+            }
+
+
+class RateLimited(Exception):
+    """A request refused by a limiter; ``scope`` names which one"""
+
+    def __init__(self, scope, retry_after):
+        super().__init__(f'Rate limit exceeded ({scope}), retry in {retry_after:.1f}s')
+        self.scope = scope
+        self.retry_after = retry_after
+
+    def retry_after_header(self):
+        """Whole seconds for a Retry-After header (at least 1)"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class KeyedBuckets:
+    """A token bucket per key; the least recently used keys are dropped beyond ``max_keys``"""
+
+    def __init__(self, rate, capacity=None, max_keys=10000, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def try_acquire(self, key, tokens=1):
+        """Returns ``(granted, retry_after_seconds)`` for ``key`` without blocking"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity, self._clock)
+                # A dropped key starts again with a full bucket, which only errs towards letting it through
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+        granted, wait = bucket.try_acquire(tokens)
+        if not granted:
+            with self._lock:
+                self.throttled += 1
+        return granted, wait
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'capacity': self.capacity or max(1.0, float(self.rate)),
+                'keys': len(self._buckets),
+                'throttled': self.throttled,
+            }
+
+
+class AdmissionQueue:
+    """
+    A shared token bucket with a bounded wait queue. When the bucket is empty
+    a caller waits its turn, unless ``max_waiting`` callers already are or its
+    turn would come later than ``max_wait`` seconds: then it is refused at
+    once, so a burst turns into quick 429s instead of a pile of slow requests.
+    """
+
+    def __init__(self, bucket, max_waiting=32, max_wait=2.0, scope='global'):
+        self.bucket = bucket
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.scope = scope
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+
+    def _enter(self):
+        """True when admitted right away, False when the caller should queue"""
+        granted, wait = self.bucket.try_acquire()
+        with self._lock:
+            if granted:
+                self.admitted += 1
+                return True
+            # Everyone already waiting is ahead of this caller
+            expected = wait + self.waiting / self.bucket.rate
+            if self.waiting >= self.max_waiting or expected > self.max_wait:
+                self.rejected += 1
+                raise RateLimited(self.scope, expected)
+            self.waiting += 1
+            self.queued += 1
+            return False
+
+    def _leave(self, granted):
+        with self._lock:
+            self.waiting -= 1
+            if granted:
+                self.admitted += 1
+                return
+            self.rejected += 1
+            retry_after = (self.waiting + 1) / self.bucket.rate
+        raise RateLimited(self.scope, retry_after)
+
+    def admit(self):
+        """Take a token, waiting up to ``max_wait``; raises ``RateLimited`` when refused"""
+        if self._enter():
+            return
+        try:
+            granted = self.bucket.acquire(timeout=self.max_wait)
+        except BaseException:
+            with self._lock:
+                self.waiting -= 1
+            raise
+        self._leave(granted)
+
+    async def admit_async(self):
+        """``admit`` for the event loop"""
+        if self._enter():
+            return
+        try:
+            granted = await self.bucket.acquire_async(timeout=self.max_wait)
+        except BaseException:
+            with self._lock:
+                self.waiting -= 1
+            raise
+        self._leave(granted)
+
+    def try_admit(self):
+        """Take a token only if one is free right now, never queueing (for optional work)"""
+        granted, _ = self.bucket.try_acquire()
+        if granted:
+            with self._lock:
+                self.admitted += 1
+        return granted
+
+    def stats(self):
+        with self._lock:
+            return {
+                'waiting': self.waiting,
+                'max_waiting': self.max_waiting,
+                'max_wait_seconds': self.max_wait,
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'rejected': self.rejected,
+                'bucket': self.bucket.stats(),
+            }
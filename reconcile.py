@@ -0,0 +1,268 @@
+"""
+Payment status reconciliation.
+
+A payment stays 'pending' until IntaSend says what happened to its checkout.
+``PaymentReconciler.run_once`` pages through pending payments older than
+``stale_after``, asks the provider for each one's state (a few calls at a
+time, paced by a token bucket) and writes the outcomes back with one bulk
+update per status and page. A checkout the provider still reports as open
+after ``expire_after`` seconds was abandoned and is marked 'expired'.
+
+A run checks at most ``max_per_run`` payments and the next run resumes where
+it stopped, so a large backlog is worked through oldest pages included. A
+run woken by a returning checkout starts from the newest payment instead and
+leaves the resume point alone. With
+several workers on a host, a lease in a small shared SQLite file (or an
+in-process lock when ``db_path`` is empty) lets one of them run at a time,
+and the last report is kept there for every worker to serve.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+PENDING = 'pending'
+EXPIRED = 'expired'
+# Marks a provider call that failed; the payment is retried on the next run
+_ERROR = object()
+
+
+def _age_seconds(created_at, now):
+    try:
+        stamp = datetime.fromisoformat(str(created_at).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return (now - stamp).total_seconds()
+
+
+class PaymentReconciler:
+    """Brings pending payments in line with the provider's view, in batches"""
+
+    def __init__(self, storage, check_status, limiter, db_path=None, batch_size=100, concurrency=4,
+                 stale_after=600, expire_after=86400, max_per_run=1000, lease_ttl=900, on_update=None):
+        self.storage = storage
+        # check_status(intasend_payment_id) -> new status ('completed', 'failed', ...) or None while open
+        self.check_status = check_status
+        self.limiter = limiter
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.stale_after = stale_after
+        self.expire_after = expire_after
+        self.max_per_run = max_per_run
+        self.lease_ttl = lease_ttl
+        # Called as on_update(status, payment_ids) after each bulk update
+        self.on_update = on_update
+
+        self.owner = f'{os.getpid()}-{id(self)}'
+        self._lock = threading.Lock()
+        self._running = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._resume = None
+        self._report = None
+        self._db = None
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=10, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.executescript('''
+                CREATE TABLE IF NOT EXISTS reconcile_state (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT,
+                    expires_at REAL,
+                    value TEXT
+                );
+            ''')
+
+    # Lease and shared state -----------------------------------------------
+
+    def _acquire_lease(self):
+        if self._db is None:
+            return True
+        now = time.time()
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._db.execute(
+                    "SELECT owner, expires_at FROM reconcile_state WHERE name = 'lease'"
+                ).fetchone()
+                taken = bool(row and row[0] != self.owner and row[1] > now)
+                if not taken:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO reconcile_state (name, owner, expires_at) VALUES ('lease', ?, ?)",
+                        (self.owner, now + self.lease_ttl)
+                    )
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+            return not taken
+
+    def _release_lease(self):
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute("DELETE FROM reconcile_state WHERE name = 'lease' AND owner = ?", (self.owner,))
+
+    def _load(self, name):
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute('SELECT value FROM reconcile_state WHERE name = ?', (name,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def _save(self, name, value):
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO reconcile_state (name, value) VALUES (?, ?)', (name, json.dumps(value))
+            )
+
+    # Runs ---------------------------------------------------------------
+
+    def run_once(self, stale_after=None, from_newest=False):
+        """
+        One pass over stale pending payments. Returns the report, or None when
+        another worker (or thread) is already running one. ``from_newest``
+        starts at the newest payment instead of where the last run stopped.
+        """
+        if not self._running.acquire(blocking=False):
+            return None
+        try:
+            if not self._acquire_lease():
+                return None
+            try:
+                report = self._run(self.stale_after if stale_after is None else stale_after, from_newest)
+            finally:
+                self._release_lease()
+        finally:
+            self._running.release()
+        self._report = report
+        self._save('report', report)
+        return report
+
+    def _run(self, stale_after, from_newest=False):
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        cutoff = (now - timedelta(seconds=stale_after)).isoformat()
+        report = {
+            'started_at': now.isoformat(), 'checked': 0, 'updated': {}, 'still_pending': 0,
+            'errors': 0, 'pages': 0, 'lag_seconds': 0.0, 'complete': True,
+        }
+        after = None if from_newest else self._resume or self._load('resume')
+        if after:
+            after = tuple(after)
+        waited_before = self.limiter.waited
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='reconcile') as pool:
+            while True:
+                limit = min(self.batch_size, self.max_per_run - report['checked'])
+                if limit <= 0:
+                    report['complete'] = False
+                    break
+                page = self.storage.list_payments(limit, after, created_to=cutoff, status=PENDING)
+                if page:
+                    report['pages'] += 1
+                    self._reconcile_page(page, pool, now, report)
+                    after = (page[-1]['created_at'], page[-1]['id'])
+                if len(page) < limit:
+                    # Reached the oldest pending payment: the next run starts from the newest
+                    after = None
+                    break
+
+        if not from_newest:
+            self._resume = after
+            self._save('resume', list(after) if after else None)
+        report['rate_limited_seconds'] = round(self.limiter.waited - waited_before, 3)
+        report['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return report
+
+    def _check(self, payment):
+        if not payment.get('intasend_payment_id'):
+            # The checkout was never created (or demo mode): only expiry applies
+            return None
+        self.limiter.acquire()
+        try:
+            return self.check_status(payment['intasend_payment_id'])
+        except Exception as e:
+            print(f"Error checking payment {payment['id']} with the provider: {e}")
+            return _ERROR
+
+    def _reconcile_page(self, page, pool, now, report):
+        outcomes = {}
+        for payment, status in zip(page, pool.map(self._check, page)):
+            report['checked'] += 1
+            age = _age_seconds(payment.get('created_at'), now)
+            if status is _ERROR:
+                report['errors'] += 1
+                continue
+            if status is None and age is not None and age >= self.expire_after:
+                status = EXPIRED
+            if status and status != PENDING:
+                outcomes.setdefault(status, []).append(payment['id'])
+            else:
+                report['still_pending'] += 1
+                # How far behind the provider the oldest unresolved payment is
+                report['lag_seconds'] = max(report['lag_seconds'], round(age or 0.0, 1))
+
+        for status, ids in outcomes.items():
+            # Rows settled in the meantime (e.g. by a newer run) are left alone
+            updated = self.storage.update_payments(ids, {'status': status}, status=PENDING)
+            report['updated'][status] = report['updated'].get(status, 0) + updated
+            if self.on_update and updated:
+                try:
+                    self.on_update(status, ids)
+                except Exception as e:
+                    print(f"Error after reconciling payments: {e}")
+
+    # Background loop ----------------------------------------------------
+
+    def start(self, interval=None):
+        """
+        Run every ``interval`` seconds in a daemon thread (once per process);
+        with no interval the thread only runs when woken.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, args=(interval,), name='reconcile', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        """
+        Run soon from the newest payment, including ones younger than
+        ``stale_after`` (a checkout just returned). Wakes before that run
+        starts share it.
+        """
+        self._wake.set()
+
+    def _loop(self, interval):
+        while True:
+            woken = self._wake.wait(interval)
+            self._wake.clear()
+            try:
+                if woken:
+                    self.run_once(stale_after=0, from_newest=True)
+                else:
+                    self.run_once()
+            except Exception as e:
+                print(f"Error reconciling payments: {e}")
+
+    def stats(self):
+        """The last run's report (from any worker on this host) and the rate limiter"""
+        return {
+            'last_run': self._load('report') if self._db is not None else self._report,
+            'running': self._running.locked(),
+            'background': self._thread is not None and self._thread.is_alive(),
+            'rate_limit': self.limiter.stats(),
+        }
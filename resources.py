@@ -0,0 +1,81 @@
+"""
+Lazily built, per-process resources.
+
+Clients that hold sockets, SQLite handles or thread pools (storage, HTTP
+sessions, caches) must not be created at import time: that slows every
+import of the app and, under a pre-fork server, hands the parent's
+connections to every worker. ``ProcessLocal`` wraps a factory and forwards
+attribute access to the object it builds on first use. A forked child builds
+its own copy; the parent's copy is kept alive (not closed) in the child so
+finalizers never touch connections the parent still owns.
+"""
+
+import os
+import threading
+import time
+
+_instances = []
+
+
+class ProcessLocal:
+    """Proxy that builds ``factory()`` on first use, once per process"""
+
+    def __init__(self, factory, name=None):
+        self._factory = factory
+        self._name = name or factory.__name__
+        self._lock = threading.Lock()
+        self._pid = None
+        self._value = None
+        self._stale = []
+        self._build_seconds = None
+        _instances.append(self)
+
+    def _resolve(self):
+        if self._pid == os.getpid():
+            return self._value
+        with self._lock:
+            if self._pid != os.getpid():
+                if self._pid is not None:
+                    # Built before a fork: never reuse or close the parent's copy
+                    self._stale.append(self._value)
+                started = time.perf_counter()
+                self._value = self._factory()
+                self._build_seconds = time.perf_counter() - started
+                self._pid = os.getpid()
+            return self._value
+
+    def _after_fork(self):
+        # A thread in the parent may have held the lock while forking
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __repr__(self):
+        state = 'built' if self._pid == os.getpid() else 'not built'
+        return f'<ProcessLocal {self._name} ({state})>'
+
+
+def resolve(resource):
+    """The object behind a ``ProcessLocal`` (building it if needed); other values pass through"""
+    return resource._resolve() if isinstance(resource, ProcessLocal) else resource
+
+
+def is_built(resource):
+    """True once ``resource`` has been built in this process"""
+    return resource._pid == os.getpid()
+
+
+def build_times():
+    """Seconds each resource took to build in this process, by name"""
+    pid = os.getpid()
+    return {r._name: round(r._build_seconds, 4) for r in _instances if r._pid == pid}
+
+
+def _reset_locks():
+    for resource in _instances:
+        resource._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_locks)
@@ -0,0 +1,53 @@
+"""
+Full-text search helpers shared by the storage backends.
+
+A search box string is split into terms (words, or "quoted phrases") and
+turned into an FTS5 MATCH expression for SQLite or a ``to_tsquery`` string
+for Postgres. Every bare word is a prefix match, so "stres" finds "stressed".
+Backends mark matches in snippets with control characters; ``highlight``
+escapes the snippet and turns those markers into ``<mark>`` tags.
+"""
+
+import html
+import re
+
+MARK_START = '\x02'
+MARK_END = '\x03'
+MAX_TERMS = 16
+
+_TERM_RE = re.compile(r'"([^"]*)"|(\S+)')
+_WORD_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def parse_query(text):
+    """Return a list of terms; each term is a tuple of words (>1 word = phrase)"""
+    terms = []
+    for phrase, bare in _TERM_RE.findall(text or ''):
+        words = tuple(word.lower() for word in _WORD_RE.findall(phrase or bare))
+        if words:
+            terms.append(words)
+    return terms[:MAX_TERMS]
+
+
+def fts5_query(terms):
+    """FTS5 MATCH expression: phrases quoted, single words as prefix matches"""
+    parts = []
+    for words in terms:
+        quoted = ' '.join(f'"{word}"' for word in words)
+        parts.append(f'"{" ".join(words)}"' if len(words) > 1 else f'{quoted}*')
+    return ' AND '.join(parts)
+
+
+def tsquery(terms):
+    """Postgres to_tsquery expression equivalent to ``fts5_query``"""
+    parts = []
+    for words in terms:
+        parts.append(' <-> '.join(words) if len(words) > 1 else f'{words[0]}:*')
+    return ' & '.join(parts)
+
+
+def highlight(snippet):
+    """HTML-escape a snippet and wrap the marked matches in <mark>"""
+    if not snippet:
+        return snippet
+    return html.escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
@@ -0,0 +1,197 @@
+"""
+Content-addressed cache for sentiment analysis results.
+
+Results are keyed by a SHA-256 of the model ID plus the normalized text, kept
+in an in-memory LRU and optionally persisted to a small SQLite file so they
+survive restarts.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Normalize text so trivially different inputs share a cache entry"""
+    text = unicodedata.normalize('NFC', str(text))
+    return ' '.join(text.split())
+
+
+def cache_key(text, model_id):
+    """Build the content address for a text/model pair"""
+    digest = hashlib.sha256()
+    digest.update(str(model_id).encode('utf-8'))
+    digest.update(b'\x00')
+    digest.update(normalize_text(text).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class SentimentCache:
+    """Two-tier (memory LRU + optional SQLite) cache with TTL and size bounds"""
+
+    def __init__(self, max_entries=1024, ttl=86400, db_path=None, max_db_entries=100000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self.max_db_entries = max_db_entries
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._writes_since_prune = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if db_path:
+            try:
+                self._open_db(db_path)
+            except Exception as e:
+                print(f"⚠️ Sentiment cache DB unavailable ({e}). Using memory only.")
+                self._db = None
+
+    def _open_db(self, db_path):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS sentiment_cache (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL
+            )
+        ''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS idx_sentiment_cache_created ON sentiment_cache (created_at)')
+        self._db.commit()
+
+    def _expires_at(self, now):
+        return now + self.ttl if self.ttl and self.ttl > 0 else None
+
+    def _remember(self, key, expires_at, result):
+        self._memory[key] = (expires_at, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, text, model_id):
+        """Return a copy of the cached result, or None on a miss"""
+        key = cache_key(text, model_id)
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                expires_at, result = item
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return dict(result)
+                del self._memory[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        'SELECT result, expires_at FROM sentiment_cache WHERE key = ?', (key,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    print(f"Sentiment cache read error: {e}")
+                    row = None
+                if row and (row[1] is None or row[1] > now):
+                    result = json.loads(row[0])
+                    self._remember(key, row[1], result)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return dict(result)
+
+            self.misses += 1
+            return None
+
+    def set(self, text, model_id, result):
+        """Store a result for a text/model pair in both tiers"""
+        key = cache_key(text, model_id)
+        now = time.time()
+        expires_at = self._expires_at(now)
+        result = dict(result)
+        with self._lock:
+            self._remember(key, expires_at, result)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO sentiment_cache (key, result, created_at, expires_at) VALUES (?, ?, ?, ?)',
+                    (key, json.dumps(result), now, expires_at)
+                )
+                self._writes_since_prune += 1
+                if self._writes_since_prune >= 256:
+                    self._prune(now)
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Sentiment cache write error: {e}")
+
+    def preload(self, limit=None):
+        """Fill the memory tier with the newest unexpired disk rows; returns how many"""
+        if self._db is None:
+            return 0
+        limit = min(limit or self.max_entries, self.max_entries)
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT key, result, expires_at FROM sentiment_cache '
+                'WHERE expires_at IS NULL OR expires_at > ? ORDER BY created_at DESC LIMIT ?',
+                (now, limit)
+            ).fetchall()
+            # Oldest first so the newest end up most recently used
+            for key, result, expires_at in reversed(rows):
+                self._remember(key, expires_at, json.loads(result))
+        return len(rows)
+
+    def _prune(self, now):
+        """Drop expired rows and trim the disk tier back to its size bound"""
+        self._writes_since_prune = 0
+        self._db.execute('DELETE FROM sentiment_cache WHERE expires_at IS NOT NULL AND expires_at <= ?', (now,))
+        self._db.execute('''
+            DELETE FROM sentiment_cache WHERE key IN (
+                SELECT key FROM sentiment_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_db_entries,))
+
+    def clear(self):
+        """Remove every cached result from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM sentiment_cache')
+                self._db.commit()
+
+    def stats(self):
+        """Return hit/miss counters and tier sizes"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            disk_entries = None
+            if self._db is not None:
+                try:
+                    disk_entries = self._db.execute('SELECT COUNT(*) FROM sentiment_cache').fetchone()[0]
+                except sqlite3.Error:
+                    disk_entries = None
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'memory_entries': len(self._memory),
+                'max_entries': self.max_entries,
+                'disk_entries': disk_entries,
+                'ttl_seconds': self.ttl,
+            }
@@ -0,0 +1,450 @@
+"""
+Sentiment providers used by ``analyze_sentiment``.
+
+Every provider returns results in the same normalized label set
+(happy, sad, angry, fear, disgust, surprise, positive, neutral, negative) so
+callers never need to know which engine answered.
+"""
+
+import asyncio
+import os
+import re
+import time
+
+from model_dispatch import Skipped
+
+# Raw model labels -> the labels stored on journal entries
+LABEL_MAP = {
+    'LABEL_0': 'negative',
+    'LABEL_1': 'neutral',
+    'LABEL_2': 'positive',
+    'NEGATIVE': 'negative',
+    'NEUTRAL': 'neutral',
+    'POSITIVE': 'positive',
+    'JOY': 'happy',
+    'SADNESS': 'sad',
+    'ANGER': 'angry',
+    'FEAR': 'fear',
+    'DISGUST': 'disgust',
+    'SURPRISE': 'surprise',
+}
+
+
+def parse_predictions(predictions):
+    """Normalize a Hugging Face classification response into our label set"""
+    # Expected shapes:
+    # [[{"label":"joy","score":0.91}, ...]]
+    # [[{"label":"positive","score":0.93}, ...]]
+    # [[{"label":"LABEL_0","score":0.7}, ...]]
+    if not isinstance(predictions, list) or len(predictions) == 0:
+        return None
+    scores = predictions[0]
+    if not isinstance(scores, list) or len(scores) == 0:
+        return None
+    best = max(scores, key=lambda x: x.get('score', 0))
+    raw_label = str(best.get('label', '')).upper()
+
+    normalized = LABEL_MAP.get(raw_label, raw_label.lower() if raw_label else 'neutral')
+    return {
+        'emotion_label': normalized,
+        'sentiment_score': float(best.get('score', 0.5))
+    }
+
+
+class SentimentProvider:
+    """Base class: ``analyze`` returns a normalized result or None"""
+
+    name = 'base'
+    # Whether results are worth keeping in the sentiment cache
+    cacheable = True
+    # Whether each call spends an upstream inference quota
+    metered = False
+
+    @property
+    def model_id(self):
+        return self.name
+
+    def ready(self):
+        """
+        Wait until the provider is worth calling; returns the ``plan`` to pass
+        to ``analyze`` / ``analyze_batch`` (None: nothing to plan)
+        """
+        return None
+
+    async def ready_async(self):
+        return self.ready()
+
+    def analyze(self, text, plan=None):
+        raise NotImplementedError
+
+    def analyze_batch(self, texts, plan=None):
+        """Analyze several texts; returns one result (or None) per input"""
+        return [self.analyze(text) for text in texts]
+
+    async def analyze_async(self, text, plan=None):
+        """Coroutine form of ``analyze``; local engines simply answer inline"""
+        return self.analyze(text)
+
+
+class HuggingFaceProvider(SentimentProvider):
+    """Hugging Face Inference API with hedged fan-out over several models"""
+
+    name = 'huggingface'
+    metered = True
+
+    def __init__(self, models, api_base, sessions, dispatcher, timeout=20, connect_timeout=3.05,
+                 async_sessions=None, scheduler=None):
+        self.models = list(models)
+        self.api_base = api_base
+        self.sessions = sessions
+        # async_pool.AsyncUpstreamSessions used by analyze_async (ASGI mode)
+        self.async_sessions = async_sessions
+        self.dispatcher = dispatcher
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        # model_loading.ModelLoadScheduler: hold for a loading model instead of failing over at once
+        self.scheduler = scheduler
+
+    @property
+    def model_id(self):
+        return ','.join(self.models)
+
+    def _headers(self):
+        return {"Authorization": f"Bearer {os.getenv('HUGGINGFACE_API_KEY', 'hf_demo')}"}
+
+    @staticmethod
+    def _parse_response(url, r):
+        if r.status_code == 200:
+            return parse_predictions(r.json())
+        print(f"HF request to {url} returned {r.status_code}")
+        return None
+
+    def _plan(self):
+        """
+        Models worth trying for a request starting now, the deadline for
+        holding on loading ones, and how long to hold before the first.
+        Models that will not finish loading within the budget are skipped.
+        """
+        if self.scheduler is None:
+            return self.models, None, 0.0
+        deadline = self.scheduler.deadline()
+        models = []
+        for model in self.models:
+            if self.scheduler.wait_before(model, deadline) is None:
+                self.scheduler.record_downgrade(model)
+            else:
+                models.append(model)
+        # Hold in the caller (not a dispatcher thread) when the preferred model is known to be loading
+        hold = self.scheduler.wait_before(models[0], deadline) if models else 0.0
+        return models, deadline, hold or 0.0
+
+    def _hold(self, model, deadline):
+        """Seconds to wait before calling ``model``; raises Skipped to give up on it for this request"""
+        if self.scheduler is None:
+            return 0.0
+        wait = self.scheduler.wait_before(model, deadline)
+        if wait is None:
+            self.scheduler.record_downgrade(model)
+            print(f"⏳ {model} is still loading; not waiting for it")
+            # Loading is not a failure, so the model's breaker is left alone
+            raise Skipped(model)
+        return wait
+
+    def ready(self):
+        """
+        Plan a request and hold for a loading preferred model. Callers do this
+        before taking an upstream admission token or leading a coalesced call,
+        so neither is tied up while the model loads.
+        """
+        models, deadline, hold = self._plan()
+        if hold:
+            time.sleep(hold)
+        return models, deadline, hold
+
+    async def ready_async(self):
+        models, deadline, hold = self._plan()
+        if hold:
+            await asyncio.sleep(hold)
+        return models, deadline, hold
+
+    def _loading(self, model, r):
+        """Record a 503 "model is loading" answer; True when the call should be retried"""
+        if self.scheduler is None or r.status_code != 503:
+            return False
+        try:
+            estimated_time = r.json().get('estimated_time')
+        except (ValueError, AttributeError):
+            return False
+        if estimated_time is None:
+            return False
+        self.scheduler.record_loading(model, estimated_time)
+        return True
+
+    def _answered(self, model, result, waited):
+        if result and self.scheduler is not None:
+            self.scheduler.record_answer(model, waited)
+        if result:
+            result['wait_ms'] = round(waited * 1000, 1)
+        return result
+
+    def _call_model(self, model, headers, payload, deadline=None, waited=0.0):
+        """
+        Call one inference model; returns parsed predictions or None. A model
+        that turns out to be loading is retried when it should be ready, as
+        long as that is before ``deadline``; ``waited`` is time already held.
+        """
+        url = f"{self.api_base}/{model}"
+        try:
+            while True:
+                if self.scheduler:
+                    self.scheduler.record_call(model)
+                r = self.sessions.post(url, headers=headers, json=payload,
+                                       timeout=(self.connect_timeout, self.timeout))
+                if not self._loading(model, r):
+                    return self._answered(model, self._parse_response(url, r), waited)
+                hold = self._hold(model, deadline)
+                time.sleep(hold)
+                waited += hold
+        except Skipped:
+            raise
+        except Exception as api_err:
+            print(f"HF request error for {url}: {api_err}")
+        return None
+
+    async def _call_model_async(self, model, headers, payload, deadline=None, waited=0.0):
+        url = f"{self.api_base}/{model}"
+        try:
+            while True:
+                if self.scheduler:
+                    self.scheduler.record_call(model)
+                r = await self.async_sessions.post(url, headers=headers, json=payload,
+                                                   timeout=(self.connect_timeout, self.timeout))
+                if not self._loading(model, r):
+                    return self._answered(model, self._parse_response(url, r), waited)
+                hold = self._hold(model, deadline)
+                await asyncio.sleep(hold)
+                waited += hold
+        except Skipped:
+            raise
+        except Exception as api_err:
+            print(f"HF request error for {url}: {api_err}")
+        return None
+
+    def ping(self, model):
+        """One tiny request that loads ``model`` (or keeps it loaded); True when it answered"""
+        url = f"{self.api_base}/{model}"
+        if self.scheduler:
+            self.scheduler.record_call(model)
+        r = self.sessions.post(url, headers=self._headers(), json={"inputs": "warm up"},
+                               timeout=(self.connect_timeout, self.timeout))
+        if self._loading(model, r):
+            return False
+        return self._answered(model, self._parse_response(url, r), 0.0) is not None
+
+    def analyze(self, text, plan=None):
+        models, deadline, hold = plan or self.ready()
+        headers = self._headers()
+        payload = {"inputs": text}
+        attempts = [
+            (model, lambda model=model: self._call_model(
+                model, headers, payload, deadline, hold if model == models[0] else 0.0))
+            for model in models
+        ]
+        model, result = self.dispatcher.dispatch(attempts)
+        if result:
+            result['model'] = model
+        return result
+
+    async def analyze_async(self, text, plan=None):
+        """``analyze`` with async HTTP and hedging on the running event loop"""
+        if self.async_sessions is None:
+            raise RuntimeError('HuggingFaceProvider.analyze_async needs async_sessions')
+        models, deadline, hold = plan or await self.ready_async()
+        headers = self._headers()
+        payload = {"inputs": text}
+        attempts = [
+            (model, lambda model=model: self._call_model_async(
+                model, headers, payload, deadline, hold if model == models[0] else 0.0))
+            for model in models
+        ]
+        model, result = await self.dispatcher.dispatch_async(attempts)
+        if result:
+            result['model'] = model
+        return result
+
+    def _call_model_batch(self, model, headers, texts, deadline=None):
+        """Send a list of inputs in one request; returns a parsed list or None"""
+        url = f"{self.api_base}/{model}"
+        waited = 0.0
+        try:
+            while True:
+                if self.scheduler:
+                    self.scheduler.record_call(model)
+                r = self.sessions.post(url, headers=headers, json={"inputs": list(texts)},
+                                       timeout=(self.connect_timeout, self.timeout))
+                if not self._loading(model, r):
+                    break
+                hold = self._hold(model, deadline)
+                time.sleep(hold)
+                waited += hold
+            if r.status_code != 200:
+                print(f"HF batch request to {url} returned {r.status_code}")
+                return None
+            predictions = r.json()
+            # One list of label scores per input, in input order
+            if not isinstance(predictions, list) or len(predictions) != len(texts):
+                print(f"HF batch response from {url} did not match {len(texts)} inputs")
+                return None
+            parsed = [parse_predictions([item]) for item in predictions]
+            if any(parsed) and self.scheduler:
+                self.scheduler.record_answer(model, waited)
+            return parsed if any(parsed) else None
+        except Skipped:
+            raise
+        except Exception as api_err:
+            print(f"HF batch request error for {url}: {api_err}")
+        return None
+
+    def analyze_batch(self, texts, plan=None):
+        if len(texts) == 1:
+            return [self.analyze(texts[0], plan)]
+        models, deadline, hold = plan or self.ready()
+        headers = self._headers()
+        attempts = [
+            (model, lambda model=model: self._call_model_batch(model, headers, texts, deadline))
+            for model in models
+        ]
+        model, results = self.dispatcher.dispatch(attempts)
+        if not results:
+            return [None] * len(texts)
+        for result in results:
+            if result:
+                result['model'] = model
+        return results
+
+
+# Emotion axes scored by the local lexicon, in vector order
+LEXICON_EMOTIONS = ('happy', 'sad', 'angry', 'fear', 'disgust', 'surprise')
+
+_LEXICON_WORDS = {
+    'happy': (
+        'happy happier happiest happiness joy joyful glad great good wonderful amazing awesome '
+        'fantastic excellent love loved loving lovely enjoy enjoyed enjoying fun excited exciting '
+        'grateful thankful blessed proud pleased delighted cheerful calm peaceful relaxed relaxing '
+        'content smile smiled smiling laugh laughed laughing hope hopeful optimistic nice beautiful '
+        'perfect best success successful accomplished win won celebrate celebrated energized '
+        'motivated inspired confident thrilled fine better yay'
+    ),
+    'sad': (
+        'sad sadder saddest sadness unhappy down depressed depressing depression lonely alone '
+        'miserable cry cried crying tears tearful heartbroken grief grieving loss lost miss missed '
+        'missing hurt hurting pain painful tired exhausted empty hopeless disappointed disappointing '
+        'regret sorry gloomy blue low worthless numb broken failure failed reject rejected '
+        'abandoned awful terrible bad worse worst'
+    ),
+    'angry': (
+        'angry anger mad furious rage raging annoyed annoying irritated irritating frustrated '
+        'frustrating frustration hate hated hating resent resentful outraged livid pissed '
+        'infuriating infuriated bitter hostile argue argued argument fight fought yelled yelling '
+        'unfair betrayed'
+    ),
+    'fear': (
+        'afraid fear fearful scared scary frightened terrified terrifying anxious anxiety worried '
+        'worry worrying nervous panic panicked panicking stress stressed stressful overwhelmed '
+        'overwhelming dread dreading uneasy insecure tense threatened unsafe uncertain doubt '
+        'deadline'
+    ),
+    'disgust': (
+        'disgust disgusted disgusting gross revolting repulsive nasty sick sickening vile '
+        'horrible yuck ew awful ashamed shame shameful cringe cringey appalled'
+    ),
+    'surprise': (
+        'surprise surprised surprising shocked shocking unexpected unexpectedly astonished amazed '
+        'wow whoa suddenly sudden unbelievable stunned startled'
+    ),
+}
+
+_NEGATIONS = frozenset("not no never none nobody nothing neither nor cannot cant dont didnt doesnt isnt wasnt "
+                       "arent werent wont wouldnt couldnt shouldnt hardly barely".split())
+_INTENSIFIERS = {
+    'very': 1.5, 'really': 1.5, 'so': 1.4, 'extremely': 1.8, 'super': 1.5, 'incredibly': 1.8,
+    'totally': 1.4, 'completely': 1.5, 'absolutely': 1.6, 'quite': 1.2, 'slightly': 0.6,
+    'somewhat': 0.7, 'little': 0.7, 'bit': 0.7,
+}
+# Negating an emotion moves its weight to this axis ("not happy" reads as sad)
+_NEGATION_FLIP = {0: 1, 1: 0}
+
+
+def _compile_lexicon():
+    """Build word -> emotion weight vector once at import time"""
+    table = {}
+    width = len(LEXICON_EMOTIONS)
+    for index, emotion in enumerate(LEXICON_EMOTIONS):
+        for word in _LEXICON_WORDS[emotion].split():
+            vector = list(table.get(word, (0.0,) * width))
+            vector[index] += 1.0
+            table[word] = tuple(vector)
+    return table
+
+
+_LEXICON = _compile_lexicon()
+_TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+
+class LocalLexiconProvider(SentimentProvider):
+    """Offline lexicon classifier; answers in microseconds with no network"""
+
+    name = 'local'
+    cacheable = False
+
+    def __init__(self, neutral_prior=0.5):
+        # Baseline weight for "neutral" so weak signals do not win outright
+        self.neutral_prior = neutral_prior
+
+    @property
+    def model_id(self):
+        return 'local-lexicon-v1'
+
+    def score_vector(self, text):
+        """Return the summed emotion vector for ``text``"""
+        tokens = _TOKEN_RE.findall(text.lower().replace("n't", "nt"))
+        hits = []
+        negate_until = -1
+        boost = 1.0
+        for position, token in enumerate(tokens):
+            if token in _NEGATIONS:
+                negate_until = position + 3
+                continue
+            if token in _INTENSIFIERS:
+                boost = _INTENSIFIERS[token]
+                continue
+            vector = _LEXICON.get(token)
+            if vector is None:
+                continue
+            if position <= negate_until:
+                flipped = [0.0] * len(vector)
+                for axis, weight in enumerate(vector):
+                    # Negated emotions swap happy/sad and otherwise fade out
+                    flipped[_NEGATION_FLIP.get(axis, axis)] += weight * (1.0 if axis in _NEGATION_FLIP else 0.3)
+                vector = flipped
+            hits.append(vector if boost == 1.0 else tuple(weight * boost for weight in vector))
+            boost = 1.0
+        if not hits:
+            return (0.0,) * len(LEXICON_EMOTIONS)
+        return tuple(map(sum, zip(*hits)))
+
+    def analyze(self, text, plan=None):
+        totals = self.score_vector(text)
+        strongest = max(range(len(totals)), key=totals.__getitem__)
+        denominator = sum(totals) + self.neutral_prior
+        if totals[strongest] < self.neutral_prior:
+            return {
+                'emotion_label': 'neutral',
+                'sentiment_score': round(self.neutral_prior / denominator, 4),
+                'model': self.model_id,
+            }
+        return {
+            'emotion_label': LEXICON_EMOTIONS[strongest],
+            'sentiment_score': round(totals[strongest] / denominator, 4),
+            'model': self.model_id,
+        }
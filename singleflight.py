@@ -0,0 +1,89 @@
+"""
+In-flight request coalescing.
+
+``SingleFlight.do(key, fn)`` runs ``fn`` once for every group of concurrent
+callers with the same key: the first caller (the leader) makes the call and
+the others wait for it and get the same result, or the same exception. Once
+the call has finished the next caller with that key starts a new one, so
+this only merges work that overlaps in time; caching is someone else's job.
+"""
+
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls by key, for threads (``do``) and coroutines (``do_async``)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        """Returns ``(result, shared)``; ``shared`` is True for callers that waited on a leader"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    async def do_async(self, key, fn):
+        """``do`` for coroutines on one event loop; ``fn`` returns an awaitable"""
+        task = self._async_calls.get(key)
+        leader = task is None
+        if leader:
+            # The call runs as its own task: neither the leader nor a follower
+            # giving up (client gone) cancels it for the others
+            task = self._async_calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finished(key, done))
+        with self._lock:
+            if leader:
+                self.leaders += 1
+            else:
+                self.shared += 1
+        return await asyncio.shield(task), not leader
+
+    def _finished(self, key, task):
+        if self._async_calls.get(key) is task:
+            del self._async_calls[key]
+        if not task.cancelled():
+            # Marks the exception retrieved when nobody was left waiting for it
+            task.exception()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls) + len(self._async_calls),
+                'leaders': self.leaders,
+                'shared': self.shared,
+            }
@@ -3,6 +3,28 @@ let entries = [];
 let moodChart = null;
 let trendChart = null;
 let currentEmotionData = null;
+let nextEntriesCursor = null;
+let loadingMoreEntries = false;
+let searchQuery = '';
+let searchTimer = null;
+let currentStats = null;
+let liveSource = null;
+let liveConnected = false;
+let changesCursor = null;
+let syncInFlight = null;
+let syncAgain = false;
+let entryCacheDb = null;
+
+// Idempotency key per plan until its payment is ready, so repeated clicks reuse one payment
+const paymentKeys = {};
+// Payment id -> resolver waiting for a payment_updated event
+const paymentWaiters = new Map();
+
+// Days of trend shown with /api/stats (matches the server default)
+const TREND_DAYS = 30;
+
+// Last good response per URL, reused when the server answers 304 Not Modified
+const conditionalCache = new Map();
 
 // Initialize the application
 document.addEventListener('DOMContentLoaded', function() {
@@ -10,8 +32,12 @@ document.addEventListener('DOMContentLoaded', function() {
     setupDarkMode();
     setupEmotionAnalysis();
     setupAuth();
-    loadEntries();
+    loadCachedEntries();
     loadStats();
+    setupInfiniteScroll();
+    setupTrendControls();
+    setupSearch();
+    setupLiveUpdates();
 });
 
 // Navigation functionality
@@ -196,13 +222,19 @@ async function analyzeEmotion(content) {
             
             showSuccess('Emotion analyzed successfully!');
             
+        } else if (response.status === 429) {
+            // Over the analysis rate limit: the server says when to come back
+            const wait = response.headers.get('Retry-After') || '1';
+            const error = new Error('Rate limited');
+            error.userMessage = `Too many analyses right now. Please try again in ${wait}s.`;
+            throw error;
         } else {
             throw new Error('Failed to analyze emotion');
         }
         
     } catch (error) {
         console.error('Error analyzing emotion:', error);
-        showError('Failed to analyze emotion. Please try again.');
+        showError(error.userMessage || 'Failed to analyze emotion. Please try again.');
         
         // Reset emotion result
         emotionResult.style.display = 'none';
@@ -244,7 +276,13 @@ async function saveEntry() {
         
         if (response.ok) {
             const newEntry = await response.json();
-            entries.unshift(newEntry);
+            // The live stream may have delivered it already
+            upsertEntry(newEntry);
+            
+            // Analysis is running in the background; the stream (or polling) fills it in
+            if (response.status === 202 && !liveConnected) {
+                pollAnalysis(newEntry.id);
+            }
             
             // Clear form
             document.getElementById('content').value = '';
@@ -252,9 +290,9 @@ async function saveEntry() {
             currentEmotionData = null;
             saveBtn.disabled = true;
             
-            // Update displays
+            // Update displays; stats arrive as a live event when connected
             updateEntriesList();
-            loadStats();
+            refreshStatsIfOffline();
             
             showSuccess('Entry saved successfully!');
             
@@ -272,12 +310,75 @@ async function saveEntry() {
     }
 }
 
-// Load and display entries
-async function loadEntries() {
+// Poll the server until a background analysis finishes
+async function pollAnalysis(entryId, attempt = 0) {
+    // The live stream delivers entry_analyzed once it is connected
+    if (attempt >= 30 || liveConnected) return;
+    
     try {
-        const response = await fetch('/api/entries');
+        const response = await fetch(`/api/entries/${entryId}/analysis`);
         if (response.ok) {
-            entries = await response.json();
+            const analysis = await response.json();
+            if (analysis.status !== 'pending') {
+                const entry = entries.find(e => e.id === entryId);
+                if (entry) {
+                    Object.assign(entry, {
+                        emotion_label: analysis.emotion_label,
+                        sentiment_score: analysis.sentiment_score,
+                        ai_provider: analysis.ai_provider,
+                        detailed_analysis: analysis.detailed_analysis
+                    });
+                    writeEntryCache([entry], []);
+                    updateEntriesList();
+                    refreshStatsIfOffline();
+                }
+                return;
+            }
+        }
+    } catch (error) {
+        console.error('Error polling analysis:', error);
+    }
+    
+    setTimeout(() => pollAnalysis(entryId, attempt + 1), 1000);
+}
+
+// GET JSON with If-None-Match from the previous response
+async function fetchConditional(url) {
+    const cached = conditionalCache.get(url);
+    const headers = {};
+    if (cached && cached.etag) {
+        headers['If-None-Match'] = cached.etag;
+    }
+    
+    // no-store: revalidation is done here, so a 304 must reach this code
+    const response = await fetch(url, { headers: headers, cache: 'no-store' });
+    if (response.status === 304 && cached) {
+        return { ok: true, notModified: true, data: cached.data, headers: cached.headers };
+    }
+    if (!response.ok) {
+        return { ok: false, notModified: false, data: null, headers: response.headers };
+    }
+    
+    const data = await response.json();
+    conditionalCache.set(url, {
+        etag: response.headers.get('ETag'),
+        data: data,
+        headers: response.headers
+    });
+    return { ok: true, notModified: false, data: data, headers: response.headers };
+}
+
+// Load and display entries (first page)
+async function loadEntries() {
+    try {
+        const result = await fetchConditional('/api/entries');
+        // Unchanged since the last load: the list on screen is current
+        if (result.ok && !result.notModified) {
+            entries = result.data.slice();
+            nextEntriesCursor = result.headers.get('X-Next-Cursor');
+            // Where syncChanges() picks up from
+            changesCursor = result.headers.get('X-Changes-Cursor');
+            writeEntryCache(entries, [], true);
             updateEntriesList();
         }
     } catch (error) {
@@ -286,56 +387,260 @@ async function loadEntries() {
     }
 }
 
+// Show the entries cached by the last visit at once, then fetch what changed since
+async function loadCachedEntries() {
+    const cached = await readEntryCache();
+    if (!cached || !cached.changesCursor) {
+        return loadEntries();
+    }
+    entries = cached.entries.sort(compareEntries);
+    changesCursor = cached.changesCursor;
+    nextEntriesCursor = cached.nextEntriesCursor;
+    updateEntriesList();
+    return syncChanges();
+}
+
+// Newest first, like GET /api/entries
+function compareEntries(a, b) {
+    if (a.created_at !== b.created_at) {
+        return a.created_at < b.created_at ? 1 : -1;
+    }
+    return b.id - a.id;
+}
+
+// Fetch entries created, updated or deleted since changesCursor and merge them in;
+// calls made while a sync is running trigger one more round afterwards
+function syncChanges() {
+    if (syncInFlight) {
+        syncAgain = true;
+        return syncInFlight;
+    }
+    syncInFlight = (async () => {
+        try {
+            do {
+                syncAgain = false;
+                await fetchChanges();
+            } while (syncAgain);
+        } catch (error) {
+            console.error('Error syncing entries:', error);
+        } finally {
+            syncInFlight = null;
+        }
+    })();
+    return syncInFlight;
+}
+
+async function fetchChanges() {
+    if (!changesCursor) {
+        return loadEntries();
+    }
+    let hasMore = true;
+    while (hasMore) {
+        const response = await fetch(`/api/entries/changes?since=${encodeURIComponent(changesCursor)}`, { cache: 'no-store' });
+        // The server's change log was reset since our cursor: start over
+        if (response.status === 410) {
+            changesCursor = null;
+            return loadEntries();
+        }
+        if (!response.ok) {
+            throw new Error(`Change sync failed (${response.status})`);
+        }
+        const delta = await response.json();
+        const kept = mergeChanges(delta.changes, delta.deleted);
+        changesCursor = delta.cursor;
+        writeEntryCache(kept, delta.deleted);
+        hasMore = delta.has_more;
+    }
+    updateEntriesList();
+}
+
+// Apply changed entries and tombstones to the list; returns the entries kept
+function mergeChanges(changed, deletedIds) {
+    const deleted = new Set(deletedIds);
+    const byId = new Map(entries.filter(entry => !deleted.has(entry.id)).map(entry => [entry.id, entry]));
+    // Unknown entries older than the last loaded page arrive with that page instead
+    const oldest = nextEntriesCursor && entries.length ? entries[entries.length - 1] : null;
+    const kept = changed.filter(entry => byId.has(entry.id) || !oldest || compareEntries(entry, oldest) <= 0);
+    kept.forEach(entry => byId.set(entry.id, Object.assign(byId.get(entry.id) || {}, entry)));
+    entries = Array.from(byId.values()).sort(compareEntries);
+    return kept;
+}
+
+// IndexedDB copy of the loaded entries and both cursors (one record per entry,
+// so a sync only writes what changed). Without IndexedDB every visit loads in full.
+function openEntryCache() {
+    if (!entryCacheDb) {
+        entryCacheDb = new Promise(resolve => {
+            if (!window.indexedDB) return resolve(null);
+            const request = indexedDB.open('mood-journal', 1);
+            request.onupgradeneeded = () => {
+                request.result.createObjectStore('entries', { keyPath: 'id' });
+                request.result.createObjectStore('meta');
+            };
+            request.onsuccess = () => resolve(request.result);
+            // Private browsing or storage disabled
+            request.onerror = () => resolve(null);
+            request.onblocked = () => resolve(null);
+        });
+    }
+    return entryCacheDb;
+}
+
+async function readEntryCache() {
+    const db = await openEntryCache();
+    if (!db) return null;
+    return new Promise(resolve => {
+        const tx = db.transaction(['entries', 'meta'], 'readonly');
+        const all = tx.objectStore('entries').getAll();
+        const meta = tx.objectStore('meta').get('sync');
+        tx.oncomplete = () => resolve(meta.result ? Object.assign({ entries: all.result }, meta.result) : null);
+        tx.onerror = () => resolve(null);
+    });
+}
+
+// Store changed entries, drop deleted ones (or replace everything) and save the cursors
+async function writeEntryCache(changed, deletedIds, replace = false) {
+    const db = await openEntryCache();
+    if (!db) return;
+    const tx = db.transaction(['entries', 'meta'], 'readwrite');
+    const store = tx.objectStore('entries');
+    if (replace) store.clear();
+    changed.forEach(entry => store.put(entry));
+    deletedIds.forEach(id => store.delete(id));
+    tx.objectStore('meta').put({ changesCursor: changesCursor, nextEntriesCursor: nextEntriesCursor }, 'sync');
+    tx.onerror = () => console.error('Error caching entries:', tx.error);
+}
+
+// Fetch the next page of older entries
+async function loadMoreEntries() {
+    if (!nextEntriesCursor || loadingMoreEntries || searchQuery) return;
+    loadingMoreEntries = true;
+    
+    try {
+        const result = await fetchConditional(`/api/entries?cursor=${encodeURIComponent(nextEntriesCursor)}`);
+        if (result.ok) {
+            const page = result.data;
+            const known = new Set(entries.map(entry => entry.id));
+            entries = entries.concat(page.filter(entry => !known.has(entry.id)));
+            nextEntriesCursor = result.headers.get('X-Next-Cursor');
+            writeEntryCache(page, []);
+            updateEntriesList();
+        }
+    } catch (error) {
+        console.error('Error loading more entries:', error);
+    } finally {
+        loadingMoreEntries = false;
+    }
+}
+
+// Load older entries as the user scrolls to the bottom of the list
+function setupInfiniteScroll() {
+    window.addEventListener('scroll', function() {
+        const section = document.getElementById('recent-entries');
+        if (!section || !section.classList.contains('active')) return;
+        
+        const nearBottom = window.innerHeight + window.scrollY >= document.body.offsetHeight - 300;
+        if (nearBottom) {
+            loadMoreEntries();
+        }
+    }, { passive: true });
+}
+
+// Search entries as the user types (debounced); clearing the box restores the list
+function setupSearch() {
+    const input = document.getElementById('entrySearch');
+    if (!input) return;
+    
+    input.addEventListener('input', function() {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(() => searchEntries(this.value.trim()), 250);
+    });
+}
+
+async function searchEntries(query) {
+    searchQuery = query;
+    if (!query) {
+        updateEntriesList();
+        return;
+    }
+    
+    try {
+        const result = await fetchConditional(`/api/entries/search?q=${encodeURIComponent(query)}`);
+        // Ignore answers to queries the user has already typed past
+        if (!result.ok || query !== searchQuery) return;
+        
+        const entriesList = document.getElementById('entriesList');
+        if (!entriesList) return;
+        const results = result.data.results;
+        entriesList.innerHTML = results.length === 0
+            ? `<div class="loading">No entries match your search.</div>`
+            // Snippets come back HTML-escaped with <mark> around the matches
+            : results.map(entry => renderEntryItem(entry, entry.snippet || entry.content)).join('');
+    } catch (error) {
+        console.error('Error searching entries:', error);
+    }
+}
+
 function updateEntriesList() {
     const entriesList = document.getElementById('entriesList');
     if (!entriesList) return;
     
+    // Keep showing search results until the search box is cleared
+    if (searchQuery) {
+        searchEntries(searchQuery);
+        return;
+    }
+    
     if (entries.length === 0) {
         entriesList.innerHTML = '<div class="loading">No entries yet. Start journaling to see your mood patterns!</div>';
         return;
     }
 
-    entriesList.innerHTML = entries.map(entry => {
-        // Convert sentiment score to percentage
-        const scorePercentage = Math.round((entry.sentiment_score || 0.5) * 100);
-        
-        // Get emotion with better formatting
-        const emotion = entry.emotion_label || 'neutral';
-        const emotionDisplay = emotion.charAt(0).toUpperCase() + emotion.slice(1);
-        
-        // Get emotion color class
-        const emotionClass = `emotion-${emotion}`;
-        
-        // Use the correct timestamp field
-        const timestamp = entry.timestamp || entry.created_at;
-        
-        return `
-            <div class="entry-item">
-                <div class="entry-header">
-                    <div class="entry-meta">
-                        <span class="emotion-badge ${emotionClass}">
-                            ${emotionDisplay}: ${scorePercentage}%
-                        </span>
-                        <span class="ai-provider-badge">${entry.ai_provider || 'huggingface'}</span>
-                        <span class="entry-timestamp">${formatDate(timestamp)}</span>
-                    </div>
-                    <button class="btn btn-danger" onclick="deleteEntry(${entry.id})">
-                        <i class="fas fa-trash"></i>
-                    </button>
+    entriesList.innerHTML = entries.map(entry => renderEntryItem(entry, entry.content)).join('');
+}
+
+// Markup for one entry card; contentHtml is the body text (or a search snippet)
+function renderEntryItem(entry, contentHtml) {
+    // Convert sentiment score to percentage
+    const scorePercentage = Math.round((entry.sentiment_score || 0.5) * 100);
+    
+    // Get emotion with better formatting
+    const emotion = entry.emotion_label || 'neutral';
+    const emotionDisplay = emotion.charAt(0).toUpperCase() + emotion.slice(1);
+    
+    // Get emotion color class
+    const emotionClass = `emotion-${emotion}`;
+    
+    // Use the correct timestamp field
+    const timestamp = entry.timestamp || entry.created_at;
+    
+    return `
+        <div class="entry-item">
+            <div class="entry-header">
+                <div class="entry-meta">
+                    <span class="emotion-badge ${emotionClass}">
+                        ${emotionDisplay}: ${scorePercentage}%
+                    </span>
+                    <span class="ai-provider-badge">${entry.ai_provider || 'huggingface'}</span>
+                    <span class="entry-timestamp">${formatDate(timestamp)}</span>
                 </div>
-                <div class="entry-content">${entry.content}</div>
-                ${entry.detailed_analysis ? `<div class="entry-analysis">${entry.detailed_analysis}</div>` : ''}
+                <button class="btn btn-danger" onclick="deleteEntry(${entry.id})">
+                    <i class="fas fa-trash"></i>
+                </button>
             </div>
-        `;
-    }).join('');
+            <div class="entry-content">${contentHtml}</div>
+            ${entry.detailed_analysis ? `<div class="entry-analysis">${entry.detailed_analysis}</div>` : ''}
+        </div>
+    `;
 }
 
 // Load and display statistics
 async function loadStats() {
     try {
-        const response = await fetch('/api/stats');
-        if (response.ok) {
-            const stats = await response.json();
+        const result = await fetchConditional('/api/stats');
+        if (result.ok && !result.notModified) {
+            const stats = result.data;
+            currentStats = stats;
             updateStatsDisplay(stats);
             updateCharts(stats);
         }
@@ -374,7 +679,41 @@ function updateStatsDisplay(stats) {
 function updateCharts(stats) {
     if (stats) {
         updateMoodChart(stats.emotion_counts);
-        updateTrendChart(stats.trend_data);
+        
+        // /api/stats carries daily points; other granularities are fetched separately
+        const granularity = document.getElementById('trendGranularity');
+        if (granularity && granularity.value !== 'day') {
+            loadTrends(granularity.value);
+        } else {
+            updateTrendChart(stats.trend_data);
+        }
+    }
+}
+
+// Switch the trend chart between daily, weekly and monthly rollups
+function setupTrendControls() {
+    const granularity = document.getElementById('trendGranularity');
+    if (!granularity) return;
+    
+    granularity.addEventListener('change', function() {
+        loadTrends(this.value);
+    });
+}
+
+async function loadTrends(granularity) {
+    try {
+        // Always redraw: the chart may be showing another granularity
+        const result = await fetchConditional(`/api/stats/trends?granularity=${granularity}`);
+        if (result.ok) {
+            const trends = result.data;
+            updateTrendChart(trends.points.map(point => ({
+                date: point.period,
+                score: point.mean_score,
+                emotion: point.dominant_emotion
+            })));
+        }
+    } catch (error) {
+        console.error('Error loading trends:', error);
     }
 }
 
@@ -382,25 +721,32 @@ function updateMoodChart(emotionCounts) {
     const ctx = document.getElementById('moodChart');
     if (!ctx) return;
     
-    if (moodChart) {
-        moodChart.destroy();
-    }
-
     const colors = {
         positive: '#28a745',
         neutral: '#6c757d',
         negative: '#dc3545'
     };
+    const labels = Object.keys(emotionCounts).map(emotion => 
+        emotion.charAt(0).toUpperCase() + emotion.slice(1)
+    );
+    const backgroundColor = Object.keys(emotionCounts).map(emotion => colors[emotion]);
+
+    // Redraw the existing chart so live updates do not flicker
+    if (moodChart) {
+        moodChart.data.labels = labels;
+        moodChart.data.datasets[0].data = Object.values(emotionCounts);
+        moodChart.data.datasets[0].backgroundColor = backgroundColor;
+        moodChart.update();
+        return;
+    }
 
     moodChart = new Chart(ctx.getContext('2d'), {
         type: 'doughnut',
         data: {
-            labels: Object.keys(emotionCounts).map(emotion => 
-                emotion.charAt(0).toUpperCase() + emotion.slice(1)
-            ),
+            labels: labels,
             datasets: [{
                 data: Object.values(emotionCounts),
-                backgroundColor: Object.keys(emotionCounts).map(emotion => colors[emotion]),
+                backgroundColor: backgroundColor,
                 borderWidth: 2,
                 borderColor: '#fff'
             }]
@@ -421,7 +767,10 @@ function updateTrendChart(trendData) {
     if (!ctx) return;
     
     if (trendChart) {
-        trendChart.destroy();
+        trendChart.data.labels = trendData.map(item => item.date);
+        trendChart.data.datasets[0].data = trendData.map(item => item.score);
+        trendChart.update();
+        return;
     }
 
     trendChart = new Chart(ctx.getContext('2d'), {
@@ -454,6 +803,114 @@ function updateTrendChart(trendData) {
     });
 }
 
+// Insert or refresh an entry in the loaded list (newest first)
+function upsertEntry(entry) {
+    const existing = entries.find(e => e.id === entry.id);
+    if (existing) {
+        Object.assign(existing, entry);
+    } else {
+        entries.unshift(entry);
+    }
+    writeEntryCache([existing || entry], []);
+}
+
+// Without the live stream nothing pushes stats, so fetch them
+function refreshStatsIfOffline() {
+    if (!liveConnected) {
+        loadStats();
+    }
+}
+
+// Subscribe to /api/stream and apply entry and stats changes in place
+function setupLiveUpdates(reconnecting = false) {
+    if (!window.EventSource) return;
+    
+    let needsReload = reconnecting;
+    liveSource = new EventSource('/api/stream');
+    
+    liveSource.addEventListener('open', function() {
+        liveConnected = true;
+        // A new stream (not a resumed one) may have missed changes
+        if (needsReload) {
+            needsReload = false;
+            syncChanges();
+            loadStats();
+        }
+    });
+    liveSource.addEventListener('error', function() {
+        liveConnected = false;
+        // The browser retries on its own unless the server refused the stream
+        if (liveSource.readyState === EventSource.CLOSED) {
+            liveSource.close();
+            setTimeout(() => setupLiveUpdates(true), 10000);
+        }
+    });
+    
+    liveSource.addEventListener('entry_created', function(e) {
+        upsertEntry(JSON.parse(e.data));
+        updateEntriesList();
+    });
+    liveSource.addEventListener('entry_analyzed', function(e) {
+        const analysis = JSON.parse(e.data);
+        const entry = entries.find(item => item.id === analysis.id);
+        if (entry) {
+            Object.assign(entry, analysis);
+            writeEntryCache([entry], []);
+            updateEntriesList();
+        }
+    });
+    liveSource.addEventListener('entry_deleted', function(e) {
+        const id = JSON.parse(e.data).id;
+        entries = entries.filter(entry => entry.id !== id);
+        writeEntryCache([], [id]);
+        updateEntriesList();
+    });
+    liveSource.addEventListener('entries_imported', function() {
+        syncChanges();
+    });
+    liveSource.addEventListener('stats', function(e) {
+        applyStatsEvent(JSON.parse(e.data));
+    });
+    liveSource.addEventListener('payment_updated', function(e) {
+        const payment = JSON.parse(e.data);
+        const resolve = paymentWaiters.get(payment.id);
+        if (resolve) resolve(payment);
+    });
+    // Fell behind or resumed too late: catch up from the change cursor
+    liveSource.addEventListener('reset', function() {
+        syncChanges();
+        loadStats();
+    });
+}
+
+// Merge a stats event (totals plus changed trend days) into the charts
+function applyStatsEvent(delta) {
+    const stats = currentStats || { trend_data: [] };
+    stats.total_entries = delta.total_entries;
+    stats.average_score = delta.average_score;
+    stats.emotion_counts = delta.emotion_counts;
+    
+    if (delta.trend_data) {
+        stats.trend_data = delta.trend_data;
+    } else if (delta.trend_points) {
+        const byDate = new Map(stats.trend_data.map(point => [point.date, point]));
+        delta.trend_points.forEach(point => {
+            if (point.count) {
+                byDate.set(point.date, point);
+            } else {
+                byDate.delete(point.date);
+            }
+        });
+        stats.trend_data = Array.from(byDate.values())
+            .sort((a, b) => a.date.localeCompare(b.date))
+            .slice(-TREND_DAYS);
+    }
+    
+    currentStats = stats;
+    updateStatsDisplay(stats);
+    updateCharts(stats);
+}
+
 // Delete entry functionality
 async function deleteEntry(entryId) {
     if (!confirm('Are you sure you want to delete this entry?')) {
@@ -467,8 +924,9 @@ async function deleteEntry(entryId) {
 
         if (response.ok) {
             entries = entries.filter(entry => entry.id !== entryId);
+            writeEntryCache([], [entryId]);
             updateEntriesList();
-            loadStats();
+            refreshStatsIfOffline();
             showSuccess('Entry deleted successfully!');
         } else {
             throw new Error('Failed to delete entry');
@@ -503,12 +961,19 @@ function getPlanAmount(plan) {
     return amounts[plan] || 5.99;
 }
 
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
 async function initiatePayment(plan, amount) {
+    paymentKeys[plan] = paymentKeys[plan] || newIdempotencyKey();
     try {
         const response = await fetch('/api/payment/initiate', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'Idempotency-Key': paymentKeys[plan]
             },
             body: JSON.stringify({
                 plan_type: plan,
@@ -517,7 +982,15 @@ async function initiatePayment(plan, amount) {
         });
         
         if (response.ok) {
-            const result = await response.json();
+            // 202: the checkout is still being created on the server
+            const result = await waitForCheckout(await response.json());
+            // Still initiating: a retry keeps the key and picks up the same payment
+            if (result.status !== 'initiating') {
+                delete paymentKeys[plan];
+            }
+            if (result.status === 'failed' || !result.payment_url) {
+                throw new Error(result.error || 'Payment initiation failed');
+            }
             showSuccess('Payment initiated! Redirecting to payment gateway...');
             
             // In a real app, you would redirect to the payment URL
@@ -534,6 +1007,27 @@ async function initiatePayment(plan, amount) {
     }
 }
 
+// Wait for the checkout URL: pushed as payment_updated when the live stream is
+// connected, polled otherwise (and as a fallback)
+async function waitForCheckout(payment) {
+    for (let attempt = 0; payment.status === 'initiating' && attempt < 30; attempt++) {
+        const update = await new Promise(resolve => {
+            paymentWaiters.set(payment.id, resolve);
+            setTimeout(() => resolve(null), liveConnected ? 5000 : Math.min(250 * 2 ** attempt, 2000));
+        });
+        paymentWaiters.delete(payment.id);
+        if (update) {
+            payment = update;
+            continue;
+        }
+        const response = await fetch(`/api/payments/${payment.id}`, { cache: 'no-store' });
+        if (response.ok) {
+            payment = await response.json();
+        }
+    }
+    return payment;
+}
+
 // Utility functions
 function formatDate(dateString) {
     const date = new Date(dateString);
@@ -0,0 +1,136 @@
+"""
+Incrementally maintained mood statistics.
+
+Per-emotion counts and score sums, overall and per day/week/month, are kept
+by the storage backend itself: triggers update them in the same transaction
+as every entry insert, re-score or delete (the mood_rollups table in
+SQLiteStorage, supabase/stats.sql on Supabase), so every worker and host
+reads the same numbers. ``/api/stats`` and the trend chart are answered
+without scanning the entries table; a full rebuild from the source of truth
+is only needed on demand or when drift is detected.
+"""
+
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+
+GRANULARITIES = ('day', 'week', 'month')
+
+
+def entry_date(created_at):
+    """UTC calendar date of an entry timestamp (today if missing/unparseable)"""
+    if created_at:
+        try:
+            stamp = datetime.fromisoformat(str(created_at).replace('Z', '+00:00'))
+            if stamp.tzinfo is not None:
+                stamp = stamp.astimezone(timezone.utc)
+            return stamp.date()
+        except ValueError:
+            pass
+    return datetime.now(timezone.utc).date()
+
+
+def bucket_key(granularity, day):
+    """Sortable bucket label: 2025-03-14 (day), Monday of the week, or 2025-03"""
+    if granularity == 'day':
+        return day.isoformat()
+    if granularity == 'week':
+        return (day - timedelta(days=day.weekday())).isoformat()
+    if granularity == 'month':
+        return day.strftime('%Y-%m')
+    raise ValueError(f'Unknown granularity: {granularity}')
+
+
+def bucket_start(granularity, bucket):
+    """First calendar day covered by a bucket label"""
+    if granularity == 'month':
+        return date.fromisoformat(bucket + '-01')
+    return date.fromisoformat(bucket)
+
+
+def _rounded(score_sum):
+    """Score sum for comparison; anything not numeric (a corrupt row) never matches"""
+    try:
+        return round(float(score_sum), 6)
+    except (TypeError, ValueError):
+        return None
+
+
+class MoodStats:
+    """Reads the aggregates of a storage backend in the shapes the API returns"""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._lock = threading.Lock()
+        self._checked_at = None
+
+    def rebuild(self):
+        """Recompute the aggregates from the entries; returns the entry count"""
+        return self.storage.rebuild_mood_stats()
+
+    def drift_check_due(self, interval):
+        """True (and the check is claimed) if this process ran no drift check in ``interval`` seconds"""
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < interval:
+                return False
+            self._checked_at = now
+            return True
+
+    def drifted(self):
+        """
+        Emotions whose count or score sum in the aggregates differs from the
+        entries table. Matching totals alone can hide drift, e.g. an entry
+        re-scored while the triggers were off.
+        """
+        def fingerprint(rows):
+            return {row['emotion']: (row['count'], _rounded(row['score_sum'])) for row in rows if row['count']}
+
+        kept = fingerprint(self.storage.mood_rollups('all'))
+        actual = fingerprint(self.storage.entry_label_totals())
+        return sorted(emotion for emotion in kept.keys() | actual.keys() if kept.get(emotion) != actual.get(emotion))
+
+    def snapshot(self):
+        """Counts and totals in O(#emotions)"""
+        rows = self.storage.mood_rollups('all')
+        total = sum(row['count'] for row in rows)
+        score_sum = sum(row['score_sum'] for row in rows)
+        return {
+            'emotion_counts': {row['emotion']: row['count'] for row in rows},
+            'average_scores': {row['emotion']: round(row['score_sum'] / row['count'], 4)
+                               for row in rows if row['count']},
+            'total_entries': total,
+            'average_score': round(score_sum / total, 4) if total else None,
+        }
+
+    def trends(self, granularity='day', start=None, end=None, limit=None):
+        """
+        Rollup points for ``granularity`` covering the dates ``start``..``end``
+        (inclusive, either may be None), oldest first. With ``limit`` only the
+        most recent buckets are returned.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f'Unknown granularity: {granularity}')
+        low = bucket_key(granularity, start) if start else ''
+        high = bucket_key(granularity, end) if end else '9999'
+
+        buckets = {}
+        for row in self.storage.mood_rollups(granularity, low, high, limit):
+            bucket = buckets.setdefault(row['bucket'], {'count': 0, 'score_sum': 0.0, 'emotions': {}})
+            bucket['count'] += row['count']
+            bucket['score_sum'] += row['score_sum']
+            bucket['emotions'][row['emotion']] = row['count']
+        points = []
+        for period in sorted(buckets):
+            bucket = buckets[period]
+            emotions = bucket['emotions']
+            dominant = min(emotions, key=lambda e: (-emotions[e], e)) if emotions else 'neutral'
+            points.append({
+                'period': period,
+                'start': bucket_start(granularity, period).isoformat(),
+                'count': bucket['count'],
+                'mean_score': round(bucket['score_sum'] / bucket['count'], 4) if bucket['count'] else None,
+                'dominant_emotion': dominant,
+                'emotions': emotions,
+            })
+        return points
@@ -0,0 +1,923 @@
+"""
+Storage repositories for journal entries and payments.
+
+Routes talk to a ``JournalStorage`` instead of a database client directly.
+``SupabaseStorage`` keeps data in Supabase (PostgREST); ``SQLiteStorage`` keeps
+it in a local SQLite file in WAL mode for single-node deployments.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from pagination import ENTRY_FIELDS
+from search import MARK_END, MARK_START, fts5_query, tsquery
+
+PAYMENT_FIELDS = (
+    'id', 'plan_type', 'amount', 'status', 'intasend_payment_id', 'created_at',
+    'idempotency_key', 'payment_url', 'error',
+)
+
+
+def utc_now_iso():
+    """Timestamp in the same ISO-8601 shape Supabase returns"""
+    return datetime.now(timezone.utc).isoformat(timespec='microseconds')
+
+
+def _checked_columns(columns, allowed):
+    columns = list(columns) if columns else list(allowed)
+    unknown = [column for column in columns if column not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    return columns
+
+
+def _walk_pages(fetch, page_size):
+    after = None
+    while True:
+        page = fetch(after)
+        yield from page
+        if len(page) < page_size:
+            return
+        after = (page[-1]['created_at'], page[-1]['id'])
+
+
+class JournalStorage:
+    """Interface shared by the storage backends"""
+
+    name = 'base'
+
+    # Entries -------------------------------------------------------------
+
+    def list_entries(self, columns=None, limit=50, after=None, created_from=None, created_to=None, emotions=None):
+        """
+        Entries newest first by (created_at, id), strictly after ``after``.
+        ``created_from``/``created_to`` bound created_at (inclusive/exclusive)
+        and ``emotions`` limits the labels returned.
+        """
+        raise NotImplementedError
+
+    def iter_entries(self, columns=None, page_size=1000, **filters):
+        """Walk every matching entry page by page"""
+        return _walk_pages(lambda after: self.list_entries(columns, page_size, after, **filters), page_size)
+
+    def get_entry(self, entry_id, columns=None):
+        raise NotImplementedError
+
+    def insert_entry(self, data):
+        """Insert one entry and return the stored row"""
+        raise NotImplementedError
+
+    def insert_entries(self, rows):
+        """Insert many entries in one round trip and return the stored rows"""
+        return [self.insert_entry(row) for row in rows]
+
+    def update_entry(self, entry_id, data):
+        """Update one entry and return the stored row (None if missing)"""
+        raise NotImplementedError
+
+    def delete_entry(self, entry_id):
+        """Delete one entry and return the removed row (None if missing)"""
+        raise NotImplementedError
+
+    def count_entries(self):
+        raise NotImplementedError
+
+    def list_entry_changes(self, since=0, limit=500, columns=None):
+        """
+        Entries inserted, updated or deleted after change sequence ``since``,
+        oldest change first, as ``{'seq', 'id', 'entry'}`` rows. Each entry
+        appears once, at its latest change; ``entry`` holds ``columns`` of the
+        current row, or None when it was deleted (a tombstone).
+        """
+        raise NotImplementedError
+
+    def entry_changes_cursor(self):
+        """Sequence number of the newest entry change (0 before the first write)"""
+        raise NotImplementedError
+
+    # Data versions -------------------------------------------------------
+
+    def data_version(self, scope):
+        """
+        A counter the database itself moves on every write to ``scope``
+        ('entries', 'payments', or 'stats' for mood stats rebuilds), whoever
+        makes it; None when this backend keeps none, and responses for the
+        scope must not be revalidated.
+        """
+        if scope == 'entries':
+            return self.entry_changes_cursor()
+        return None
+
+    def data_epoch(self):
+        """Identifies this database, so versions of a recreated one never match old ETags"""
+        return ''
+
+    # Mood statistics -----------------------------------------------------
+
+    def mood_rollups(self, granularity, low='', high='9999', buckets=None):
+        """
+        Rows (granularity, bucket, emotion, count, score_sum) of the aggregates
+        the database updates with every entry write: 'all' (bucket '') or
+        per 'day', 'week' (its Monday) and 'month'. With ``buckets`` only the
+        most recent that many buckets between ``low`` and ``high`` are returned.
+        """
+        raise NotImplementedError
+
+    def rebuild_mood_stats(self):
+        """Recompute the aggregates from journal_entries; returns the entry count"""
+        raise NotImplementedError
+
+    def entry_label_totals(self):
+        """
+        Rows (emotion, count, score_sum) computed from journal_entries itself,
+        to check the 'all' rollups against
+        """
+        raise NotImplementedError
+
+    def search_entries(self, terms, limit=20, offset=0, created_from=None, created_to=None, emotions=None):
+        """
+        Entries matching every term of ``search.parse_query``, best match first.
+        Rows carry ``rank`` (higher is better) and a ``snippet`` whose matches
+        are wrapped in ``search.MARK_START``/``MARK_END``.
+        """
+        raise NotImplementedError
+
+    # Payments ------------------------------------------------------------
+
+    def insert_payment(self, data):
+        raise NotImplementedError
+
+    def insert_payment_once(self, data):
+        """
+        Insert a payment unless one with the same ``idempotency_key`` exists.
+        Returns ``(row, created)``; ``row`` is the existing payment when not created.
+        """
+        raise NotImplementedError
+
+    def get_payment(self, payment_id):
+        raise NotImplementedError
+
+    def update_payment(self, payment_id, data):
+        raise NotImplementedError
+
+    def update_payment_by_intasend_id(self, intasend_payment_id, data):
+        raise NotImplementedError
+
+    def update_payments(self, payment_ids, data, status=None):
+        """
+        Apply ``data`` to many payments in one statement, skipping rows no
+        longer in ``status`` when given. Returns the number of rows updated.
+        """
+        raise NotImplementedError
+
+    def list_payments(self, limit=None, after=None, created_from=None, created_to=None, status=None):
+        """Payments newest first by (created_at, id); all of them when ``limit`` is None"""
+        raise NotImplementedError
+
+    def iter_payments(self, page_size=1000, **filters):
+        return _walk_pages(lambda after: self.list_payments(page_size, after, **filters), page_size)
+
+
+class SupabaseStorage(JournalStorage):
+    """Supabase (PostgREST) backend"""
+
+    name = 'supabase'
+
+    def __init__(self, client):
+        self.client = client
+        self._epoch = None
+
+    def _entries(self):
+        return self.client.table('journal_entries')
+
+    @staticmethod
+    def _page(query, limit, after, created_from, created_to):
+        # PostgREST needs both sort keys in a single order= parameter
+        query = query.order('created_at.desc,id', desc=True)
+        if limit is not None:
+            query = query.limit(limit)
+        if after:
+            created_at, row_id = after
+            query = query.or_(
+                f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{int(row_id)})'
+            )
+        if created_from:
+            query = query.gte('created_at', created_from)
+        if created_to:
+            query = query.lt('created_at', created_to)
+        return query
+
+    def list_entries(self, columns=None, limit=50, after=None, created_from=None, created_to=None, emotions=None):
+        columns = _checked_columns(columns, ENTRY_FIELDS)
+        query = self._page(self._entries().select(', '.join(columns)), limit, after, created_from, created_to)
+        if emotions:
+            query = query.in_('emotion_label', list(emotions))
+        return query.execute().data
+
+    def get_entry(self, entry_id, columns=None):
+        columns = _checked_columns(columns, ENTRY_FIELDS)
+        response = self._entries().select(', '.join(columns)).eq('id', entry_id).limit(1).execute()
+        return response.data[0] if response.data else None
+
+    def insert_entry(self, data):
+        response = self._entries().insert(data).execute()
+        return response.data[0] if response.data else dict(data)
+
+    def insert_entries(self, rows):
+        # A bulk insert needs the same keys on every row, so stamp missing times here
+        rows = [dict(row, created_at=row.get('created_at') or utc_now_iso()) for row in rows]
+        if not rows:
+            return []
+        return self._entries().insert(rows).execute().data or rows
+
+    def update_entry(self, entry_id, data):
+        response = self._entries().update(data).eq('id', entry_id).execute()
+        return response.data[0] if response.data else None
+
+    def delete_entry(self, entry_id):
+        # PostgREST returns the deleted representation
+        response = self._entries().delete().eq('id', entry_id).execute()
+        return response.data[0] if response.data else None
+
+    def count_entries(self):
+        return self._entries().select('id', count='exact').limit(1).execute().count
+
+    def list_entry_changes(self, since=0, limit=500, columns=None):
+        # Change log and function from supabase/changes.sql
+        columns = _checked_columns(columns, ENTRY_FIELDS)
+        rows = self.client.rpc('journal_entry_changes_since', {
+            'since': since,
+            'result_limit': limit,
+        }).execute().data or []
+        return [{
+            'seq': row['seq'],
+            'id': row['entry_id'],
+            'entry': {column: row['entry'].get(column) for column in columns} if row.get('entry') else None,
+        } for row in rows]
+
+    def entry_changes_cursor(self):
+        response = self.client.table('journal_entry_changes').select('seq') \
+            .order('seq', desc=True).limit(1).execute()
+        return response.data[0]['seq'] if response.data else 0
+
+    def _version_row(self, scope):
+        # Counters kept by the triggers in supabase/payments.sql
+        try:
+            response = self.client.table('data_versions').select('version').eq('scope', scope).execute()
+        except Exception as e:
+            print(f"Data version for {scope} unavailable: {e}")
+            return None
+        return response.data[0]['version'] if response.data else None
+
+    def data_version(self, scope):
+        if scope == 'entries':
+            return self.entry_changes_cursor()
+        return self._version_row(scope)
+
+    def mood_rollups(self, granularity, low='', high='9999', buckets=None):
+        # Table and functions from supabase/stats.sql
+        return self.client.rpc('mood_rollup_rows', {
+            'rollup': granularity,
+            'low': low,
+            'high': high,
+            'bucket_limit': buckets,
+        }).execute().data or []
+
+    def rebuild_mood_stats(self):
+        # Also moves the 'stats' data version
+        return self.client.rpc('rebuild_mood_stats', {}).execute().data or 0
+
+    def entry_label_totals(self):
+        return self.client.rpc('journal_entry_label_totals', {}).execute().data or []
+
+    def data_epoch(self):
+        # Read once per process; a failed read is retried by the next request
+        if self._epoch is None:
+            epoch = self._version_row('_epoch')
+            if epoch is None:
+                return ''
+            self._epoch = format(epoch, 'x')
+        return self._epoch
+
+    def search_entries(self, terms, limit=20, offset=0, created_from=None, created_to=None, emotions=None):
+        # Postgres full-text search via the function in supabase/search.sql
+        return self.client.rpc('search_journal_entries', {
+            'query': tsquery(terms),
+            'emotions': list(emotions) if emotions else None,
+            'created_from': created_from,
+            'created_to': created_to,
+            'result_limit': limit,
+            'result_offset': offset,
+            'mark_start': MARK_START,
+            'mark_end': MARK_END,
+        }).execute().data
+
+    def insert_payment(self, data):
+        response = self.client.table('payments').insert(data).execute()
+        return response.data[0] if response.data else dict(data)
+
+    def insert_payment_once(self, data):
+        # Needs the unique index from supabase/payments.sql; a duplicate comes back empty
+        response = self.client.table('payments') \
+            .upsert(data, on_conflict='idempotency_key', ignore_duplicates=True).execute()
+        if response.data:
+            return response.data[0], True
+        existing = self.client.table('payments').select('*') \
+            .eq('idempotency_key', data['idempotency_key']).limit(1).execute()
+        return existing.data[0], False
+
+    def get_payment(self, payment_id):
+        response = self.client.table('payments').select('*').eq('id', payment_id).limit(1).execute()
+        return response.data[0] if response.data else None
+
+    def update_payment(self, payment_id, data):
+        response = self.client.table('payments').update(data).eq('id', payment_id).execute()
+        return response.data[0] if response.data else None
+
+    def update_payment_by_intasend_id(self, intasend_payment_id, data):
+        response = self.client.table('payments').update(data) \
+            .eq('intasend_payment_id', intasend_payment_id).execute()
+        return response.data or []
+
+    def update_payments(self, payment_ids, data, status=None):
+        if not payment_ids:
+            return 0
+        query = self.client.table('payments').update(data).in_('id', list(payment_ids))
+        if status:
+            query = query.eq('status', status)
+        return len(query.execute().data or [])
+
+    def list_payments(self, limit=None, after=None, created_from=None, created_to=None, status=None):
+        query = self._page(self.client.table('payments').select('*'), limit, after, created_from, created_to)
+        if status:
+            query = query.eq('status', status)
+        return query.execute().data
+
+
+class SQLiteStorage(JournalStorage):
+    """Local SQLite backend (WAL mode, one connection per thread)"""
+
+    name = 'sqlite'
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS journal_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            content TEXT NOT NULL,
+            sentiment_score REAL,
+            emotion_label TEXT,
+            ai_provider TEXT,
+            detailed_analysis TEXT,
+            created_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_journal_entries_created ON journal_entries (created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_journal_entries_emotion ON journal_entries (emotion_label);
+
+        CREATE TABLE IF NOT EXISTS payments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            plan_type TEXT NOT NULL,
+            amount REAL NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            intasend_payment_id TEXT,
+            created_at TEXT NOT NULL,
+            idempotency_key TEXT,
+            payment_url TEXT,
+            error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_payments_intasend ON payments (intasend_payment_id);
+        CREATE INDEX IF NOT EXISTS idx_payments_created ON payments (created_at);
+
+        -- Write counters for conditional GETs, moved in the same transaction as the write
+        CREATE TABLE IF NOT EXISTS data_versions (
+            scope TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO data_versions (scope, version) VALUES ('_epoch', abs(random()) % 4294967296);
+        INSERT OR IGNORE INTO data_versions (scope, version) VALUES ('payments', 0);
+        CREATE TRIGGER IF NOT EXISTS payments_version_insert AFTER INSERT ON payments BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE scope = 'payments';
+        END;
+        CREATE TRIGGER IF NOT EXISTS payments_version_update AFTER UPDATE ON payments BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE scope = 'payments';
+        END;
+        CREATE TRIGGER IF NOT EXISTS payments_version_delete AFTER DELETE ON payments BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE scope = 'payments';
+        END;
+    '''
+
+    # Columns added after the first release, for databases created before them
+    ADDED_COLUMNS = {
+        'payments': {'idempotency_key': 'TEXT', 'payment_url': 'TEXT', 'error': 'TEXT'},
+    }
+
+    # FTS5 index over entry content, kept in sync by triggers
+    SEARCH_SCHEMA = '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS journal_entries_fts USING fts5(
+            content, content='journal_entries', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER IF NOT EXISTS journal_entries_fts_insert AFTER INSERT ON journal_entries BEGIN
+            INSERT INTO journal_entries_fts (rowid, content) VALUES (new.id, new.content);
+        END;
+        CREATE TRIGGER IF NOT EXISTS journal_entries_fts_delete AFTER DELETE ON journal_entries BEGIN
+            INSERT INTO journal_entries_fts (journal_entries_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END;
+        CREATE TRIGGER IF NOT EXISTS journal_entries_fts_update AFTER UPDATE OF content ON journal_entries BEGIN
+            INSERT INTO journal_entries_fts (journal_entries_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO journal_entries_fts (rowid, content) VALUES (new.id, new.content);
+        END;
+    '''
+
+    # Latest change per entry for the delta-sync feed, kept by triggers. Writes
+    # are serialized by BEGIN IMMEDIATE, so seq follows commit order.
+    CHANGES_SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS journal_entry_changes (
+            entry_id INTEGER PRIMARY KEY,
+            seq INTEGER NOT NULL,
+            deleted INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_journal_entry_changes_seq ON journal_entry_changes (seq);
+        CREATE TRIGGER IF NOT EXISTS journal_entries_changes_insert AFTER INSERT ON journal_entries BEGIN
+            INSERT OR REPLACE INTO journal_entry_changes (entry_id, seq, deleted)
+            VALUES (new.id, (SELECT COALESCE(MAX(seq), 0) + 1 FROM journal_entry_changes), 0);
+        END;
+        CREATE TRIGGER IF NOT EXISTS journal_entries_changes_update AFTER UPDATE ON journal_entries BEGIN
+            INSERT OR REPLACE INTO journal_entry_changes (entry_id, seq, deleted)
+            VALUES (new.id, (SELECT COALESCE(MAX(seq), 0) + 1 FROM journal_entry_changes), 0);
+        END;
+        CREATE TRIGGER IF NOT EXISTS journal_entries_changes_delete AFTER DELETE ON journal_entries BEGIN
+            INSERT OR REPLACE INTO journal_entry_changes (entry_id, seq, deleted)
+            VALUES (old.id, (SELECT COALESCE(MAX(seq), 0) + 1 FROM journal_entry_changes), 1);
+        END;
+    '''
+
+    @staticmethod
+    def _rollup_keys(source):
+        """(granularity, bucket, emotion, score) of each rollup every row of ``source`` counts in"""
+        return f'''
+            SELECT g.granularity AS granularity,
+                   CASE g.granularity WHEN 'all' THEN '' WHEN 'day' THEN e.day
+                        WHEN 'week' THEN date(e.day, '-6 days', 'weekday 1')
+                        ELSE strftime('%Y-%m', e.day) END AS bucket,
+                   e.emotion AS emotion, e.score AS score
+            FROM (SELECT COALESCE(date(created_at), date('now')) AS day,
+                         COALESCE(NULLIF(emotion_label, ''), 'neutral') AS emotion,
+                         COALESCE(CAST(sentiment_score AS REAL), 0.5) AS score
+                  FROM {source}) e
+            CROSS JOIN (SELECT 'all' AS granularity UNION ALL SELECT 'day'
+                        UNION ALL SELECT 'week' UNION ALL SELECT 'month') g
+        '''
+
+    def _stats_schema(self):
+        """
+        Mood aggregates for /api/stats and the trend chart, kept by triggers in
+        the same transaction as every entry write
+        """
+        new = self._rollup_keys('(SELECT new.created_at AS created_at, new.emotion_label AS emotion_label, '
+                                'new.sentiment_score AS sentiment_score)')
+        old = self._rollup_keys('(SELECT old.created_at AS created_at, old.emotion_label AS emotion_label, '
+                                'old.sentiment_score AS sentiment_score)')
+        add = f'''
+            INSERT INTO mood_rollups (granularity, bucket, emotion, count, score_sum)
+            SELECT granularity, bucket, emotion, 1, score FROM ({new}) WHERE true
+            ON CONFLICT (granularity, bucket, emotion) DO UPDATE SET
+                count = count + 1,
+                score_sum = score_sum + excluded.score_sum;
+        '''
+        remove = f'''
+            UPDATE mood_rollups SET count = count - 1, score_sum = score_sum - COALESCE(CAST(old.sentiment_score AS REAL), 0.5)
+            WHERE (granularity, bucket, emotion) IN (SELECT granularity, bucket, emotion FROM ({old}));
+            DELETE FROM mood_rollups
+            WHERE count <= 0 AND (granularity, bucket, emotion) IN (SELECT granularity, bucket, emotion FROM ({old}));
+        '''
+        return f'''
+            CREATE TABLE IF NOT EXISTS mood_rollups (
+                granularity TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                emotion TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                score_sum REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (granularity, bucket, emotion)
+            );
+            -- Moved by rebuilds, which change the numbers without an entry write
+            INSERT OR IGNORE INTO data_versions (scope, version) VALUES ('stats', 0);
+            -- Replaced on every start so databases pick up trigger changes; one
+            -- transaction, so no write slips through without them
+            BEGIN IMMEDIATE;
+            DROP TRIGGER IF EXISTS journal_entries_stats_insert;
+            DROP TRIGGER IF EXISTS journal_entries_stats_update;
+            DROP TRIGGER IF EXISTS journal_entries_stats_delete;
+            CREATE TRIGGER journal_entries_stats_insert AFTER INSERT ON journal_entries BEGIN
+                {add}
+            END;
+            CREATE TRIGGER journal_entries_stats_update
+            AFTER UPDATE OF emotion_label, sentiment_score, created_at ON journal_entries BEGIN
+                {remove}
+                {add}
+            END;
+            CREATE TRIGGER journal_entries_stats_delete AFTER DELETE ON journal_entries BEGIN
+                {remove}
+            END;
+            COMMIT;
+        '''
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._epoch = None
+        # executescript manages its own transaction
+        self._conn().executescript(self.SCHEMA)
+        self._add_missing_columns()
+        self._create_change_log()
+        self._create_mood_stats()
+        self.full_text = self._create_search_index()
+
+    def _add_missing_columns(self):
+        conn = self._conn()
+        for table, columns in self.ADDED_COLUMNS.items():
+            existing = {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+            for column, kind in columns.items():
+                if column not in existing:
+                    conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {kind}')
+        # Indexes on added columns can only be created once they exist
+        conn.execute(
+            'CREATE UNIQUE INDEX IF NOT EXISTS idx_payments_idempotency_key ON payments (idempotency_key)'
+        )
+
+    def _create_change_log(self):
+        conn = self._conn()
+        existed = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'journal_entry_changes'"
+        ).fetchone() is not None
+        conn.executescript(self.CHANGES_SCHEMA)
+        if not existed:
+            # Entries written before the log existed count as changes in id order
+            conn.execute('INSERT INTO journal_entry_changes (entry_id, seq) SELECT id, id FROM journal_entries')
+
+    def _create_mood_stats(self):
+        conn = self._conn()
+        existed = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'mood_rollups'"
+        ).fetchone() is not None
+        conn.executescript(self._stats_schema())
+        # Scores stored as text by triggers that did not cast them yet
+        poisoned = existed and conn.execute(
+            "SELECT 1 FROM mood_rollups WHERE typeof(score_sum) NOT IN ('real', 'integer') LIMIT 1"
+        ).fetchone() is not None
+        if not existed or poisoned:
+            # Count entries written before the aggregates existed
+            self.rebuild_mood_stats()
+
+    def _create_search_index(self):
+        conn = self._conn()
+        existed = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'journal_entries_fts'"
+        ).fetchone() is not None
+        try:
+            conn.executescript(self.SEARCH_SCHEMA)
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ SQLite FTS5 unavailable ({e}); search will scan entries")
+            return False
+        if not existed:
+            # Index entries written before the index existed
+            conn.execute("INSERT INTO journal_entries_fts (journal_entries_fts) VALUES ('rebuild')")
+        return True
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None: transactions are opened explicitly below;
+            # cached_statements keeps the fixed SQL below compiled per connection
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
+
+    @staticmethod
+    def _row(row):
+        return dict(row) if row is not None else None
+
+    def _insert(self, conn, table, data, allowed):
+        data = dict(data)
+        data.setdefault('created_at', utc_now_iso())
+        columns = _checked_columns(data.keys(), allowed)
+        cursor = conn.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [data[column] for column in columns]
+        )
+        return self._row(conn.execute(f'SELECT * FROM {table} WHERE id = ?', (cursor.lastrowid,)).fetchone())
+
+    def _update(self, conn, table, key, value, data, allowed):
+        columns = _checked_columns(data.keys(), allowed)
+        conn.execute(
+            f"UPDATE {table} SET {', '.join(f'{column} = ?' for column in columns)} WHERE {key} = ?",
+            [data[column] for column in columns] + [value]
+        )
+        return [self._row(row) for row in conn.execute(f'SELECT * FROM {table} WHERE {key} = ?', (value,))]
+
+    def _page(self, table, columns, limit, after, created_from, created_to, where=(), params=()):
+        where, params = list(where), list(params)
+        if after:
+            where.append('(created_at, id) < (?, ?)')
+            params.extend([after[0], int(after[1])])
+        if created_from:
+            where.append('created_at >= ?')
+            params.append(created_from)
+        if created_to:
+            where.append('created_at < ?')
+            params.append(created_to)
+        sql = f"SELECT {', '.join(columns)} FROM {table}"
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+        params.append(limit if limit is not None else -1)
+        return [dict(row) for row in self._conn().execute(sql, params)]
+
+    def list_entries(self, columns=None, limit=50, after=None, created_from=None, created_to=None, emotions=None):
+        columns = _checked_columns(columns, ENTRY_FIELDS)
+        where, params = [], []
+        if emotions:
+            emotions = list(emotions)
+            where.append(f"emotion_label IN ({', '.join('?' * len(emotions))})")
+            params.extend(emotions)
+        return self._page('journal_entries', columns, limit, after, created_from, created_to, where, params)
+
+    def get_entry(self, entry_id, columns=None):
+        columns = _checked_columns(columns, ENTRY_FIELDS)
+        row = self._conn().execute(
+            f"SELECT {', '.join(columns)} FROM journal_entries WHERE id = ?", (entry_id,)
+        ).fetchone()
+        return self._row(row)
+
+    def insert_entry(self, data):
+        with self._transaction() as conn:
+            return self._insert(conn, 'journal_entries', data, ENTRY_FIELDS)
+
+    def insert_entries(self, rows):
+        stored = []
+        with self._transaction() as conn:
+            for row in rows:
+                row = dict(row, created_at=row.get('created_at') or utc_now_iso())
+                columns = _checked_columns(row.keys(), ENTRY_FIELDS)
+                cursor = conn.execute(
+                    f"INSERT INTO journal_entries ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    [row[column] for column in columns]
+                )
+                row['id'] = cursor.lastrowid
+                stored.append(row)
+        return stored
+
+    def update_entry(self, entry_id, data):
+        with self._transaction() as conn:
+            rows = self._update(conn, 'journal_entries', 'id', entry_id, data, ENTRY_FIELDS)
+        return rows[0] if rows else None
+
+    def delete_entry(self, entry_id):
+        with self._transaction() as conn:
+            row = conn.execute('SELECT * FROM journal_entries WHERE id = ?', (entry_id,)).fetchone()
+            conn.execute('DELETE FROM journal_entries WHERE id = ?', (entry_id,))
+        return self._row(row)
+
+    def count_entries(self):
+        return self._conn().execute('SELECT COUNT(*) FROM journal_entries').fetchone()[0]
+
+    def list_entry_changes(self, since=0, limit=500, columns=None):
+        columns = _checked_columns(columns, ENTRY_FIELDS)
+        rows = self._conn().execute(f'''
+            SELECT c.seq AS change_seq, c.entry_id AS change_id, e.id IS NOT NULL AS present,
+                   {', '.join(f'e.{column}' for column in columns)}
+            FROM journal_entry_changes c
+            LEFT JOIN journal_entries e ON e.id = c.entry_id
+            WHERE c.seq > ?
+            ORDER BY c.seq
+            LIMIT ?
+        ''', (since, limit))
+        return [{
+            'seq': row['change_seq'],
+            'id': row['change_id'],
+            'entry': {column: row[column] for column in columns} if row['present'] else None,
+        } for row in rows]
+
+    def entry_changes_cursor(self):
+        return self._conn().execute('SELECT COALESCE(MAX(seq), 0) FROM journal_entry_changes').fetchone()[0]
+
+    def mood_rollups(self, granularity, low='', high='9999', buckets=None):
+        rows = self._conn().execute('''
+            SELECT granularity, bucket, emotion, count, score_sum FROM mood_rollups
+            WHERE granularity = ? AND bucket IN (
+                SELECT DISTINCT bucket FROM mood_rollups
+                WHERE granularity = ? AND bucket >= ? AND bucket <= ?
+                ORDER BY bucket DESC LIMIT ?
+            )
+        ''', (granularity, granularity, low, high, buckets or -1))
+        return [dict(row) for row in rows]
+
+    def rebuild_mood_stats(self):
+        with self._transaction() as conn:
+            conn.execute("UPDATE data_versions SET version = version + 1 WHERE scope = 'stats'")
+            conn.execute('DELETE FROM mood_rollups')
+            conn.execute(f'''
+                INSERT INTO mood_rollups (granularity, bucket, emotion, count, score_sum)
+                SELECT granularity, bucket, emotion, COUNT(*), SUM(score)
+                FROM ({self._rollup_keys('journal_entries')})
+                GROUP BY granularity, bucket, emotion
+            ''')
+            return conn.execute(
+                "SELECT COALESCE(SUM(count), 0) FROM mood_rollups WHERE granularity = 'all'"
+            ).fetchone()[0]
+
+    def entry_label_totals(self):
+        rows = self._conn().execute(f'''
+            SELECT emotion, COUNT(*) AS count, SUM(score) AS score_sum
+            FROM ({self._rollup_keys('journal_entries')}) WHERE granularity = 'all'
+            GROUP BY emotion
+        ''')
+        return [dict(row) for row in rows]
+
+    def data_version(self, scope):
+        if scope == 'entries':
+            return self.entry_changes_cursor()
+        row = self._conn().execute('SELECT version FROM data_versions WHERE scope = ?', (scope,)).fetchone()
+        return row[0] if row else None
+
+    def data_epoch(self):
+        # Fixed when the database is created, so read once per process
+        if self._epoch is None:
+            row = self._conn().execute("SELECT version FROM data_versions WHERE scope = '_epoch'").fetchone()
+            self._epoch = format(row[0], 'x')
+        return self._epoch
+
+    def search_entries(self, terms, limit=20, offset=0, created_from=None, created_to=None, emotions=None):
+        columns = ', '.join(f'e.{column}' for column in ENTRY_FIELDS)
+        where, params = [], []
+        if emotions:
+            emotions = list(emotions)
+            where.append(f"e.emotion_label IN ({', '.join('?' * len(emotions))})")
+            params.extend(emotions)
+        if created_from:
+            where.append('e.created_at >= ?')
+            params.append(created_from)
+        if created_to:
+            where.append('e.created_at < ?')
+            params.append(created_to)
+
+        if not self.full_text:
+            for words in terms:
+                where.append('e.content LIKE ?')
+                params.append('%' + ' '.join(words) + '%')
+            rows = self._conn().execute(
+                f"SELECT {columns}, 0.0 AS rank, NULL AS snippet FROM journal_entries e "
+                f"WHERE {' AND '.join(where)} ORDER BY e.created_at DESC, e.id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            )
+            return [dict(row) for row in rows]
+
+        match = fts5_query(terms)
+        # Rank and page on the index first; snippets are only built for the page
+        join = 'JOIN journal_entries e ON e.id = f.rowid' if where else ''
+        rows = self._conn().execute(f'''
+            WITH hits AS (
+                SELECT f.rowid AS id, f.rank AS score FROM journal_entries_fts f {join}
+                WHERE journal_entries_fts MATCH ? {''.join(' AND ' + clause for clause in where)}
+                ORDER BY f.rank, f.rowid DESC LIMIT ? OFFSET ?
+            )
+            SELECT {columns}, -hits.score AS rank,
+                   snippet(journal_entries_fts, 0, ?, ?, '…', 16) AS snippet
+            FROM hits
+            JOIN journal_entries_fts ON journal_entries_fts.rowid = hits.id
+            JOIN journal_entries e ON e.id = hits.id
+            WHERE journal_entries_fts MATCH ?
+            ORDER BY hits.score, hits.id DESC
+        ''', [match] + params + [limit, offset, MARK_START, MARK_END, match])
+        return [dict(row) for row in rows]
+
+    def insert_payment(self, data):
+        with self._transaction() as conn:
+            return self._insert(conn, 'payments', data, PAYMENT_FIELDS)
+
+    def insert_payment_once(self, data):
+        # BEGIN IMMEDIATE serializes writers, so the lookup and insert cannot interleave
+        with self._transaction() as conn:
+            row = conn.execute(
+                'SELECT * FROM payments WHERE idempotency_key = ?', (data['idempotency_key'],)
+            ).fetchone()
+            if row is not None:
+                return self._row(row), False
+            return self._insert(conn, 'payments', data, PAYMENT_FIELDS), True
+
+    def get_payment(self, payment_id):
+        return self._row(self._conn().execute('SELECT * FROM payments WHERE id = ?', (payment_id,)).fetchone())
+
+    def update_payment(self, payment_id, data):
+        with self._transaction() as conn:
+            rows = self._update(conn, 'payments', 'id', payment_id, data, PAYMENT_FIELDS)
+        return rows[0] if rows else None
+
+    def update_payment_by_intasend_id(self, intasend_payment_id, data):
+        with self._transaction() as conn:
+            return self._update(conn, 'payments', 'intasend_payment_id', intasend_payment_id, data, PAYMENT_FIELDS)
+
+    def update_payments(self, payment_ids, data, status=None):
+        payment_ids = list(payment_ids)
+        if not payment_ids:
+            return 0
+        columns = _checked_columns(data.keys(), PAYMENT_FIELDS)
+        sql = (f"UPDATE payments SET {', '.join(f'{column} = ?' for column in columns)} "
+               f"WHERE id IN ({', '.join('?' * len(payment_ids))})")
+        params = [data[column] for column in columns] + payment_ids
+        if status:
+            sql += ' AND status = ?'
+            params.append(status)
+        with self._transaction() as conn:
+            return conn.execute(sql, params).rowcount
+
+    def list_payments(self, limit=None, after=None, created_from=None, created_to=None, status=None):
+        where, params = (['status = ?'], [status]) if status else ([], [])
+        return self._page('payments', PAYMENT_FIELDS, limit, after, created_from, created_to, where, params)
+
+
+class InstrumentedStorage:
+    """
+    Wraps a storage backend and reports the duration of every call as
+    ``observer(backend, operation, seconds, error)``.
+    """
+
+    def __init__(self, storage, observer):
+        self._storage = storage
+        self._observer = observer
+        self.name = storage.name
+
+    # Page walks go back through this wrapper so each page is timed
+    iter_entries = JournalStorage.iter_entries
+    iter_payments = JournalStorage.iter_payments
+
+    def __getattr__(self, attribute):
+        target = getattr(self._storage, attribute)
+        if not callable(target) or attribute.startswith('_'):
+            return target
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            error = None
+            try:
+                return target(*args, **kwargs)
+            except Exception as e:
+                error = type(e).__name__
+                raise
+            finally:
+                try:
+                    self._observer(self.name, attribute, time.perf_counter() - started, error)
+                except Exception as e:
+                    print(f"Error recording storage metrics: {e}")
+
+        return timed
+
+
+def create_storage(backend=None, supabase_client=None, sqlite_path=None):
+    """
+    Pick a backend: ``backend`` may be 'supabase', 'sqlite' or None/'auto'
+    (Supabase when a client is configured, SQLite otherwise).
+    """
+    backend = (backend or 'auto').lower()
+    if backend == 'supabase' or (backend == 'auto' and supabase_client is not None):
+        if supabase_client is None:
+            raise RuntimeError('STORAGE_BACKEND=supabase but Supabase credentials are missing')
+        return SupabaseStorage(supabase_client)
+    if backend in ('sqlite', 'auto'):
+        return SQLiteStorage(sqlite_path)
+    raise ValueError(f'Unknown storage backend: {backend}')
+
+
+def connect_supabase(url=None, key=None):
+    """
+    Supabase client from SUPABASE_URL / SUPABASE_ANON_KEY, or None when they
+    are not set. The supabase package is imported here because it is slow to
+    import and SQLite deployments never need it.
+    """
+    url = url or os.getenv('SUPABASE_URL')
+    key = key or os.getenv('SUPABASE_ANON_KEY')
+    if not (url and key):
+        return None
+    from supabase import create_client
+    return create_client(url, key)
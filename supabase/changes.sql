@@ -0,0 +1,63 @@
+-- Change log for delta sync (GET /api/entries/changes on the Supabase backend).
+-- Run once in the Supabase SQL editor.
+
+-- Latest change per entry; a deleted entry keeps its row as a tombstone
+create table if not exists journal_entry_changes (
+    entry_id bigint primary key,
+    seq bigint not null,
+    deleted boolean not null default false
+);
+
+create sequence if not exists journal_entry_changes_seq;
+
+create unique index if not exists idx_journal_entry_changes_seq
+    on journal_entry_changes (seq);
+
+create or replace function record_journal_entry_change()
+returns trigger
+language plpgsql
+as $$
+declare
+    changed_id bigint := case when tg_op = 'DELETE' then old.id else new.id end;
+begin
+    -- Sequence values are handed out before commit, so two concurrent writers
+    -- could commit out of order and a client holding the higher number would
+    -- never see the other change. Entry writers take turns instead.
+    perform pg_advisory_xact_lock(hashtext('journal_entry_changes'));
+    insert into journal_entry_changes (entry_id, seq, deleted)
+    values (changed_id, nextval('journal_entry_changes_seq'), tg_op = 'DELETE')
+    on conflict (entry_id) do update set seq = excluded.seq, deleted = excluded.deleted;
+    return null;
+end;
+$$;
+
+drop trigger if exists journal_entries_changes on journal_entries;
+create trigger journal_entries_changes
+    after insert or update or delete on journal_entries
+    for each row execute function record_journal_entry_change();
+
+-- Entries written before the log existed count as changes in id order
+insert into journal_entry_changes (entry_id, seq)
+select id, nextval('journal_entry_changes_seq') from (select id from journal_entries order by id) e
+on conflict (entry_id) do nothing;
+
+-- Changes after since, oldest first; entry is null for deleted entries
+create or replace function journal_entry_changes_since(
+    since bigint default 0,
+    result_limit int default 500
+)
+returns table (
+    seq bigint,
+    entry_id bigint,
+    entry jsonb
+)
+language sql stable
+as $$
+    select c.seq, c.entry_id,
+           case when e.id is null then null else to_jsonb(e) - 'content_tsv' end
+    from journal_entry_changes c
+    left join journal_entries e on e.id = c.entry_id
+    where c.seq > since
+    order by c.seq
+    limit result_limit;
+$$;
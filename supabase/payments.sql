@@ -0,0 +1,37 @@
+-- Payment outbox columns (POST /api/payment/initiate on the Supabase backend).
+-- Run once in the Supabase SQL editor.
+
+-- idempotency_key: sent by the client, so repeated clicks map to one payment
+-- payment_url/error: filled in by the checkout worker
+alter table payments
+    add column if not exists idempotency_key text,
+    add column if not exists payment_url text,
+    add column if not exists error text;
+
+-- Also the conflict target of the upsert in SupabaseStorage.insert_payment_once
+create unique index if not exists idx_payments_idempotency_key
+    on payments (idempotency_key);
+
+-- Write counters behind the ETags of GET /api/payments. The trigger moves
+-- the counter in the same transaction as the write, so every app host sees
+-- the change; '_epoch' tells a recreated database apart from the old one.
+create table if not exists data_versions (
+    scope text primary key,
+    version bigint not null
+);
+insert into data_versions (scope, version)
+    values ('_epoch', floor(random() * 4294967296)::bigint), ('payments', 0)
+    on conflict (scope) do nothing;
+
+create or replace function bump_payments_version() returns trigger
+language plpgsql as $$
+begin
+    update data_versions set version = version + 1 where scope = 'payments';
+    return null;
+end;
+$$;
+
+drop trigger if exists payments_version on payments;
+create trigger payments_version
+    after insert or update or delete on payments
+    for each statement execute function bump_payments_version();
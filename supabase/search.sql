@@ -0,0 +1,53 @@
+-- Full-text search for journal entries (GET /api/entries/search on the Supabase backend).
+-- Run once in the Supabase SQL editor.
+
+-- Indexed document: the 'simple' configuration matches the SQLite FTS5 tokenizer (no stemming)
+alter table journal_entries
+    add column if not exists content_tsv tsvector
+    generated always as (to_tsvector('simple', coalesce(content, ''))) stored;
+
+create index if not exists idx_journal_entries_content_tsv
+    on journal_entries using gin (content_tsv);
+
+-- query is a to_tsquery string built by search.tsquery(), e.g. 'work:* & stress:*'
+create or replace function search_journal_entries(
+    query text,
+    emotions text[] default null,
+    created_from timestamptz default null,
+    created_to timestamptz default null,
+    result_limit int default 20,
+    result_offset int default 0,
+    mark_start text default '<mark>',
+    mark_end text default '</mark>'
+)
+returns table (
+    id bigint,
+    content text,
+    sentiment_score double precision,
+    emotion_label text,
+    ai_provider text,
+    detailed_analysis text,
+    created_at timestamptz,
+    rank real,
+    snippet text
+)
+language sql stable
+as $$
+    with matches as (
+        select e.*, ts_rank_cd(e.content_tsv, q) as rank, q
+        from journal_entries e, to_tsquery('simple', query) q
+        where e.content_tsv @@ q
+          and (emotions is null or e.emotion_label = any(emotions))
+          and (created_from is null or e.created_at >= created_from)
+          and (created_to is null or e.created_at < created_to)
+        order by rank desc, e.created_at desc
+        limit result_limit offset result_offset
+    )
+    -- Snippets are only built for the returned page
+    select m.id, m.content, m.sentiment_score::double precision, m.emotion_label, m.ai_provider,
+           m.detailed_analysis, m.created_at, m.rank,
+           ts_headline('simple', m.content, m.q,
+                       'StartSel=' || mark_start || ', StopSel=' || mark_end || ', MaxWords=32, MinWords=12')
+    from matches m
+    order by m.rank desc, m.created_at desc;
+$$;
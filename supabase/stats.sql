@@ -0,0 +1,118 @@
+-- Mood statistics (GET /api/stats and /api/stats/trends on the Supabase backend).
+-- Run once in the Supabase SQL editor, after payments.sql (data_versions).
+
+-- Count and score sum per emotion: overall ('all', bucket '') and per UTC
+-- day, week (its Monday) and month ('YYYY-MM')
+create table if not exists mood_rollups (
+    granularity text not null,
+    bucket text not null,
+    emotion text not null,
+    count bigint not null default 0,
+    score_sum double precision not null default 0,
+    primary key (granularity, bucket, emotion)
+);
+
+-- Moved by rebuilds, which change the numbers without an entry write
+insert into data_versions (scope, version) values ('stats', 0)
+    on conflict (scope) do nothing;
+
+-- (granularity, bucket) of each rollup an entry written at stamp counts in
+create or replace function mood_rollup_keys(stamp timestamptz)
+returns table (granularity text, bucket text)
+language sql immutable
+as $$
+    select * from (values
+        ('all', ''),
+        ('day', to_char(stamp at time zone 'utc', 'YYYY-MM-DD')),
+        ('week', to_char(date_trunc('week', stamp at time zone 'utc'), 'YYYY-MM-DD')),
+        ('month', to_char(stamp at time zone 'utc', 'YYYY-MM'))
+    ) k (granularity, bucket);
+$$;
+
+create or replace function apply_mood_rollups(stamp timestamptz, label text, score double precision, sign int)
+returns void
+language sql
+as $$
+    insert into mood_rollups as r (granularity, bucket, emotion, count, score_sum)
+    select k.granularity, k.bucket, coalesce(nullif(label, ''), 'neutral'), sign, sign * coalesce(score, 0.5)
+    from mood_rollup_keys(coalesce(stamp, now())) k
+    on conflict (granularity, bucket, emotion) do update set
+        count = r.count + excluded.count,
+        score_sum = r.score_sum + excluded.score_sum;
+    delete from mood_rollups r
+    using mood_rollup_keys(coalesce(stamp, now())) k
+    where r.granularity = k.granularity and r.bucket = k.bucket
+      and r.emotion = coalesce(nullif(label, ''), 'neutral') and r.count <= 0;
+$$;
+
+-- Runs in the same transaction as the entry write
+create or replace function record_mood_rollups()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform apply_mood_rollups(old.created_at, old.emotion_label, old.sentiment_score, -1);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform apply_mood_rollups(new.created_at, new.emotion_label, new.sentiment_score, 1);
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists journal_entries_stats on journal_entries;
+create trigger journal_entries_stats
+    after insert or delete or update of emotion_label, sentiment_score, created_at on journal_entries
+    for each row execute function record_mood_rollups();
+
+-- Recompute everything from journal_entries; returns the entry count
+create or replace function rebuild_mood_stats()
+returns bigint
+language plpgsql
+as $$
+begin
+    lock table mood_rollups in exclusive mode;
+    update data_versions set version = version + 1 where scope = 'stats';
+    delete from mood_rollups;
+    insert into mood_rollups (granularity, bucket, emotion, count, score_sum)
+    select k.granularity, k.bucket, coalesce(nullif(e.emotion_label, ''), 'neutral'),
+           count(*), sum(coalesce(e.sentiment_score, 0.5))
+    from journal_entries e
+    cross join lateral mood_rollup_keys(coalesce(e.created_at, now())) k
+    group by 1, 2, 3;
+    return (select coalesce(sum(count), 0) from mood_rollups where granularity = 'all');
+end;
+$$;
+
+-- Rows of the most recent bucket_limit buckets between low and high
+create or replace function mood_rollup_rows(
+    rollup text,
+    low text default '',
+    high text default '9999',
+    bucket_limit int default null
+)
+returns setof mood_rollups
+language sql stable
+as $$
+    select r.* from mood_rollups r
+    where r.granularity = rollup and r.bucket in (
+        select distinct bucket from mood_rollups
+        where granularity = rollup and bucket >= low and bucket <= high
+        order by bucket desc
+        limit bucket_limit
+    );
+$$;
+
+-- Per-emotion totals straight from journal_entries, to check the 'all' rollups against
+create or replace function journal_entry_label_totals()
+returns table (emotion text, count bigint, score_sum double precision)
+language sql stable
+as $$
+    select coalesce(nullif(emotion_label, ''), 'neutral'), count(*), sum(coalesce(sentiment_score, 0.5))
+    from journal_entries
+    group by 1;
+$$;
+
+-- Count entries written before the aggregates existed
+select rebuild_mood_stats();
@@ -0,0 +1,52 @@
+# Delta sync (GET /api/entries/changes) test script
+from app_under_test import load_app
+
+app = load_app()
+
+
+def test_changes_since_cursor():
+    print("🧪 Testing entry changes since a cursor...")
+    client = app.create_app(warm_up_on_start=False).test_client()
+    kept = app.storage.insert_entry({'content': 'Kept', 'emotion_label': 'happy', 'sentiment_score': 0.8})
+    edited = app.storage.insert_entry({'content': 'Edited', 'emotion_label': 'sad', 'sentiment_score': 0.4})
+    removed = app.storage.insert_entry({'content': 'Removed', 'emotion_label': 'fear', 'sentiment_score': 0.6})
+
+    cursor = client.get('/api/entries?limit=1').headers['X-Changes-Cursor']
+    created = client.post('/api/entries', json={'content': 'Written after the sync',
+                                                'emotion_label': 'happy', 'sentiment_score': 0.9}).get_json()
+    app.storage.update_entry(edited['id'], {'emotion_label': 'angry'})
+    assert client.delete(f"/api/entries/{removed['id']}").status_code == 200
+
+    body = client.get(f'/api/entries/changes?since={cursor}').get_json()
+    changed = {entry['id']: entry for entry in body['changes']}
+    assert set(changed) == {created['id'], edited['id']}
+    assert changed[edited['id']]['emotion_label'] == 'angry'
+    assert body['deleted'] == [removed['id']]
+    assert kept['id'] not in changed
+    assert body['has_more'] is False
+
+    # Paging: the cursor of each page picks up where it stopped
+    first = client.get(f'/api/entries/changes?since={cursor}&limit=2').get_json()
+    assert first['has_more'] is True
+    rest = client.get(f"/api/entries/changes?since={first['cursor']}").get_json()
+    assert len(first['changes']) + len(first['deleted']) == 2
+    assert {entry['id'] for entry in first['changes'] + rest['changes']} == set(changed)
+    assert rest['cursor'] == body['cursor']
+
+    # Nothing new since the last cursor
+    assert client.get(f"/api/entries/changes?since={body['cursor']}").get_json()['changes'] == []
+    print("✅ Creates, edits and deletes replayed in order")
+
+
+def test_bad_cursors():
+    print("🧪 Testing invalid change cursors...")
+    client = app.create_app(warm_up_on_start=False).test_client()
+    assert client.get('/api/entries/changes?since=nope').status_code == 400
+    future = app.storage.entry_changes_cursor() + 1000
+    assert client.get(f'/api/entries/changes?since={future}').status_code == 410
+    print("✅ Unknown cursors ask the client for a full reload")
+
+
+if __name__ == "__main__":
+    test_changes_since_cursor()
+    test_bad_cursors()
@@ -1,45 +1,57 @@
 # Database test script
-from app import app, db, JournalEntry
+import os
+import tempfile
+
+from storage import SQLiteStorage
 
 def test_database():
-    print("🧪 Testing Database Connection...")
+    print("🧪 Testing Local SQLite Storage...")
     
-    with app.app_context():
-        try:
-            # Test database connection
-            with db.engine.connect() as conn:
-                conn.execute(db.text("SELECT 1"))
-            print("✅ Database connection successful")
-            
-            # Test table creation
-            db.create_all()
-            print("✅ Tables created/verified")
-            
-            # Test inserting a record
-            test_entry = JournalEntry(
-                content="Test entry",
-                sentiment_score=0.8,
-                emotion_label="positive",
-                ai_provider="test",
-                detailed_analysis="Test analysis"
-            )
-            db.session.add(test_entry)
-            db.session.commit()
-            print("✅ Test entry inserted successfully")
-            
-            # Test querying
-            entries = JournalEntry.query.all()
-            print(f"✅ Retrieved {len(entries)} entries from database")
-            
-            # Clean up test entry
-            db.session.delete(test_entry)
-            db.session.commit()
-            print("✅ Test entry cleaned up")
-            
-        except Exception as e:
-            print(f"❌ Database error: {e}")
-            import traceback
-            traceback.print_exc()
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, 'mood_journal.db'))
+        
+        # Test WAL mode
+        mode = storage._conn().execute('PRAGMA journal_mode').fetchone()[0]
+        assert mode == 'wal'
+        print("✅ Database opened in WAL mode")
+        
+        # Test inserting a record
+        entry = storage.insert_entry({
+            'content': "Test entry",
+            'sentiment_score': 0.8,
+            'emotion_label': "positive",
+            'ai_provider': "test",
+            'detailed_analysis': "Test analysis"
+        })
+        assert entry['id'] and entry['created_at']
+        print("✅ Test entry inserted successfully")
+        
+        # Test querying with keyset pagination
+        for i in range(5):
+            storage.insert_entry({'content': f'Entry {i}', 'sentiment_score': 0.5, 'emotion_label': 'neutral'})
+        first_page = storage.list_entries(limit=3)
+        last = first_page[-1]
+        second_page = storage.list_entries(limit=3, after=(last['created_at'], last['id']))
+        assert [e['id'] for e in first_page + second_page] == [6, 5, 4, 3, 2, 1]
+        assert storage.count_entries() == 6
+        print(f"✅ Retrieved {storage.count_entries()} entries across pages")
+        
+        # Test updating
+        updated = storage.update_entry(entry['id'], {'emotion_label': 'happy'})
+        assert updated['emotion_label'] == 'happy'
+        print("✅ Test entry updated")
+        
+        # Clean up test entry
+        deleted = storage.delete_entry(entry['id'])
+        assert deleted['id'] == entry['id'] and storage.get_entry(entry['id']) is None
+        print("✅ Test entry cleaned up")
+        
+        # Test payments
+        payment = storage.insert_payment({'plan_type': 'basic', 'amount': 5.99, 'status': 'pending'})
+        storage.update_payment(payment['id'], {'intasend_payment_id': 'demo_1'})
+        storage.update_payment_by_intasend_id('demo_1', {'status': 'completed'})
+        assert storage.list_payments()[0]['status'] == 'completed'
+        print("✅ Payment stored and updated")
 
 if __name__ == "__main__":
     test_database()
@@ -0,0 +1,140 @@
+# Hedged model dispatch test script
+import asyncio
+import threading
+import time
+
+from model_dispatch import CircuitBreaker, HedgedDispatcher
+from model_loading import ModelLoadScheduler
+from sentiment_providers import HuggingFaceProvider
+
+
+def answer(value, delay=0.0):
+    def call():
+        time.sleep(delay)
+        return value
+    return call
+
+
+def fail():
+    return None
+
+
+def test_priority_order():
+    print("🧪 Testing hedged dispatch priority...")
+    dispatcher = HedgedDispatcher(hedge_delay=0.05, timeout=2)
+    # The preferred model is slow but answers: its result wins over a faster hedge
+    key, result = dispatcher.dispatch([('a', answer('A', 0.2)), ('b', answer('B'))])
+    assert (key, result) == ('a', 'A')
+    # A failure moves on without waiting out the hedge delay
+    key, result = dispatcher.dispatch([('a', fail), ('b', answer('B'))])
+    assert (key, result) == ('b', 'B')
+    print("✅ Answers taken in priority order")
+
+
+def test_half_open_breaker_not_leaked():
+    print("🧪 Testing half-open breakers of models that never launch...")
+    dispatcher = HedgedDispatcher(hedge_delay=1, timeout=2, failure_threshold=1, cooldown=0)
+    dispatcher.dispatch([('b', fail)])
+    assert dispatcher.breaker_states()['b']['state'] == 'open'
+
+    # 'a' answers before 'b' would be hedged to, so 'b' never gets its trial call
+    for _ in range(3):
+        assert dispatcher.dispatch([('a', answer('A')), ('b', answer('B'))]) == ('a', 'A')
+    assert dispatcher.breaker_states()['b']['state'] != 'half_open'
+
+    # When 'a' fails, 'b' must still be tried
+    assert dispatcher.dispatch([('a', fail), ('b', answer('B'))]) == ('b', 'B')
+    assert dispatcher.breaker_states()['b']['state'] == 'closed'
+    print("✅ Half-open trial only taken by attempts that start")
+
+
+def test_cancelled_attempt_releases_trial():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.allow() and not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_queued_attempts_cancelled_after_deadline():
+    print("🧪 Testing attempts left over at the deadline...")
+    dispatcher = HedgedDispatcher(hedge_delay=0.01, timeout=0.1, max_workers=1)
+    started = []
+
+    def slow():
+        started.append(threading.current_thread().name)
+        time.sleep(0.3)
+        return None
+
+    began = time.monotonic()
+    assert dispatcher.dispatch([('a', slow), ('b', slow), ('c', slow)]) == (None, None)
+    assert time.monotonic() - began < 0.25
+    time.sleep(0.4)
+    # 'b' and 'c' were queued behind 'a' on the single worker and never ran
+    assert len(started) == 1
+    print("✅ Queued attempts cancelled instead of occupying the executor")
+
+
+def test_dispatch_async():
+    print("🧪 Testing async dispatch...")
+    dispatcher = HedgedDispatcher(hedge_delay=0.05, timeout=1, failure_threshold=1, cooldown=0)
+
+    def value(result, delay=0.0):
+        async def call():
+            await asyncio.sleep(delay)
+            return result
+        return call
+
+    async def run():
+        await dispatcher.dispatch_async([('b', value(None))])
+        assert await dispatcher.dispatch_async([('a', value('A')), ('b', value('B'))]) == ('a', 'A')
+        return await dispatcher.dispatch_async([('a', value(None)), ('b', value('B', 0.01))])
+
+    assert asyncio.run(run()) == ('b', 'B')
+    print("✅ Async dispatch tries half-open models that never launched before")
+
+
+class LoadingSessions:
+    """Hugging Face stand-in: model 'a' is loading for a minute, 'b' answers"""
+
+    class Response:
+        def __init__(self, status_code, body):
+            self.status_code = status_code
+            self.body = body
+
+        def json(self):
+            return self.body
+
+    def __init__(self):
+        self.calls = []
+
+    def post(self, url, **kwargs):
+        model = url.rsplit('/', 1)[-1]
+        self.calls.append(model)
+        if model == 'a':
+            return self.Response(503, {'error': 'Model a is currently loading', 'estimated_time': 60})
+        return self.Response(200, [[{'label': 'joy', 'score': 0.9}]])
+
+
+def test_loading_model_not_a_failure():
+    print("🧪 Testing breakers of loading models...")
+    sessions = LoadingSessions()
+    dispatcher = HedgedDispatcher(hedge_delay=1, timeout=2, failure_threshold=1, cooldown=30)
+    provider = HuggingFaceProvider(['a', 'b'], 'https://hf.test/models', sessions, dispatcher,
+                                   scheduler=ModelLoadScheduler(budget=1))
+    result = provider.analyze('A good day')
+    assert (result['model'], result['emotion_label']) == ('b', 'happy')
+    # The 503 says 'a' is loading, not broken: it is skipped until ready, never tripped
+    assert dispatcher.breaker_states()['a']['state'] == 'closed'
+    assert provider.analyze('Another day')['model'] == 'b'
+    assert sessions.calls == ['a', 'b', 'b']
+    print("✅ Loading models downgraded without opening their breaker")
+
+
+if __name__ == "__main__":
+    test_priority_order()
+    test_half_open_breaker_not_leaked()
+    test_cancelled_attempt_releases_trial()
+    test_queued_attempts_cancelled_after_deadline()
+    test_dispatch_async()
+    test_loading_model_not_a_failure()
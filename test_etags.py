@@ -0,0 +1,92 @@
+# Conditional GET test script
+import os
+
+from app_under_test import load_app
+from storage import SQLiteStorage
+
+app = load_app()
+
+
+def other_host():
+    """A second connection to the same database, as another worker or host would have"""
+    return SQLiteStorage(os.environ['SQLITE_DB_PATH'])
+
+
+def test_entries_etag_follows_any_writer():
+    print("🧪 Testing entry ETags against writes from another process...")
+    client = app.create_app(warm_up_on_start=False).test_client()
+    first = client.get('/api/entries')
+    etag = first.headers['ETag']
+    assert first.headers['X-Changes-Cursor']
+
+    repeat = client.get('/api/entries', headers={'If-None-Match': etag})
+    assert repeat.status_code == 304
+    # The client still learns where to resume the change feed
+    assert repeat.headers['X-Changes-Cursor'] == first.headers['X-Changes-Cursor']
+
+    other_host().insert_entry({'content': 'Written elsewhere', 'sentiment_score': 0.5, 'emotion_label': 'neutral'})
+    changed = client.get('/api/entries', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert int(changed.headers['X-Changes-Cursor']) > int(first.headers['X-Changes-Cursor'])
+    print("✅ Writes by any process change the entries ETag")
+
+
+def test_payments_version_kept_by_database():
+    print("🧪 Testing payment versions...")
+    storage = other_host()
+    before = storage.data_version('payments')
+    payment = storage.insert_payment({'plan_type': 'basic', 'amount': 5.99, 'status': 'pending'})
+    storage.update_payment(payment['id'], {'status': 'completed'})
+    assert storage.data_version('payments') == before + 2
+    # Every connection reads the same counter and epoch
+    assert other_host().data_version('payments') == before + 2
+    assert other_host().data_epoch() == storage.data_epoch()
+
+    client = app.create_app(warm_up_on_start=False).test_client()
+    etag = client.get('/api/payments').headers['ETag']
+    assert client.get('/api/payments', headers={'If-None-Match': etag}).status_code == 304
+    storage.update_payment(payment['id'], {'status': 'failed'})
+    assert client.get('/api/payments', headers={'If-None-Match': etag}).status_code == 200
+    print("✅ Payment ETags follow the database trigger")
+
+
+def test_epoch_read_once():
+    print("🧪 Testing data epoch reads...")
+    storage = other_host()
+    epoch = storage.data_epoch()
+    statements = []
+    storage._conn().set_trace_callback(statements.append)
+    try:
+        for _ in range(3):
+            assert storage.data_epoch() == epoch
+    finally:
+        storage._conn().set_trace_callback(None)
+    assert statements == []
+    print("✅ The epoch costs no query after the first")
+
+
+def test_unversioned_scope_not_conditional():
+    print("🧪 Testing backends without a version...")
+    real = app.storage
+
+    class Unversioned:
+        def __getattr__(self, name):
+            return getattr(real, name)
+
+        def data_version(self, scope):
+            return None
+
+    app.storage = Unversioned()
+    try:
+        response = app.create_app(warm_up_on_start=False).test_client().get('/api/payments')
+    finally:
+        app.storage = real
+    assert response.status_code == 200 and 'ETag' not in response.headers
+    print("✅ No ETag when the backend keeps no version")
+
+
+if __name__ == "__main__":
+    test_entries_etag_follows_any_writer()
+    test_payments_version_kept_by_database()
+    test_epoch_read_once()
+    test_unversioned_scope_not_conditional()
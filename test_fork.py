@@ -0,0 +1,42 @@
+# Pre-fork safety test script
+import os
+
+from app_under_test import load_app
+from resources import ProcessLocal, resolve
+
+app = load_app()
+
+# State that must never be shared between pre-forked workers
+PER_PROCESS = ('model_loading', 'analysis_flights', 'client_limits', 'upstream_admission',
+               'analysis_jobs', 'checkouts_in_flight')
+
+
+def test_request_state_is_per_process():
+    print("🧪 Testing per-process request state...")
+    for name in PER_PROCESS:
+        assert isinstance(getattr(app, name), ProcessLocal), name
+    parent = {name: resolve(getattr(app, name)) for name in PER_PROCESS}
+    app.checkouts_in_flight.claim(42)
+    app.analysis_jobs.update(7, status='pending')
+
+    if not hasattr(os, 'fork'):
+        return
+    pid = os.fork()
+    if pid == 0:
+        # Child: fresh objects, none of the parent's claims or locks
+        try:
+            fresh = all(resolve(getattr(app, name)) is not parent[name] for name in PER_PROCESS)
+            ok = fresh and app.checkouts_in_flight.claim(42) and app.analysis_jobs.get(7) is None
+        except BaseException:
+            ok = False
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    # The parent keeps its own
+    assert not app.checkouts_in_flight.claim(42)
+    app.checkouts_in_flight.release(42)
+    print("✅ Forked workers build their own limiters, flights and job tables")
+
+
+if __name__ == "__main__":
+    test_request_state_is_per_process()
@@ -0,0 +1,134 @@
+# Upstream session retry test script
+import socket
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from http_pool import UpstreamSessions
+
+
+def slow_server(delay):
+    """Local server that answers after ``delay`` seconds; returns (url, hits, stop)"""
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            hits.append(self.path)
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            time.sleep(delay)
+            try:
+                self.send_response(200)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+            except ConnectionError:
+                # The client gave up waiting, which is the point of the test
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', hits, server.shutdown
+
+
+def resetting_server(resets):
+    """Raw server that resets the first ``resets`` connections after reading a request; returns (url, hits, stop)"""
+    hits = []
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(8)
+    stopped = threading.Event()
+
+    def serve():
+        while not stopped.is_set():
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            with conn:
+                if not conn.recv(65536):
+                    continue
+                hits.append(len(hits))
+                if len(hits) <= resets:
+                    # Linger 0: close with a TCP RST instead of a FIN
+                    conn.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+                    continue
+                conn.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: close\r\n\r\n{}')
+
+    threading.Thread(target=serve, daemon=True).start()
+
+    def stop():
+        stopped.set()
+        listener.close()
+
+    return f'http://127.0.0.1:{listener.getsockname()[1]}', hits, stop
+
+
+def test_reset_retried_only_where_safe():
+    print("🧪 Testing connection resets...")
+    url, hits, stop = resetting_server(resets=1)
+    try:
+        sessions = UpstreamSessions(retries=2)
+        sessions.configure(url, retry_reads=True)
+        assert sessions.post(f'{url}/models/emotion', json={'inputs': 'hi'}).status_code == 200
+        assert len(hits) == 2
+    finally:
+        stop()
+
+    url, hits, stop = resetting_server(resets=1)
+    try:
+        try:
+            UpstreamSessions(retries=2).post(f'{url}/checkout', json={'amount': 5.99})
+            assert False, 'expected the reset to surface'
+        except requests.exceptions.ConnectionError:
+            pass
+        assert len(hits) == 1
+    finally:
+        stop()
+    print("✅ Resets replayed for idempotent hosts, never for checkouts")
+
+
+def test_post_not_replayed_after_read_timeout():
+    print("🧪 Testing that read timeouts are not retried...")
+    url, hits, stop = slow_server(0.5)
+    try:
+        sessions = UpstreamSessions(read_timeout=0.1, retries=2)
+        # Not even where resets are retried
+        sessions.configure(url, retry_reads=True)
+        try:
+            sessions.post(f'{url}/checkout', json={'amount': 5.99})
+            assert False, 'expected a read timeout'
+        except requests.exceptions.RequestException as e:
+            assert 'timed out' in str(e).lower()
+        time.sleep(0.1)
+        assert hits == ['/checkout']
+    finally:
+        stop()
+    print("✅ A POST that reached the upstream is sent once")
+
+
+def test_connect_failures_retried():
+    print("🧪 Testing that connection setup is retried...")
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    sessions = UpstreamSessions(retries=2)
+    retry = sessions.session_for(f'http://127.0.0.1:{port}').get_adapter(f'http://127.0.0.1:{port}').max_retries
+    assert (retry.connect, retry.read, retry.other) == (2, 0, 2)
+    try:
+        sessions.get(f'http://127.0.0.1:{port}/')
+        assert False, 'nothing listens on the port'
+    except requests.exceptions.ConnectionError as e:
+        assert 'Max retries exceeded' in str(e)
+    print("✅ Refused connections retried up to the limit")
+
+
+if __name__ == "__main__":
+    test_reset_retried_only_where_safe()
+    test_post_not_replayed_after_read_timeout()
+    test_connect_failures_retried()
@@ -0,0 +1,172 @@
+# Analysis coalescing and rate limit test script
+import asyncio
+import time
+
+from app_under_test import load_app
+from ratelimit import AdmissionQueue, KeyedBuckets, RateLimited, TokenBucket
+from resources import resolve
+from sentiment_providers import SentimentProvider
+from singleflight import SingleFlight
+
+app = load_app()
+
+
+def test_cancelled_leader_keeps_followers_call():
+    print("🧪 Testing a cancelled singleflight leader...")
+    flights = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'answer'
+
+    async def scenario():
+        leader = asyncio.ensure_future(flights.do_async('text', call))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do_async('text', call))
+        await asyncio.sleep(0)
+        # The leader's client hangs up
+        leader.cancel()
+        assert await follower == ('answer', True)
+        assert leader.cancelled()
+
+    asyncio.run(scenario())
+    assert calls == [1]
+    assert flights.stats() == {'in_flight': 0, 'leaders': 1, 'shared': 1}
+    print("✅ Followers still get the shared answer")
+
+
+def test_failed_call_shared():
+    print("🧪 Testing a failed coalesced call...")
+    flights = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.01)
+        raise ValueError('upstream down')
+
+    async def scenario():
+        results = await asyncio.gather(flights.do_async('text', call), flights.do_async('text', call),
+                                       return_exceptions=True)
+        assert [type(result) for result in results] == [ValueError, ValueError]
+
+    asyncio.run(scenario())
+    assert flights.stats()['in_flight'] == 0
+    print("✅ Every caller gets the leader's error")
+
+
+def test_cache_hits_free_for_clients():
+    print("🧪 Testing per-client limits with cached answers...")
+    client = app.create_app(warm_up_on_start=False).test_client()
+    client.environ_base['REMOTE_ADDR'] = '10.0.0.24'
+    provider = app.sentiment_providers['huggingface']
+    text = 'Cached before the client ever asked'
+    app.sentiment_cache.set(text, provider.model_id, {'emotion_label': 'joy', 'sentiment_score': 0.9})
+
+    burst = int(app.client_limits.capacity)
+    for _ in range(burst * 2):
+        response = client.post('/api/ai/analyze', json={'content': text, 'provider': 'huggingface'})
+        assert response.status_code == 200
+        assert response.get_json()['emotion_label'] == 'joy'
+
+    # Uncached texts still count
+    statuses = [client.post('/api/ai/analyze', json={'content': f'Fresh text {i}', 'provider': 'local'}).status_code
+                for i in range(burst + 1)]
+    assert statuses[:burst] == [200] * burst
+    assert statuses[-1] == 429
+    print("✅ Only live analyses use up client tokens")
+
+
+class HoldingProvider(SentimentProvider):
+    """Metered provider whose model needs a hold before it is called"""
+
+    name = 'holding'
+    cacheable = False
+    metered = True
+
+    def __init__(self, steps):
+        self.steps = steps
+
+    def ready(self):
+        self.steps.append('hold')
+        return 'plan'
+
+    def analyze(self, text, plan=None):
+        self.steps.append(('analyze', plan))
+        return {'emotion_label': 'neutral', 'sentiment_score': 0.5}
+
+
+def test_admission_taken_after_hold():
+    print("🧪 Testing the upstream admission token around a model hold...")
+    steps = []
+    admission = resolve(app.upstream_admission)
+    real_admit = admission.admit
+    admission.admit = lambda *args, **kwargs: steps.append('admit')
+    try:
+        assert app._analyze_live(HoldingProvider(steps), 'Waiting on a cold model')['ai_provider'] == 'holding'
+    finally:
+        admission.admit = real_admit
+    assert steps == ['hold', 'admit', ('analyze', 'plan')]
+    assert app.analysis_flights.stats()['in_flight'] == 0
+    print("✅ Tokens taken only once the model is ready")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_buckets():
+    print("🧪 Testing token buckets...")
+    clock = Clock()
+    bucket = TokenBucket(2, 3, clock=clock)
+    assert [bucket.try_acquire()[0] for _ in range(4)] == [True, True, True, False]
+    assert bucket.try_acquire() == (False, 0.5)
+    clock.now = 0.5
+    assert bucket.try_acquire() == (True, 0.0)
+    # Refills stop at the burst size
+    clock.now = 100
+    assert [bucket.try_acquire()[0] for _ in range(4)] == [True, True, True, False]
+
+    clients = KeyedBuckets(1, 1, max_keys=2, clock=clock)
+    assert clients.try_acquire('a')[0] and not clients.try_acquire('a')[0]
+    # Clients have their own budgets
+    assert clients.try_acquire('b')[0]
+    clients.try_acquire('c')
+    assert clients.stats()['keys'] == 2
+    print("✅ Buckets refill at their rate up to the burst, per client")
+
+
+def test_admission_queue():
+    print("🧪 Testing the upstream admission queue...")
+    queue = AdmissionQueue(TokenBucket(20, 1), max_waiting=1, max_wait=1)
+    queue.admit()
+    # The next caller waits its turn (about 50 ms) instead of failing
+    began = time.monotonic()
+    queue.admit()
+    assert 0.02 < time.monotonic() - began < 0.5
+
+    # A turn later than max_wait is refused at once, with a retry hint
+    slow = AdmissionQueue(TokenBucket(0.5, 1), max_waiting=4, max_wait=1)
+    slow.admit()
+    try:
+        slow.admit()
+        assert False, 'expected RateLimited'
+    except RateLimited as e:
+        assert e.scope == 'global' and e.retry_after_header() == '2'
+    assert not slow.try_admit()
+    stats = slow.stats()
+    assert (stats['admitted'], stats['rejected'], stats['waiting']) == (1, 1, 0)
+    print("✅ Bounded waits, quick refusals")
+
+
+if __name__ == "__main__":
+    test_cancelled_leader_keeps_followers_call()
+    test_failed_call_shared()
+    test_cache_hits_free_for_clients()
+    test_admission_taken_after_hold()
+    test_token_buckets()
+    test_admission_queue()
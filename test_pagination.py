@@ -0,0 +1,59 @@
+# Keyset pagination test script
+import base64
+import json
+
+from app_under_test import load_app
+from pagination import decode_cursor, encode_cursor
+
+app = load_app()
+
+
+def crafted(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def test_cursor_round_trip():
+    print("🧪 Testing entry cursors...")
+    row = {'id': 42, 'created_at': '2026-10-18T09:00:00.000000+00:00'}
+    assert decode_cursor(encode_cursor(row)) == (row['created_at'], 42)
+    for bad in ('not-base64!', crafted(['2026-10-18', 'abc']), crafted(['2026-10-18', True]),
+                crafted(['2026-10-18', 1.5]), crafted([None, 1]), crafted(['2026-10-18'])):
+        try:
+            decode_cursor(bad)
+            assert False, bad
+        except ValueError as e:
+            assert str(e) == 'Invalid cursor'
+    print("✅ Only (timestamp, integer id) cursors accepted")
+
+
+def test_pages_and_crafted_cursors():
+    print("🧪 Testing GET /api/entries pages...")
+    client = app.create_app(warm_up_on_start=False).test_client()
+    for i in range(3):
+        app.storage.insert_entry({'content': f'Page entry {i}', 'emotion_label': 'happy', 'sentiment_score': 0.7})
+    first = client.get('/api/entries?limit=2')
+    second = client.get(f"/api/entries?limit=2&cursor={first.headers['X-Next-Cursor']}")
+    assert second.status_code == 200
+    assert not {entry['id'] for entry in first.get_json()} & {entry['id'] for entry in second.get_json()}
+
+    response = client.get(f"/api/entries?cursor={crafted(['2026-10-18', 'abc'])}")
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}
+    print("✅ Crafted cursors answered with 400")
+
+
+def test_search_offset_validated():
+    print("🧪 Testing search offsets...")
+    client = app.create_app(warm_up_on_start=False).test_client()
+    for offset in ('abc', '-1', '1.5'):
+        response = client.get(f'/api/entries/search?q=page&offset={offset}')
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'offset must be a non-negative integer'}
+    assert client.get('/api/entries/search?q=page&offset=1').status_code == 200
+    print("✅ Bad offsets answered with a clean 400")
+
+
+if __name__ == "__main__":
+    test_cursor_round_trip()
+    test_pages_and_crafted_cursors()
+    test_search_offset_validated()
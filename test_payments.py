@@ -0,0 +1,62 @@
+# Payment outbox test script
+import threading
+import time
+
+from app_under_test import load_app
+
+app = load_app()
+
+
+def test_initiate_idempotent():
+    print("🧪 Testing payment initiation with an Idempotency-Key...")
+    checkouts = []
+    real_create = app.create_intasend_payment
+
+    def create(amount, plan_type, reference=None):
+        checkouts.append(reference)
+        time.sleep(0.05)
+        return real_create(amount, plan_type, reference)
+
+    app.create_intasend_payment = create
+    try:
+        flask_app = app.create_app(warm_up_on_start=False)
+        answers = []
+
+        def initiate():
+            client = flask_app.test_client()
+            response = client.post('/api/payment/initiate', json={'plan_type': 'premium', 'amount': 9.99},
+                                   headers={'Idempotency-Key': 'retry-me-once'})
+            answers.append((response.status_code, response.get_json()))
+
+        threads = [threading.Thread(target=initiate) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert {status for status, _ in answers} <= {200, 202}
+        payment_ids = {body['payment_id'] for _, body in answers}
+        assert len(payment_ids) == 1
+
+        client = flask_app.test_client()
+        payment_id = payment_ids.pop()
+        for _ in range(100):
+            payment = client.get(f'/api/payments/{payment_id}').get_json()
+            if payment['status'] != app.PAYMENT_INITIATING:
+                break
+            time.sleep(0.02)
+        assert payment['status'] == 'pending' and payment['payment_url']
+        # Every retry of the request maps to the one checkout
+        assert checkouts == ['retry-me-once']
+
+        # Without a key each request is a new payment
+        first = client.post('/api/payment/initiate', json={}).get_json()['payment_id']
+        second = client.post('/api/payment/initiate', json={}).get_json()['payment_id']
+        assert first != second
+    finally:
+        app.create_intasend_payment = real_create
+    print("✅ One payment and one checkout per Idempotency-Key")
+
+
+if __name__ == "__main__":
+    test_initiate_idempotent()
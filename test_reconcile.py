@@ -0,0 +1,116 @@
+# Payment reconciliation test script
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from app_under_test import load_app
+from ratelimit import TokenBucket
+from reconcile import PaymentReconciler
+from resources import resolve
+from storage import SQLiteStorage
+
+app = load_app()
+
+
+def reconciler_for(statuses, **options):
+    """Reconciler over a fresh database with ``statuses`` (checkout id -> answer) as the provider"""
+    workdir = tempfile.mkdtemp()
+    storage = SQLiteStorage(os.path.join(workdir, 'payments.db'))
+    checked = []
+
+    def check(intasend_payment_id):
+        checked.append(intasend_payment_id)
+        return statuses.get(intasend_payment_id)
+
+    reconciler = PaymentReconciler(storage, check, TokenBucket(1000), db_path=os.path.join(workdir, 'reconcile.db'),
+                                   stale_after=0, **options)
+    return reconciler, storage, checked
+
+
+def test_demo_payments_complete():
+    print("🧪 Testing that demo checkouts are settled...")
+    storage = app.storage
+    payment = storage.insert_payment({'plan_type': 'basic', 'amount': 5.99, 'status': 'pending',
+                                      'intasend_payment_id': 'demo_20260101120000'})
+    report = app.reconciler.run_once(stale_after=0)
+    assert report['updated'].get('completed', 0) >= 1
+    assert storage.get_payment(payment['id'])['status'] == 'completed'
+    print("✅ Demo payments completed by the reconciler")
+
+
+def test_woken_run_starts_from_newest():
+    print("🧪 Testing woken runs...")
+    reconciler, storage, checked = reconciler_for({}, batch_size=2, max_per_run=2)
+    for i in range(6):
+        storage.insert_payment({'plan_type': 'basic', 'amount': 5.99, 'status': 'pending',
+                                'intasend_payment_id': f'inv_{i}'})
+    assert reconciler.run_once()['complete'] is False
+    assert checked == ['inv_5', 'inv_4']
+    resume = reconciler._load('resume')
+
+    # A checkout just returned: its payment is the newest, not where the backlog stopped
+    checked.clear()
+    reconciler.run_once(stale_after=0, from_newest=True)
+    assert checked == ['inv_5', 'inv_4']
+    assert reconciler._load('resume') == resume
+
+    checked.clear()
+    reconciler.run_once()
+    assert checked == ['inv_3', 'inv_2']
+    print("✅ Woken runs check the newest payments and keep the backlog position")
+
+
+def test_lease_rolled_back_on_error():
+    print("🧪 Testing the reconcile lease after an error...")
+    reconciler, _, _ = reconciler_for({})
+    broken = reconciler._db
+    reconciler._db = sqlite3.connect(reconciler.db_path, check_same_thread=False, timeout=10, isolation_level=None)
+    reconciler._db.execute('DROP TABLE reconcile_state')
+    try:
+        reconciler._acquire_lease()
+        assert False, 'expected the missing table to fail'
+    except sqlite3.OperationalError:
+        pass
+    # No transaction left open, and nothing from it committed
+    assert not reconciler._db.in_transaction
+    reconciler._db = broken
+    print("✅ Failed lease attempts roll back")
+
+
+def test_reconcile_requests_share_one_run():
+    print("🧪 Testing POST /api/payments/reconcile...")
+    runs = []
+    release = threading.Event()
+    reconciler = resolve(app.reconciler)
+    real_run_once = reconciler.run_once
+
+    def run_once(**kwargs):
+        runs.append(kwargs)
+        release.wait(2)
+
+    reconciler.run_once = run_once
+    before = threading.active_count()
+    try:
+        client = app.create_app(warm_up_on_start=False).test_client()
+        for _ in range(20):
+            assert client.post('/api/payments/reconcile').status_code == 202
+        time.sleep(0.2)
+        # One reconciler thread at most, not one per request
+        assert threading.active_count() - before <= 1
+        release.set()
+        time.sleep(0.2)
+        assert 1 <= len(runs) <= 2
+        assert runs[0] == {'stale_after': 0, 'from_newest': True}
+    finally:
+        release.set()
+        reconciler.run_once = real_run_once
+    print("✅ Requests coalesce into a wake of the background run")
+
+
+if __name__ == "__main__":
+    test_demo_payments_complete()
+    test_woken_run_starts_from_newest()
+    test_lease_rolled_back_on_error()
+    test_reconcile_requests_share_one_run()
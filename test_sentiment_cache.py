@@ -0,0 +1,57 @@
+# Sentiment cache test script
+import os
+import tempfile
+import time
+
+from sentiment_cache import SentimentCache
+
+JOY = {'emotion_label': 'happy', 'sentiment_score': 0.9}
+
+
+def test_memory_and_disk_tiers():
+    print("🧪 Testing sentiment cache tiers...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'sentiment_cache.db')
+        cache = SentimentCache(max_entries=2, db_path=path)
+        cache.set('A  good\tday', 'model', JOY)
+        # Normalized text shares the entry; another model does not
+        assert cache.get('A good day', 'model') == JOY
+        assert cache.get('A good day', 'other-model') is None
+
+        cache.set('second', 'model', JOY)
+        cache.set('third', 'model', JOY)
+        stats = cache.stats()
+        assert (stats['memory_entries'], stats['disk_entries'], stats['evictions']) == (2, 3, 1)
+
+        # Evicted from memory, still answered from disk and promoted back
+        assert cache.get('A good day', 'model') == JOY
+        assert cache.stats()['disk_hits'] == 1
+        assert cache.get('A good day', 'model') == JOY
+        assert cache.stats()['disk_hits'] == 1
+
+        # Results are copies: callers may decorate them
+        cache.get('third', 'model')['detailed_analysis'] = 'changed'
+        assert cache.get('third', 'model') == JOY
+
+        restarted = SentimentCache(max_entries=2, db_path=path)
+        assert restarted.preload() == 2
+        assert restarted.stats()['memory_entries'] == 2
+        assert restarted.get('second', 'model') == JOY
+    print("✅ Memory LRU backed by the disk tier across restarts")
+
+
+def test_expired_results_missed():
+    print("🧪 Testing sentiment cache expiry...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SentimentCache(ttl=0.05, db_path=os.path.join(tmp, 'sentiment_cache.db'))
+        cache.set('short lived', 'model', JOY)
+        assert cache.get('short lived', 'model') == JOY
+        time.sleep(0.1)
+        assert cache.get('short lived', 'model') is None
+        assert cache.preload() == 0
+    print("✅ Expired results are not served from either tier")
+
+
+if __name__ == "__main__":
+    test_memory_and_disk_tiers()
+    test_expired_results_missed()
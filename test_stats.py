@@ -0,0 +1,155 @@
+# Mood statistics test script
+import os
+import tempfile
+import threading
+import time
+from datetime import date
+
+from app_under_test import load_app
+from resources import resolve
+from stats_store import MoodStats
+from storage import SQLiteStorage
+
+app = load_app()
+
+
+def test_aggregates_follow_every_write():
+    print("🧪 Testing aggregates kept by the database...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'mood_journal.db')
+        storage = SQLiteStorage(path)
+        stats = MoodStats(storage)
+        first = storage.insert_entry({'content': 'Monday', 'emotion_label': 'joy', 'sentiment_score': 0.8,
+                                      'created_at': '2026-10-12T09:00:00.000000+00:00'})
+        storage.insert_entries([
+            {'content': 'Late Sunday in Nairobi', 'emotion_label': 'joy', 'sentiment_score': 0.6,
+             'created_at': '2026-10-11T23:30:00.000000-03:00'},
+            {'content': 'Pending', 'emotion_label': None, 'sentiment_score': None,
+             'created_at': '2026-09-30T12:00:00.000000+00:00'},
+        ])
+        # Writes through another connection (another worker or host) are counted too
+        other = SQLiteStorage(path)
+        other.update_entry(first['id'], {'emotion_label': 'sadness', 'sentiment_score': 0.2})
+
+        snapshot = stats.snapshot()
+        assert snapshot['emotion_counts'] == {'joy': 1, 'sadness': 1, 'neutral': 1}
+        assert snapshot['total_entries'] == 3
+
+        weeks = stats.trends('week')
+        # The -03:00 entry falls on Monday 12 October in UTC
+        assert [(p['period'], p['count']) for p in weeks] == [('2026-09-28', 1), ('2026-10-12', 2)]
+        assert [p['period'] for p in stats.trends('month', limit=1)] == ['2026-10']
+        assert [p['period'] for p in stats.trends('day', date(2026, 10, 1), date(2026, 10, 31))] == ['2026-10-12']
+
+        other.delete_entry(first['id'])
+        assert stats.snapshot()['emotion_counts'] == {'joy': 1, 'neutral': 1}
+        assert stats.rebuild() == 2
+        assert stats.snapshot()['emotion_counts'] == {'joy': 1, 'neutral': 1}
+    print("✅ Stats updated in the same transaction as each write")
+
+
+def test_existing_entries_counted():
+    print("🧪 Testing aggregates for a database created before them...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'mood_journal.db')
+        storage = SQLiteStorage(path)
+        storage.insert_entry({'content': 'Old entry', 'emotion_label': 'fear', 'sentiment_score': 0.7})
+        conn = storage._conn()
+        conn.execute('DROP TABLE mood_rollups')
+        for trigger in ('insert', 'update', 'delete'):
+            conn.execute(f'DROP TRIGGER journal_entries_stats_{trigger}')
+        assert MoodStats(SQLiteStorage(path)).snapshot()['emotion_counts'] == {'fear': 1}
+    print("✅ Entries written before the aggregates are counted")
+
+
+def test_drift_with_matching_total_detected():
+    print("🧪 Testing drift detection...")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, 'mood_journal.db'))
+        stats = MoodStats(storage)
+        entry = storage.insert_entry({'content': 'Fine', 'emotion_label': 'joy', 'sentiment_score': 0.9})
+        assert stats.drifted() == []
+
+        # Re-scored behind the triggers' back: same number of entries, different labels
+        conn = storage._conn()
+        conn.execute('DROP TRIGGER journal_entries_stats_update')
+        conn.execute("UPDATE journal_entries SET emotion_label = 'fear' WHERE id = ?", (entry['id'],))
+        assert stats.drifted() == ['fear', 'joy']
+        stats.rebuild()
+        assert stats.drifted() == []
+        assert stats.snapshot()['emotion_counts'] == {'fear': 1}
+    print("✅ Per-emotion fingerprint catches drift a row count misses")
+
+
+def test_bad_scores_kept_out_of_aggregates():
+    print("🧪 Testing entry scores that are not numbers...")
+    client = app.create_app(warm_up_on_start=False).test_client()
+    for score in ('abc', 1.5, -0.1, [0.5]):
+        response = client.post('/api/entries', json={'content': 'Scored by hand', 'emotion_label': 'happy',
+                                                     'sentiment_score': score})
+        assert response.status_code == 400, score
+    created = client.post('/api/entries', json={'content': 'Scored by hand', 'emotion_label': 'happy',
+                                                'sentiment_score': '0.7'})
+    assert created.status_code == 201 and created.get_json()['sentiment_score'] == 0.7
+    assert client.get('/api/stats').status_code == 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'mood_journal.db')
+        storage = SQLiteStorage(path)
+        # Written by some other client straight into the table
+        storage.insert_entry({'content': 'Raw row', 'emotion_label': 'sad', 'sentiment_score': 'abc'})
+        stats = MoodStats(storage)
+        assert stats.snapshot()['emotion_counts'] == {'sad': 1}
+        assert stats.drifted() == []
+
+        # Aggregates poisoned by triggers that stored the text are rebuilt on open
+        storage._conn().execute("UPDATE mood_rollups SET score_sum = 'abc'")
+        assert stats.drifted() == ['sad']
+        assert MoodStats(SQLiteStorage(path)).snapshot()['average_score'] == 0.0
+    print("✅ Scores validated by the API and cast by the triggers")
+
+
+def test_drift_check_off_the_request():
+    print("🧪 Testing where the drift check runs...")
+    stats = resolve(app.mood_stats)
+    checked = []
+    real_drifted = stats.drifted
+
+    def slow_drifted():
+        time.sleep(0.5)
+        checked.append(threading.current_thread().name)
+        return []
+
+    stats.drifted = slow_drifted
+    stats._checked_at = None
+    try:
+        client = app.create_app(warm_up_on_start=False).test_client()
+        began = time.monotonic()
+        assert client.get('/api/stats').status_code == 200
+        assert time.monotonic() - began < 0.3
+        # Due again while the first check still runs: not queued twice
+        stats._checked_at = None
+        assert client.get('/api/stats/trends').status_code == 200
+        time.sleep(0.8)
+        assert len(checked) == 1 and checked[0].startswith('stats-drift')
+    finally:
+        stats.drifted = real_drifted
+    print("✅ Full-table drift checks run on the background worker")
+
+
+def test_rebuild_changes_stats_etag():
+    print("🧪 Testing stats ETags across a rebuild...")
+    client = app.create_app(warm_up_on_start=False).test_client()
+    etag = client.get('/api/stats').headers['ETag']
+    assert client.post('/api/stats/rebuild').status_code == 200
+    assert client.get('/api/stats', headers={'If-None-Match': etag}).status_code == 200
+    print("✅ A rebuild revalidates cached stats")
+
+
+if __name__ == "__main__":
+    test_aggregates_follow_every_write()
+    test_existing_entries_counted()
+    test_drift_with_matching_total_detected()
+    test_bad_scores_kept_out_of_aggregates()
+    test_drift_check_off_the_request()
+    test_rebuild_changes_stats_etag()
@@ -0,0 +1,80 @@
+# Live updates (Server-Sent Events) test script
+import json
+
+from app_under_test import load_app
+from resources import resolve
+
+app = load_app()
+
+
+def open_stream(client):
+    response = client.get('/api/stream', headers={'Accept-Encoding': 'gzip'})
+    if response.status_code == 200:
+        # Start the generator so closing it unsubscribes
+        next(response.response)
+    return response
+
+
+def test_streams_capped_and_uncompressed():
+    print("🧪 Testing /api/stream under WSGI...")
+    client = app.create_app(warm_up_on_start=False).test_client()
+    streams = [open_stream(client) for _ in range(app.SSE_WSGI_MAX_CLIENTS)]
+    try:
+        for response in streams:
+            assert response.status_code == 200
+            assert response.mimetype == 'text/event-stream'
+            assert 'Content-Encoding' not in response.headers
+        # Each open stream holds a request thread, so the next one is refused
+        refused = open_stream(client)
+        assert refused.status_code == 503
+        assert refused.headers['Retry-After'] == '10'
+    finally:
+        for response in streams:
+            response.close()
+    assert app.events.stats()['subscribers'] == 0
+    open_stream(client).close()
+    assert app.events.stats()['subscribers'] == 0
+    print("✅ Streams capped below the thread count and sent uncompressed")
+
+
+def test_stats_read_only_when_streamed():
+    print("🧪 Testing stats events...")
+    client = app.create_app(warm_up_on_start=False).test_client()
+    stats = resolve(app.mood_stats)
+    reads = []
+    real_snapshot = stats.snapshot
+
+    def snapshot():
+        reads.append(1)
+        return real_snapshot()
+
+    stats.snapshot = snapshot
+    try:
+        entry = {'content': 'Nobody is listening', 'emotion_label': 'happy', 'sentiment_score': 0.8,
+                 'created_at': '2026-10-18T08:00:00+00:00'}
+        assert client.post('/api/entries', json=entry).status_code == 201
+        # Only the changed days are logged; no aggregate queries on the write
+        assert reads == []
+
+        stream = open_stream(client)
+        try:
+            assert client.post('/api/entries', json=dict(entry, content='Somebody is')).status_code == 201
+            chunk = ''
+            while 'event: stats' not in chunk:
+                chunk = next(stream.response)
+                chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        finally:
+            stream.close()
+        data = json.loads(chunk.split('data: ', 1)[1])
+        assert data['total_entries'] >= 2
+        assert [point['date'] for point in data['trend_points']] == ['2026-10-18']
+        assert data['trend_points'][0]['count'] >= 2
+        assert len(reads) == 1
+    finally:
+        stats.snapshot = real_snapshot
+    print("✅ Stats read when a stream sends them, not on every write")
+
+
+if __name__ == "__main__":
+    test_streams_capped_and_uncompressed()
+    test_stats_read_only_when_streamed()
@@ -1,9 +1,10 @@
 # Test Supabase connection
-from app import supabase, app
+from storage import connect_supabase
 import os
 
 def test_supabase():
     print("🧪 Testing Supabase Connection...")
+    supabase = connect_supabase()
     
     if not supabase:
         print("❌ Supabase not configured!")
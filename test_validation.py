@@ -0,0 +1,37 @@
+# Request body validation test script
+from starlette.testclient import TestClient
+
+from app_under_test import load_app
+
+app = load_app()
+
+BAD_BODIES = ('null', '[1]', '"text"', '{not json')
+
+
+def test_bad_json_bodies_rejected():
+    print("🧪 Testing malformed and non-object JSON bodies...")
+    client = app.create_app(warm_up_on_start=False).test_client()
+    for path in ('/api/entries', '/api/ai/analyze'):
+        for body in BAD_BODIES:
+            response = client.post(path, data=body, content_type='application/json')
+            assert response.status_code == 400, (path, body, response.status_code)
+            assert response.get_json() == {'error': 'Content is required'}
+        # No JSON content type at all
+        assert client.post(path, data='{"content": "hi"}').status_code == 400
+    print("✅ Bad bodies answered with 400, not 500")
+
+
+def test_bad_json_bodies_rejected_asgi():
+    print("🧪 Testing malformed JSON bodies in ASGI mode...")
+    import asgi
+    with TestClient(asgi.app) as client:
+        for path in ('/api/entries', '/api/ai/analyze'):
+            for body in BAD_BODIES:
+                response = client.post(path, content=body, headers={'Content-Type': 'application/json'})
+                assert response.status_code == 400, (path, body, response.status_code)
+    print("✅ Native ASGI routes validate bodies the same way")
+
+
+if __name__ == "__main__":
+    test_bad_json_bodies_rejected()
+    test_bad_json_bodies_rejected_asgi()